@@ -4,8 +4,11 @@ from app.fastapi import FastAPIServer
 from app.crud import CRUDOperations
 from app.label_extractor_from_video import LabelExtractor
 from app.json_handler import JsonHandler
+from app.blob_store import BlobStore
 from app.rag_pipeline import RagPipeline
 from app.video_transcriper import VideoTranscript
+from app.llm_provider import LLMProvider
+from app.retention import RetentionJob
 
 def main(args, configs):
 
@@ -13,14 +16,17 @@ def main(args, configs):
     logger.debug("############ [NAME OF PROJECT] CONFIGURATIONS ############")
     logger.debug(configs)
 
-    transcripter = VideoTranscript(logger=logger)
-    label_extractor = LabelExtractor(**configs["LabelExtractor"],logger=logger)
-    json_handler = JsonHandler(**configs["JsonHandler"], logger=logger)
-    rag_pipeline = RagPipeline(**configs["RagPipeline"], logger=logger)
+    llm_provider = LLMProvider(**configs["LLMProvider"], logger=logger)
+    transcripter = VideoTranscript(**configs["VideoTranscript"], logger=logger)
+    label_extractor = LabelExtractor(**configs["LabelExtractor"], llm_provider=llm_provider, logger=logger)
+    blob_store = BlobStore(**configs["BlobStore"], logger=logger)
+    json_handler = JsonHandler(**configs["JsonHandler"], blob_store=blob_store, logger=logger)
+    rag_pipeline = RagPipeline(**configs["RagPipeline"], blob_store=blob_store, logger=logger)
     
 
     crud = CRUDOperations(**configs["crud"], logger=logger)
-    fastapi = FastAPIServer(**configs["fastapi"], crud=crud, transcripter = transcripter, label_extractor = label_extractor, json_handler=json_handler, rag_pipeline = rag_pipeline, logger=logger)
+    retention = RetentionJob(**configs["retention"], logger=logger)
+    fastapi = FastAPIServer(**configs["fastapi"], crud=crud, transcripter = transcripter, label_extractor = label_extractor, json_handler=json_handler, rag_pipeline = rag_pipeline, llm_provider=llm_provider, retention=retention, logger=logger)
     fastapi.run()
 
     print("is running")
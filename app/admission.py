@@ -0,0 +1,264 @@
+from dataclasses import dataclass, field
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, List, Optional
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+
+
+class AdmissionRejected(Exception):
+    """
+    Kuyruk dolu olduğunda ya da istek kuyrukta çok beklediğinde fırlatılır.
+    FastAPI tarafında 503 olarak döner.
+    """
+
+    def __init__(self, priority_class: str, reason: str):
+        self.priority_class = priority_class
+        self.reason = reason
+        super().__init__(f"LLM admission rejected for '{priority_class}': {reason}")
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class PriorityClass:
+    """
+    Args
+    name(str)              : Sınıf adı (interactive, generation, background).
+    priority(int)          : Küçük değer daha yüksek önceliktir.
+    max_concurrency(int)   : Bu sınıftan aynı anda uçuşta olabilecek istek sayısı.
+    max_queue(int)         : Bu sınıftan kuyrukta bekleyebilecek maksimum istek; aşılırsa istek reddedilir.
+    queue_timeout(float)   : Kuyrukta beklenebilecek maksimum süre (saniye).
+    """
+
+    name: str
+    priority: int
+    max_concurrency: int
+    max_queue: int
+    queue_timeout: float
+
+    admitted: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+    queued: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class _HeldSlot:
+    """
+    Bir context'te tutulan slot. asyncio.to_thread ve langchain batch/abatch context'i thread'lere
+    ve task'lara kopyaladığı için slotu tutan işin içinden yapılan LLM çağrıları bu nesneyi görür.
+
+    Kural: bir slot aynı anda tek bir model çağrısı demektir. İç içe çağrılar yeni slot almaz
+    (aksi halde slotu tutan iş kendi çağrısını bekleyip kilitlenir), ama slotu sırayla kullanır:
+    paralel thread'ler ya da task'lar birbirini bekler, yalnızca aynı thread yeniden girebilir.
+    Böylece slotu tutan bir iş paralel çağrı yapsa da sınıf limiti aşılmaz.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.thread_lock = threading.RLock()
+        self.task_lock = asyncio.Lock()
+
+
+_held_slot: contextvars.ContextVar = contextvars.ContextVar("admission_slot", default=None)
+
+
+@dataclass
+class _Waiter:
+    priority_class: PriorityClass
+    key: tuple
+    start_time: float
+    future: Optional[asyncio.Future] = None
+    granted: bool = False
+
+
+@dataclass
+class AdmissionController:
+    """
+    Tüm LLM çağrılarının önündeki öncelikli admission scheduler.
+
+    Boşalan her slot, çalışabilecek (sınıf limiti dolmamış) bekleyenler arasından en yüksek
+    öncelikli ve en eski isteğe verilir. Sınıf bazlı concurrency limitleri düşük öncelikli
+    işlerin global kapasitenin tamamını tutmasını engeller; kuyruk limitleri aşıldığında
+    istek beklemeden reddedilir (load shedding).
+
+    Slot bekleyene devredilir (granted): bekleyen uyanmadan önce slot onun adına ayrılmıştır.
+    Async bekleyenler (aslot) event loop'ta bir future üzerinde bekler, thread tutmaz; senkron
+    iş ancak slot alındıktan sonra thread'e gönderilmelidir (bkz. LLMProvider.run). Slot
+    verildikten sonra bekleyen iptal edilirse slot geri bırakılır.
+
+    Args
+    max_concurrency(int)  : Process genelinde aynı anda uçuşta olabilecek istek sayısı.
+    classes(dict)         : sınıf adı -> {priority, max_concurrency, max_queue, queue_timeout}
+    """
+
+    max_concurrency: int
+    classes: Dict[str, dict]
+    logger: any
+    priority_classes: Dict[str, PriorityClass] = field(init=False)
+
+    def __post_init__(self):
+        self.priority_classes = {
+            name: PriorityClass(name=name, **settings) for name, settings in self.classes.items()
+        }
+        self._condition = threading.Condition()
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self.in_flight = 0
+
+    def _can_run(self, priority_class: PriorityClass) -> bool:
+        return self.in_flight < self.max_concurrency and priority_class.in_flight < priority_class.max_concurrency
+
+    def _enqueue(self, name: str, future: Optional[asyncio.Future] = None) -> _Waiter:
+        priority_class = self.priority_classes[name]
+        if priority_class.queued >= priority_class.max_queue:
+            priority_class.rejected += 1
+            raise AdmissionRejected(name, "queue is full")
+        waiter = _Waiter(
+            priority_class=priority_class,
+            key=(priority_class.priority, next(self._sequence)),
+            start_time=time.monotonic(),
+            future=future
+        )
+        self._waiters.append(waiter)
+        self._waiters.sort(key=lambda other: other.key)
+        priority_class.queued += 1
+        self._dispatch()
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        self._waiters.remove(waiter)
+        waiter.priority_class.queued -= 1
+
+    def _dispatch(self):
+        """
+        Boş slotları sırayla, çalışabilecek en öncelikli bekleyenlere verir. _condition tutulurken çağrılır.
+        """
+        for waiter in list(self._waiters):
+            if self.in_flight >= self.max_concurrency:
+                break
+            priority_class = waiter.priority_class
+            if not self._can_run(priority_class):
+                continue
+            self._remove(waiter)
+            waiter.granted = True
+            waited = time.monotonic() - waiter.start_time
+            priority_class.admitted += 1
+            priority_class.in_flight += 1
+            priority_class.total_wait_seconds += waited
+            priority_class.max_wait_seconds = max(priority_class.max_wait_seconds, waited)
+            self.in_flight += 1
+            if waiter.future is not None:
+                waiter.future.get_loop().call_soon_threadsafe(_resolve, waiter.future)
+        self._condition.notify_all()
+
+    def _release(self, priority_class: PriorityClass):
+        priority_class.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def acquire(self, name: str):
+        """
+        Slot alınana kadar çağıran thread'i bloklar.
+        """
+        with self._condition:
+            waiter = self._enqueue(name)
+            deadline = waiter.start_time + waiter.priority_class.queue_timeout
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(waiter)
+                    waiter.priority_class.rejected += 1
+                    raise AdmissionRejected(name, f"waited more than {waiter.priority_class.queue_timeout}s")
+                self._condition.wait(remaining)
+
+    async def aacquire(self, name: str):
+        """
+        Slot alınana kadar thread tutmadan event loop'ta bekler.
+        """
+        with self._condition:
+            waiter = self._enqueue(name, asyncio.get_running_loop().create_future())
+        priority_class = waiter.priority_class
+        try:
+            await asyncio.wait((waiter.future,), timeout=priority_class.queue_timeout)
+        except asyncio.CancelledError:
+            with self._condition:
+                if waiter.granted:
+                    self._release(priority_class)
+                else:
+                    self._remove(waiter)
+            raise
+        with self._condition:
+            if not waiter.granted:
+                self._remove(waiter)
+                priority_class.rejected += 1
+                raise AdmissionRejected(name, f"waited more than {priority_class.queue_timeout}s")
+
+    def release(self, name: str):
+        with self._condition:
+            self._release(self.priority_classes[name])
+
+    @contextmanager
+    def slot(self, name: str):
+        held = _held_slot.get()
+        if held is not None:
+            # Çağıran zaten bir slot tutuyor; slot sırayla paylaşılır (bkz. _HeldSlot)
+            with held.thread_lock:
+                yield
+            return
+        self.acquire(name)
+        held = _HeldSlot(name)
+        token = _held_slot.set(held)
+        try:
+            with held.thread_lock:
+                yield
+        finally:
+            _held_slot.reset(token)
+            self.release(name)
+
+    @asynccontextmanager
+    async def aslot(self, name: str):
+        held = _held_slot.get()
+        if held is not None:
+            async with held.task_lock:
+                yield
+            return
+        await self.aacquire(name)
+        held = _HeldSlot(name)
+        token = _held_slot.set(held)
+        try:
+            async with held.task_lock:
+                yield
+        finally:
+            _held_slot.reset(token)
+            self.release(name)
+
+    def metrics(self) -> dict:
+        with self._condition:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "classes": {
+                    name: {
+                        "priority": pc.priority,
+                        "in_flight": pc.in_flight,
+                        "queued": pc.queued,
+                        "admitted": pc.admitted,
+                        "rejected": pc.rejected,
+                        "avg_wait_seconds": round(pc.total_wait_seconds / pc.admitted, 4) if pc.admitted else 0.0,
+                        "max_wait_seconds": round(pc.max_wait_seconds, 4),
+                    }
+                    for name, pc in self.priority_classes.items()
+                }
+            }
+
+
+if __name__ == "__main__":
+    pass
@@ -2,32 +2,39 @@ from dataclasses import dataclass
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Union
 import xml.etree.ElementTree as ET
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import AIMessage
 from langchain.agents import AgentType, Tool, initialize_agent
 from langchain.chains import LLMChain
 import json
+import threading
+from collections import OrderedDict
 from langchain_core.tools import tool
 from langchain.prompts import PromptTemplate
 import requests
 from app.rag_pipeline import RagPipeline
+from app.admission import AdmissionRejected
+from app.llm_provider import LLMProvider
+from app.context_packer import ContextPacker
 import os
-from dotenv import load_dotenv
+
+FALLBACK_FEEDBACK = "Cevabın yanlış. Doğru cevabı kontrol etmeni öneririm."
 
 @dataclass
 class QuizGeneratorAgent:
 
     rag_pipeline: RagPipeline
     logger: any
+    llm_provider: LLMProvider
     retrieved_chunk_threshold_for_agent_quiz: float = 0.7
+    feedback_cache_size: int = 512
 
     def __post_init__(self):
-        load_dotenv()
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-            temperature=0.2
-        )
+        # (question, student_answer, correct_answer) -> feedback, LRU
+        # Değerlendirmeler asyncio.to_thread ile paralel çalıştığı için cache erişimi kilitlenir
+        self.feedback_cache = OrderedDict()
+        self._feedback_cache_lock = threading.Lock()
+        self.llm = self.llm_provider.get("quiz")
+        self.context_packer = ContextPacker(max_tokens=self.llm_provider.context_budget("quiz"), logger=self.logger)
 
         @tool
         def quiz_generate(student_quiz_keywords: str, user_id: str) -> dict:
@@ -36,15 +43,18 @@ class QuizGeneratorAgent:
             Her soru A, B, C, D ve E şıkları içermeli ve doğru cevabı belirtmelidir.
             """
             vector_docs = self.rag_pipeline.query_with_scores(student_quiz_keywords, user_id=user_id, k=5)
-            context_chunks = []
+            relevant_docs = []
             for doc, score in vector_docs:
                 self.logger.info(f"Doc Skoru: {score:.4f} | İçerik: {doc.page_content[:100]}...")
                 
                 if score >= self.retrieved_chunk_threshold_for_agent_quiz:
-                    context_chunks.append(doc.page_content)
+                    relevant_docs.append((doc, score))
                 else:
                     self.logger.warning(f"Düşük skorlu doküman filtrelendi (Skor: {score:.4f}): {doc.page_content[:50]}...")
 
+            # Chunk'lar tekrarları elenip quiz rolünün token bütçesine sığdırılır; prompt'a liste repr'i değil düz metin girer.
+            context_chunks = "\n\n---\n\n".join(doc.page_content for doc, _ in self.context_packer.pack(relevant_docs))
+
             prompt = f"""
             Sen bir öğretmen agentsin. Aşağıdaki metinlere ve öğrencinin verdiği konuya göre 10 adet çoktan seçmeli (MCQ) soru üret.
 
@@ -101,6 +111,14 @@ class QuizGeneratorAgent:
                     "is_correct": True
                 }
             
+            cached_feedback = self._get_cached_feedback(question, student_answer, correct_answer)
+            if cached_feedback is not None:
+                return {
+                    "feedback": f"❌ {cached_feedback}",
+                    "score": 0.0,
+                    "is_correct": False
+                }
+
             # Yanlışsa LLM ile geri bildirim oluştur
             prompt = f"""
             Sen bir öğretmensin. Aşağıda çoktan seçmeli bir soru, öğrencinin cevabı ve doğru cevap verilmiştir.
@@ -125,9 +143,13 @@ class QuizGeneratorAgent:
             try:
                 response = self.llm.invoke(prompt)
                 feedback = response.content.strip()
+                self._set_cached_feedback(question, student_answer, correct_answer, feedback)
+            except AdmissionRejected:
+                # Yük altında reddedilen istek 503 olarak dönmeli, yedek geri bildirimle gizlenmemeli
+                raise
             except Exception as e:
                 self.logger.error(f"LLM feedback hatası: {e}")
-                feedback = "Cevabın yanlış. Doğru cevabı kontrol etmeni öneririm."
+                feedback = FALLBACK_FEEDBACK
 
             return {
                 "feedback": f"❌ {feedback}",
@@ -137,6 +159,131 @@ class QuizGeneratorAgent:
 
         self.evaluate_answer_tool = evaluate_answer_tool
 
+    def _get_cached_feedback(self, question: str, student_answer: str, correct_answer: str) -> Optional[str]:
+        key = (question, student_answer, correct_answer)
+        with self._feedback_cache_lock:
+            feedback = self.feedback_cache.get(key)
+            if feedback is not None:
+                self.feedback_cache.move_to_end(key)
+        return feedback
+
+    def _set_cached_feedback(self, question: str, student_answer: str, correct_answer: str, feedback: str):
+        key = (question, student_answer, correct_answer)
+        with self._feedback_cache_lock:
+            self.feedback_cache[key] = feedback
+            self.feedback_cache.move_to_end(key)
+            while len(self.feedback_cache) > self.feedback_cache_size:
+                self.feedback_cache.popitem(last=False)
+
+    def generate_batch_feedback(self, wrong_items: List[dict]) -> List[str]:
+        """
+        Birden fazla yanlış cevap için tek bir LLM çağrısı ile geri bildirim üretir.
+
+        Args:
+            wrong_items (List[dict]): Her biri {'question', 'answer', 'correct_answer'} içeren liste.
+
+        Returns:
+            List[str]: wrong_items ile aynı sırada geri bildirimler.
+        """
+        if not wrong_items:
+            return []
+
+        numbered_items = "\n\n".join(
+            f"[{idx}]\nSoru: {item['question']}\nÖğrencinin cevabı: {item['answer']}\nDoğru cevap: {item['correct_answer']}"
+            for idx, item in enumerate(wrong_items)
+        )
+
+        prompt = f"""
+        Sen bir öğretmensin. Aşağıda numaralandırılmış çoktan seçmeli sorular, öğrencinin yanlış cevapları ve doğru cevaplar verilmiştir.
+
+        {numbered_items}
+
+        Her soru için öğrenciye samimi, anlaşılır ve öğretici bir geri bildirim ver:
+
+        - Neden bu cevabın doğru olmadığını açıkla.
+        - Doğru cevabın neden doğru olduğunu sade bir dille belirt.
+        - Öğrenciyi teşvik et, motive edici bir cümleyle bitir.
+        - **Başlık veya yapay ayrımlar kullanma** (örneğin: "Doğru cevap:", "Yanlış cevap:", "Cesaretlendirme:" gibi ifadelerden kaçın).
+        - Dil sade, profesyonel ve cesaret verici olsun.
+        - Doğru şıkkı mutlaka cümle içerisinde belirt.
+
+        Cevabı sadece aşağıdaki JSON formatında, soruların numara sırasıyla dön:
+        [
+            {{"index": 0, "feedback": "..."}},
+            ...
+        ]
+        """
+
+        feedbacks = [FALLBACK_FEEDBACK] * len(wrong_items)
+        try:
+            response = self.llm.invoke(prompt)
+            parsed = json.loads(self.extract_json_from_code_block(response.content))
+            for entry in parsed:
+                idx = int(entry.get("index", -1))
+                if 0 <= idx < len(wrong_items) and entry.get("feedback"):
+                    feedbacks[idx] = str(entry["feedback"]).strip()
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            self.logger.error(f"LLM toplu feedback hatası: {e}")
+        return feedbacks
+
+    def evaluate_batch(self, answers: List[dict], user_id: int) -> dict:
+        """
+        Quiz sonunda tüm cevap kağıdını değerlendirir.
+
+        Doğru cevaplar LLM'e gitmeden lokal olarak puanlanır. Yanlış cevapların geri bildirimi
+        önce cache'den, cache'de olmayanlar ise tek bir LLM çağrısı ile üretilir.
+
+        Args:
+            answers (List[dict]): Her biri {'question', 'answer', 'correct_answer'} içeren liste.
+            user_id (int): Öğrencinin id'si.
+
+        Returns:
+            dict: {'results': [{'feedback', 'score', 'is_correct'}, ...], 'total_score': float}
+        """
+        results = [None] * len(answers)
+        pending = {}
+
+        for idx, item in enumerate(answers):
+            question = item.get("question")
+            student_answer = item.get("answer")
+            correct_answer = item.get("correct_answer")
+
+            if student_answer == correct_answer:
+                results[idx] = {
+                    "feedback": f"✅ Doğru cevap! Cevabın ({student_answer}) doğru.",
+                    "score": 10.0,
+                    "is_correct": True
+                }
+                continue
+
+            cached_feedback = self._get_cached_feedback(question, student_answer, correct_answer)
+            if cached_feedback is not None:
+                results[idx] = {"feedback": f"❌ {cached_feedback}", "score": 0.0, "is_correct": False}
+                continue
+
+            # Aynı (soru, cevap) çifti tek sefer LLM'e gider
+            key = (question, student_answer, correct_answer)
+            pending.setdefault(key, []).append(idx)
+
+        if pending:
+            self.logger.info(f"Batch evaluation for user {user_id}: {len(pending)} wrong answers sent to LLM in one call.")
+            keys = list(pending.keys())
+            feedbacks = self.generate_batch_feedback([
+                {"question": q, "answer": a, "correct_answer": c} for q, a, c in keys
+            ])
+            for key, feedback in zip(keys, feedbacks):
+                if feedback != FALLBACK_FEEDBACK:
+                    self._set_cached_feedback(*key, feedback)
+                for idx in pending[key]:
+                    results[idx] = {"feedback": f"❌ {feedback}", "score": 0.0, "is_correct": False}
+
+        return {
+            "results": results,
+            "total_score": sum(result["score"] for result in results)
+        }
+
     def extract_json_from_code_block(self, text: str) -> str:
         """
         LLM çıktısı eğer ```json ... ``` formatında gelirse, sadece JSON içeriğini çıkarır.
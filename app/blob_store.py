@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+import gzip
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+
+@dataclass
+class BlobStore:
+    """
+    Not gövdeleri için içerik adresli (content-addressed) blob store.
+
+    Her gövde SHA-256 özeti ile anahtarlanır ve gzip'lenmiş olarak bir kere saklanır:
+        {directory}/{digest[:2]}/{digest}.gz
+    Aynı metin kaç kere eklenirse eklensin diskte tek kopyası olur; notlar sadece digest'i tutar.
+
+    Kaynak indeksi (sources/) pahalı işlemlerden önce tekrarları yakalamak içindir: kaynağın
+    kendisinin özeti (YouTube video id + dil, PDF byte'ları) -> çıkarılan metnin digest'i.
+    Aynı kaynak tekrar geldiğinde transkript/parse adımı atlanır ve metin buradan okunur. Kaynak
+    kaydı metnin segmentlerini de (ör. PDF sayfalarının span'leri) taşır; böylece tekrar gelen bir
+    PDF yine sayfa sayfa indekslenir.
+
+    Args
+    directory(str)          : Blob'ların tutulduğu kök klasör.
+    compression_level(int)  : gzip sıkıştırma seviyesi (1-9).
+    """
+
+    directory: str
+    logger: any
+    compression_level: int = 6
+
+    def __post_init__(self):
+        os.makedirs(os.path.join(self.directory, "sources"), exist_ok=True)
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @classmethod
+    def text_digest(cls, text: str) -> str:
+        return cls.digest(text.encode("utf-8"))
+
+    @classmethod
+    def source_key(cls, kind: str, *parts) -> str:
+        """
+        Kaynağı tanımlayan anahtar; ör. source_key("youtube", video_id, "tr") ya da source_key("pdf", pdf_digest).
+        """
+        return cls.digest(":".join([kind, *map(str, parts)]).encode("utf-8"))
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.gz")
+
+    def _source_path(self, source_key: str) -> str:
+        return os.path.join(self.directory, "sources", source_key)
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._blob_path(digest))
+
+    def put(self, data: bytes) -> str:
+        """
+        Veriyi saklar ve digest'ini döndürür. Aynı içerik zaten varsa tekrar yazılmaz.
+        """
+        digest = self.digest(data)
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            return digest
+        # mtime=0: aynı içerik her zaman aynı byte'lara sıkıştırılır
+        self._atomic_write(path, gzip.compress(data, compresslevel=self.compression_level, mtime=0))
+        return digest
+
+    def put_text(self, text: str) -> str:
+        return self.put(text.encode("utf-8"))
+
+    def get(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def get_text(self, digest: str) -> str:
+        return self.get(digest).decode("utf-8")
+
+    def size(self, digest: str) -> int:
+        """
+        Açılmış (sıkıştırılmamış) boyut. gzip'in son 4 byte'ı (ISIZE) okunur, blob açılmaz.
+        Blob'lar tek gzip üyesi olarak yazılır ve 4 GiB'den küçüktür.
+        """
+        with open(self._blob_path(digest), "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack("<I", f.read(4))[0]
+
+    def iter_range(self, digest: str, start: int = 0, end: Optional[int] = None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Açılmış içeriğin [start, end] (end dahil) aralığını chunk_size'lık parçalar halinde üretir.
+        Başlangıca kadar olan kısım akış halinde açılıp atlanır; bellekte aynı anda tek parça tutulur.
+        """
+        with gzip.open(self._blob_path(digest), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def _read_source(self, source_key: str) -> Optional[dict]:
+        try:
+            with open(self._source_path(source_key), "r", encoding="utf-8") as f:
+                content = f.read().strip()
+        except FileNotFoundError:
+            return None
+        # Eski kayıtlar sadece digest'i tutar
+        record = json.loads(content) if content.startswith("{") else {"digest": content}
+        return record if self.exists(record["digest"]) else None
+
+    def lookup_source(self, source_key: str) -> Optional[str]:
+        """
+        Kaynak daha önce işlendiyse çıkarılan metnin digest'ini döndürür, yoksa None.
+        """
+        record = self._read_source(source_key)
+        return record["digest"] if record else None
+
+    def source_segments(self, source_key: str) -> Optional[List[dict]]:
+        """
+        Kaynakla birlikte kaydedilmiş segmentler (her biri metin içinde bir "span" taşır); yoksa None.
+        """
+        record = self._read_source(source_key)
+        return record.get("segments") if record else None
+
+    def link_source(self, source_key: str, digest: str, segments: Optional[List[dict]] = None):
+        record = {"digest": digest, "segments": segments} if segments else {"digest": digest}
+        self._atomic_write(self._source_path(source_key), json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+
+if __name__ == "__main__":
+    pass
@@ -2,7 +2,6 @@ from dataclasses import dataclass
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Union
 import xml.etree.ElementTree as ET
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import AIMessage
 from langchain.agents import AgentType, Tool, initialize_agent
 from langchain.chains import LLMChain
@@ -11,21 +10,18 @@ from langchain_core.tools import tool
 from langchain.prompts import PromptTemplate
 import requests
 from app.rag_pipeline import RagPipeline
+from app.admission import AdmissionRejected
+from app.llm_provider import LLMProvider
 import os
-from dotenv import load_dotenv
 
 @dataclass
 class ChallengeGenerator:
 
     logger: any
+    llm_provider: LLMProvider
 
     def __post_init__(self):
-        load_dotenv()
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-            temperature=0.2
-        )
+        self.llm = self.llm_provider.get("challenge")
 
         @tool
         def quiz_generate(student_quiz_keywords: str, user_id: str) -> dict:
@@ -112,6 +108,8 @@ class ChallengeGenerator:
             try:
                 response = self.llm.invoke(prompt)
                 feedback = response.content.strip()
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 self.logger.error(f"LLM feedback hatası: {e}")
                 feedback = "Cevabın yanlış. Doğru cevabı kontrol etmeni öneririm."
@@ -0,0 +1,107 @@
+from dataclasses import dataclass, field
+from typing import Dict
+import asyncio
+import time
+from fastapi import BackgroundTasks
+from app.chatbot import Chatbot
+from app.context_aware_summarizer import Summarizer
+from app.crud import CRUDOperations
+from app.models.models import QuestionAnswer
+
+
+@dataclass
+class StageTimer:
+    """
+    Bir isteğin pipeline aşamalarının sürelerini (saniye) toplar.
+    """
+
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    async def run(self, name: str, coro):
+        start_time = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.timings[name] = time.perf_counter() - start_time
+
+    def summary(self) -> str:
+        return ", ".join(f"{name}={seconds:.3f}s" for name, seconds in self.timings.items())
+
+
+@dataclass
+class ChatPipeline:
+    """
+    /ask-question için aşamalı async pipeline.
+
+    Aşamalar:
+        1. history + summary  ─┐ (birbirinden bağımsız, eş zamanlı çalışır)
+        2. retrieval          ─┘
+        3. generation (1 ve 2'nin sonuçlarını kullanır)
+        4. persist (QuestionAnswer kaydı, cevap döndükten sonra background task olarak)
+    """
+
+    chatbot: Chatbot
+    summarizer: Summarizer
+    crud: CRUDOperations
+    logger: any
+    top_k: int = 3
+
+    async def history_stage(self, user_id: int) -> str:
+        # Database'den kullanıcının son 3 soru-cevap çiftini getir.
+        # Kısa bir unit of work: bağlantı summary/generation süresince tutulmaz.
+        async with self.crud.session_scope(read_only=True, user_id=user_id) as session:
+            context_aware = await self.crud.get_last_3_conversations_by_user(session, user_id)
+        if not context_aware:
+            return ""
+
+        # Burada bu context aware'i summarize edilir.
+        summarized_context_aware = await self.summarizer.llm_provider.run("summarizer", self.summarizer.sumarize, context_aware)
+        self.logger.info(f"summarized context aware: {summarized_context_aware}")
+        return summarized_context_aware
+
+    async def retrieval_stage(self, subject_id: str, question: str, user_id: int) -> list:
+        return await asyncio.to_thread(self.chatbot.retrieve, subject_id, question, user_id, self.top_k)
+
+    async def generation_stage(self, subject_id: str, question: str, summarized_context_aware: str, filtered_results: list) -> str:
+        return await self.chatbot.llm_provider.run("chat", self.chatbot.generate, subject_id, question, summarized_context_aware, filtered_results)
+
+    async def persist_stage(self, user_id: int, question: str, answer: str):
+        start_time = time.perf_counter()
+        question_answer = QuestionAnswer(
+            user_id=user_id,
+            question=question,
+            answer=answer
+        )
+        async with self.crud.session_scope(user_id=user_id) as session:
+            await self.crud.create(session, question_answer)
+        self.logger.info(f"[ChatPipeline] user={user_id} persist={time.perf_counter() - start_time:.3f}s")
+
+    async def run(self, subject_id: str, question: str, user_id: int, background_tasks: BackgroundTasks) -> tuple:
+        """
+        (cevap, kaynaklar) döndürür; video kaynakları zaman damgası ve videonun o anına giden link içerir.
+        """
+        timer = StageTimer()
+        start_time = time.perf_counter()
+
+        summarized_context_aware, filtered_results = await asyncio.gather(
+            timer.run("history_summary", self.history_stage(user_id)),
+            timer.run("retrieval", self.retrieval_stage(subject_id, question, user_id)),
+        )
+
+        answer = await timer.run(
+            "generation",
+            self.generation_stage(subject_id, question, summarized_context_aware, filtered_results)
+        )
+
+        # Kayıt cevabı bekletmesin, response döndükten sonra yazılır.
+        background_tasks.add_task(self.persist_stage, user_id, question, answer)
+
+        self.logger.info(
+            f"[ChatPipeline] user={user_id} subject={subject_id} {timer.summary()} "
+            f"total={time.perf_counter() - start_time:.3f}s"
+        )
+        return answer, self.chatbot.sources(filtered_results)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,23 +1,48 @@
 from dataclasses import dataclass
 from langchain_core.runnables import Runnable
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from app.rag_pipeline import RagPipeline
-from dotenv import load_dotenv
+from app.llm_provider import LLMProvider
+from app.context_packer import ContextPacker
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def describe_source(metadata: dict) -> dict:
+    """
+    Retrieval sonucunun kaynağını döndürür; video segmentleri için videonun o anına giden link de eklenir.
+    """
+    source = {"label": metadata.get("label"), "subject_id": metadata.get("subject_id")}
+    if metadata.get("page"):
+        source["page"] = metadata["page"]
+    if metadata.get("video_id"):
+        start = metadata.get("start") or 0
+        source.update({
+            "video_id": metadata["video_id"],
+            "start": start,
+            "end": metadata.get("end"),
+            "timestamp": format_timestamp(start),
+            "url": f"https://www.youtube.com/watch?v={metadata['video_id']}&t={int(start)}s",
+        })
+    return source
+
 
 @dataclass
 class Chatbot:
     
     rag_pipeline: RagPipeline
-    model_name: str
+    llm_provider: LLMProvider
     logger: any
-    temperature: float = 0.2
 
     def __post_init__(self):
-        load_dotenv()
         self.logger.info("Initializing Chat LLM...")
-        self.llm = ChatGoogleGenerativeAI(model=self.model_name, temperature=self.temperature)
+        self.llm = self.llm_provider.get("chat")
+        self.context_packer = ContextPacker(max_tokens=self.llm_provider.context_budget("chat"), logger=self.logger)
 
         self.prompt_template = PromptTemplate.from_template(
             """
@@ -29,6 +54,7 @@ class Chatbot:
 
             If the question is in Turkish, answer in Turkish.
             If the question is in English, answer in English.
+            If you use a context passage that has a video link, cite that link so the student can jump to that moment.
 
             Previous Conversation:
             {summarized_context_aware}
@@ -44,10 +70,11 @@ class Chatbot:
         )
         self.output_parser = StrOutputParser()
 
-    def ask_question(self, subject_id: str, question: str, user_id: int, summarized_context_aware: str, top_k: int = 3):
-
-        self.logger.info(f"Asking question for subject '{subject_id}' by user {user_id}: {question}")
-        
+    def retrieve(self, subject_id: str, question: str, user_id: int, top_k: int = 3):
+        """
+        Kullanıcının vektör veritabanından soruya en yakın dokümanları getirir ve
+        sadece ilgili derse ait olanları, tekrarları elenmiş ve token bütçesine sığdırılmış olarak döndürür.
+        """
         results_with_scores = self.rag_pipeline.query_with_scores(question, user_id=user_id, k=top_k)
 
         self.logger.info(f"results from RAG: {results_with_scores}")
@@ -61,10 +88,26 @@ class Chatbot:
             self.logger.warning("No relevant context found. Returning fallback answer.")
             # return "Bu konuda yeterli bilgi bulunamadı."
 
-        context = "\n".join([doc.page_content for doc, _ in filtered_results])
+        return self.context_packer.pack(filtered_results)
+
+    @staticmethod
+    def format_context(doc) -> str:
+        source = describe_source(doc.metadata)
+        if "url" in source:
+            return f"[Video {source['timestamp']} - {source['url']}]\n{doc.page_content}"
+        return doc.page_content
+
+    def sources(self, filtered_results: list) -> list:
+        return [{**describe_source(doc.metadata), "score": float(score)} for doc, score in filtered_results]
+
+    def generate(self, subject_id: str, question: str, summarized_context_aware: str, filtered_results: list):
+        """
+        Retrieval sonuçları ve özetlenmiş konuşma geçmişi ile LLM'den cevap üretir.
+        """
+        context = "\n".join([self.format_context(doc) for doc, _ in filtered_results])
 
         chain = self.prompt_template | self.llm | self.output_parser
-        
+
         # Burada summarized edilmiş geçmiş konuşmalar olacak
         previous_context = ""
 
@@ -78,6 +121,14 @@ class Chatbot:
 
         return answer
 
+    def ask_question(self, subject_id: str, question: str, user_id: int, summarized_context_aware: str, top_k: int = 3):
+
+        self.logger.info(f"Asking question for subject '{subject_id}' by user {user_id}: {question}")
+
+        filtered_results = self.retrieve(subject_id, question, user_id, top_k=top_k)
+
+        return self.generate(subject_id, question, summarized_context_aware, filtered_results)
+
 
 if __name__ == "__main__":
     from app.logger import Logger
@@ -94,10 +145,11 @@ if __name__ == "__main__":
         "vector_db_directory": "vector_db"
     }
     rag_pipeline = RagPipeline(**config, logger=logger)
+    llm_provider = LLMProvider(model_name="gemini-2.5-flash", logger=logger)
 
     chatbot = Chatbot(
         rag_pipeline=rag_pipeline,
-        model_name="gemini-2.5-flash",
+        llm_provider=llm_provider,
         logger=logger
     )
 
@@ -1,11 +1,16 @@
-from dataclasses import dataclass
-from sqlalchemy import create_engine
+from dataclasses import dataclass, field
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker, AsyncEngine
 from sqlalchemy.ext.declarative import declarative_base
 from app.models.models import Base
 from app.logger import Logger
 from app.handler import custom_db_connection_handler, connection_handler
+from app.migrations import MigrationRunner
+from app.health import HealthState
+import itertools
 import time
 import asyncio
 
@@ -20,39 +25,120 @@ class Connection:
     db_port: str
     db_name: str
     logger: Logger
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 100
+    run_migrations: bool = True
+    replica_dsns: List[str] = field(default_factory=list)
+    startup_timeout: float = 60
+    connect_base_delay: float = 0.5
+    connect_max_delay: float = 8
+    health: Optional[HealthState] = None
 
     def __post_init__(self):
+        if self.health is None:
+            self.health = HealthState()
         self.engine = None
         self.session_maker = None
-        self.session = None
+        self.replica_engines = []
+        self.replica_session_makers = []
+        self._replica_cycle = None
 
     @connection_handler
+    async def wait_until_reachable(self):
+        # Retry ve startup_timeout sadece bağlantının kurulmasını kapsar
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
     async def connect(self):
         print("connect denedi")
+        await self.wait_until_reachable()
+        # Şema kurulumu ve migration'lar deadline dışında, tek sefer çalışır: uzun süren bir migration
+        # (ör. büyük tabloda index) yarıda iptal edilip baştan tekrar denenmez. Hata olursa açılış durur.
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
-
-    @custom_db_connection_handler
-    async def get_session(self) -> AsyncSession:
-        return self.session()
+        # create_all mevcut tablolara kolon/index eklemez; bunlar versiyonlu migration'larla tamamlanır.
+        if self.run_migrations:
+            await MigrationRunner(engine=self.engine, logger=self.logger).run()
+
+    def _build_engine(self, database_url: str) -> AsyncEngine:
+        return create_async_engine(
+            database_url,
+            echo=False,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            pool_pre_ping=self.pool_pre_ping,
+            connect_args={"statement_cache_size": self.statement_cache_size}
+        )
 
     @custom_db_connection_handler
     async def create_engine(self):
         self.database_url = f"{self.database_type}+asyncpg://{self.db_username}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
-        self.engine = create_async_engine(self.database_url, echo=False)
+        self.engine = self._build_engine(self.database_url)
+        # Read replica'lar: her biri kendi pool'u ile ayrı bir engine
+        self.replica_engines = [self._build_engine(dsn) for dsn in self.replica_dsns]
+
+    async def ping(self, timeout: float = 2) -> bool:
+        """
+        Pool'dan bir bağlantı alıp SELECT 1 çalıştırır; pool gerçekten kullanılabilir mi kontrol eder.
+        """
+        async def _ping():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        await asyncio.wait_for(_ping(), timeout=timeout)
+        return True
 
     @custom_db_connection_handler
     async def get_engine(self) -> AsyncEngine:
         return self.engine
 
     @custom_db_connection_handler
-    async def create_session(self):
+    async def create_session_maker(self):
         self.session_maker = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
-        self.session = self.session_maker()
+        self.replica_session_makers = [
+            async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            for engine in self.replica_engines
+        ]
+        self._replica_cycle = itertools.cycle(self.replica_session_makers) if self.replica_session_makers else None
+
+    @asynccontextmanager
+    async def session_scope(self, read_only: bool = False) -> AsyncIterator[AsyncSession]:
+        """
+        Tek bir unit of work için yeni bir session açar. Blok hatasız biterse tek seferde commit,
+        hata olursa rollback yapılır ve session her durumda kapatılıp bağlantı pool'a geri verilir.
+
+        read_only=True ve tanımlı replica varsa session replica'lar arasında sırayla (round-robin)
+        dağıtılır; replica yoksa primary kullanılır.
+
+        session.info["after_commit"] listesine eklenen callback'ler sadece commit başarılı olursa
+        çağrılır (ör. bellekteki cache'lerin güncellenmesi).
+        """
+        use_replica = read_only and self._replica_cycle is not None
+        session_maker = next(self._replica_cycle) if use_replica else self.session_maker
+        async with session_maker() as session:
+            session.info["read_only"] = use_replica
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                # Rollback edilen değişikliklerin callback'leri hiç çalışmamalı
+                session.info.pop("after_commit", None)
+                await session.rollback()
+                raise
+            for callback in session.info.pop("after_commit", []):
+                callback()
 
     @custom_db_connection_handler
-    async def close_session(self):
-        await self.session.close()
+    async def dispose_engine(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
 
 
 
@@ -1,15 +1,13 @@
 from dataclasses import dataclass
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
+from app.llm_provider import LLMProvider
 
 @dataclass
 class Summarizer:
 
-    summarizer_model_name: str
+    llm_provider: LLMProvider
 
     def __post_init__(self):
-        load_dotenv()
-        self.llm = ChatGoogleGenerativeAI(model=self.summarizer_model_name)
+        self.llm = self.llm_provider.get("summarizer")
 
 
     def sumarize(self, text):
@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import re
+from langchain_core.documents import Document
+
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+@dataclass
+class ContextPacker:
+    """
+    Retrieval sonuçlarını prompt'a girecek context'e, token bütçesini aşmadan yerleştirir.
+
+    1. Sonuçlar skora göre sıralanır (FAISS skoru L2 mesafesidir, küçük olan daha yakındır).
+    2. Tekrarlar elenir: aynı blob'un örtüşen aralıklarından (ör. örtüşen video segmentleri) sadece
+       daha önce seçilmemiş kısım alınır; blob'u olmayan chunk'larda kelimelerinin çoğu seçilmiş bir
+       chunk'ta geçen chunk atlanır.
+    3. Bütçe dolana kadar chunk eklenir; sığmayan chunk kalan bütçe kadar kısaltılır, kalan bütçe
+       min_chunk_tokens'tan azsa atlanır (daha kısa, düşük skorlu bir chunk hâlâ sığabilir).
+
+    Token sayısı lokal bir tahmindir (kelime + noktalama sayısı * token_factor); model tokenizer'ı
+    gerekmez. Türkçe eklemeli kelimeler birden fazla token'a bölündüğü için token_factor 1'den büyüktür.
+
+    Args
+    max_tokens(int)             : Context için varsayılan token bütçesi.
+    token_factor(float)         : Kelime başına tahmini token.
+    chunk_overhead_tokens(int)  : Chunk başına ayraç/başlık payı.
+    min_chunk_tokens(int)       : Kısaltılmış bir chunk'ın en az uzunluğu; daha azı eklenmez.
+    duplicate_threshold(float)  : Kelimelerinin bu oranı seçilmiş bir chunk'ta geçen chunk tekrar sayılır.
+    """
+
+    logger: any
+    max_tokens: int = 4000
+    token_factor: float = 1.4
+    chunk_overhead_tokens: int = 16
+    min_chunk_tokens: int = 64
+    duplicate_threshold: float = 0.8
+
+    def estimate_tokens(self, text: str) -> int:
+        return int(len(TOKEN_PATTERN.findall(text)) * self.token_factor)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Metni tahmini max_tokens token'a kısaltır (kelime sınırında).
+        """
+        max_words = int(max_tokens / self.token_factor)
+        matches = list(TOKEN_PATTERN.finditer(text))
+        if len(matches) <= max_words:
+            return text
+        return text[:matches[max_words - 1].end()] if max_words > 0 else ""
+
+    def _new_span(self, doc: Document, taken: dict) -> Optional[Tuple[int, int]]:
+        """
+        Chunk'ın aynı blob'da daha önce seçilmiş aralıklarla örtüşmeyen kısmını döndürür.
+        Örtüşmeyen kısım bölünüyorsa (iki ucu da seçilmişse) tamamı tekrar sayılır.
+        """
+        start, end = doc.metadata["span"]
+        for taken_start, taken_end in taken.get(doc.metadata["blob"], []):
+            if taken_start <= start < taken_end:
+                start = taken_end
+            if taken_start < end <= taken_end:
+                end = taken_start
+            if start >= end or (start < taken_start and taken_end < end):
+                return None
+        return start, end
+
+    @staticmethod
+    def _clip(text: str, span: List[int], new_span: Tuple[int, int]) -> Tuple[str, Tuple[int, int]]:
+        """
+        Chunk metnini new_span'e kırpar ve baştaki/sondaki boşlukları atar; dönen span metinle birebir örtüşür.
+        """
+        raw = text[new_span[0] - span[0]:new_span[1] - span[0]]
+        start = new_span[0] + len(raw) - len(raw.lstrip())
+        clipped = raw.strip()
+        return clipped, (start, start + len(clipped))
+
+    @staticmethod
+    def _clipped_metadata(metadata: dict, span: Optional[Tuple[int, int]]) -> dict:
+        """
+        Kırpılan ya da kısaltılan chunk'ın metadata'sı: span yeni aralığa çekilir, video zamanları
+        (start, end) metindeki konuma göre orantılı olarak tahmin edilir. Sayfa değişmez.
+        """
+        updated = dict(metadata)
+        original = metadata.get("span")
+        if span is None or not original:
+            return updated
+        updated["span"] = list(span)
+        start, end = metadata.get("start"), metadata.get("end")
+        length = original[1] - original[0]
+        if start is not None and end is not None and length > 0:
+            updated["start"] = round(start + (end - start) * (span[0] - original[0]) / length, 2)
+            updated["end"] = round(start + (end - start) * (span[1] - original[0]) / length, 2)
+        return updated
+
+    def _is_duplicate(self, text: str, seen: List[set]) -> bool:
+        words = set(word.lower() for word in re.findall(r"\w+", text))
+        if not words:
+            return True
+        return any(len(words & other) / len(words) >= self.duplicate_threshold for other in seen)
+
+    def pack(self, results: List[tuple], max_tokens: Optional[int] = None) -> List[tuple]:
+        """
+        (doc, score) listesini bütçeye göre paketler ve yine (doc, score) listesi döndürür.
+        Kısaltılan ya da kırpılan chunk'lar için page_content'i ve metadata'sı (span, video zamanları)
+        güncellenmiş yeni bir Document üretilir; gelen Document'lar değiştirilmez.
+        """
+        budget = max_tokens or self.max_tokens
+        remaining = budget
+        packed = []
+        taken_spans: dict = {}
+        seen_words: List[set] = []
+
+        for doc, score in sorted(results, key=lambda result: result[1]):
+            text = doc.page_content
+            span = doc.metadata.get("span")
+            blob = doc.metadata.get("blob")
+            current_span = tuple(span) if span else None
+
+            if blob and span:
+                new_span = self._new_span(doc, taken_spans)
+                if new_span is None:
+                    continue
+                text, current_span = self._clip(text, span, new_span)
+                if not text:
+                    continue
+            elif self._is_duplicate(text, seen_words):
+                continue
+
+            available = remaining - self.chunk_overhead_tokens
+            tokens = self.estimate_tokens(text)
+            if tokens > available:
+                if available < self.min_chunk_tokens:
+                    continue
+                # Kelime sınırında baştan kısaltılır: span'ın başı aynı kalır
+                text = self.truncate(text, available)
+                tokens = self.estimate_tokens(text)
+                if current_span:
+                    current_span = (current_span[0], current_span[0] + len(text))
+
+            if blob and span:
+                taken_spans.setdefault(blob, []).append(current_span)
+            else:
+                seen_words.append(set(word.lower() for word in re.findall(r"\w+", text)))
+            if text == doc.page_content:
+                packed.append((doc, score))
+            else:
+                packed.append((Document(page_content=text, metadata=self._clipped_metadata(doc.metadata, current_span)), score))
+            remaining -= tokens + self.chunk_overhead_tokens
+
+        self.logger.info(f"[ContextPacker] {len(packed)}/{len(results)} chunks packed, ~{budget - remaining} tokens (budget {budget}).")
+        return packed
+
+
+if __name__ == "__main__":
+    pass
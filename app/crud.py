@@ -1,13 +1,43 @@
 from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from dataclasses import field
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, and_, case, func, text
 from app.connection import Connection
-from typing import Union
+from typing import Union, List
 from app.logger import Logger
 from sqlalchemy import select, desc
+from datetime import timedelta
 from app.models.models import QuestionAnswer, Challenges, UserScore, User, WrongAnswer
-from app.handler import custom_db_crud_handler
+from app.handler import custom_db_crud_handler, custom_db_read_handler
+from app.leaderboard import Leaderboard
+from app.health import HealthState
+from app.utils import verify_token_from_cookie
+from sqlalchemy.dialects.postgresql import insert
 import asyncio
+import time
+
+
+# Cevap dizisindeki i. eleman quiz'in i. sorusunun correct_answer'ı ile karşılaştırılır
+SCORE_CHALLENGE_SQL = text("""
+    UPDATE challenges SET
+        sender_score = (
+            SELECT count(*) FROM jsonb_array_elements(quiz_json -> 'questions') WITH ORDINALITY AS q(question, idx)
+            WHERE q.question ->> 'correct_answer' = sender_answer_for_challenge ->> (q.idx::int - 1)
+        ),
+        receiver_score = (
+            SELECT count(*) FROM jsonb_array_elements(quiz_json -> 'questions') WITH ORDINALITY AS q(question, idx)
+            WHERE q.question ->> 'correct_answer' = receiver_answer_for_challenge ->> (q.idx::int - 1)
+        ),
+        finished_at = coalesce(finished_at, timezone('utc', now()))
+    WHERE id = :challenge_id
+        AND sender_score IS NULL
+        AND sender_answer_for_challenge IS NOT NULL
+        AND receiver_answer_for_challenge IS NOT NULL
+    RETURNING sender_score, receiver_score
+""")
 
 
 @dataclass
@@ -20,100 +50,241 @@ class CRUDOperations:
     db_port: str
     db_name: str
     logger: Logger
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 100
+    run_migrations: bool = True
+    replica_dsns: List[str] = field(default_factory=list)
+    read_your_writes_seconds: float = 5
+    history_window_days: int = 30
+    startup_timeout: float = 60
+    connect_base_delay: float = 0.5
+    connect_max_delay: float = 8
+    leaderboard_size: int = 50
+    leaderboard_refresh_seconds: float = 60
+
+    def __post_init__(self):
+        self.leaderboard = Leaderboard(capacity=self.leaderboard_size, refresh_seconds=self.leaderboard_refresh_seconds)
+        self.health = HealthState()
+        # user_id -> kullanıcının son commit edilen yazmasının zamanı (time.monotonic)
+        self._last_write: Dict[int, float] = {}
 
     async def initialize(self):
+        """
+        Engine'i, connection pool'u ve şema kontrolünü (create_all) uygulama ömrü boyunca
+        bir kere oluşturur. FastAPI lifespan hook'undan çağrılır.
+        """
         self.connection = Connection(database_type = self.database_type,
                                      db_username = self.db_username,
                                      db_password = self.db_password,
                                      db_host = self.db_host,
                                      db_port = self.db_port,
                                      db_name = self.db_name,
-                                     logger = self.logger)
+                                     logger = self.logger,
+                                     pool_size = self.pool_size,
+                                     max_overflow = self.max_overflow,
+                                     pool_timeout = self.pool_timeout,
+                                     pool_recycle = self.pool_recycle,
+                                     pool_pre_ping = self.pool_pre_ping,
+                                     statement_cache_size = self.statement_cache_size,
+                                     run_migrations = self.run_migrations,
+                                     replica_dsns = self.replica_dsns,
+                                     startup_timeout = self.startup_timeout,
+                                     connect_base_delay = self.connect_base_delay,
+                                     connect_max_delay = self.connect_max_delay,
+                                     health = self.health)
         await self.connection.create_engine()
         await self.connection.connect()
-        await self.connection.create_session()
+        await self.connection.create_session_maker()
+        # Trafik ancak pool'dan gerçekten bağlantı alınabildiğinde kabul edilir
+        await self.connection.ping()
+        self.health.mark_ready()
+
+    async def check_health(self, timeout: float = 2) -> HealthState:
+        """
+        /readyz için: veritabanına kısa bir ping atar ve sağlık durumunu günceller.
+        Açılış henüz bitmediyse (ya da başarısız olduysa) veritabanına gidilmez.
+        """
+        if self.health.status not in ("ready", "degraded"):
+            return self.health
+        try:
+            await self.connection.ping(timeout=timeout)
+            self.health.mark_ready()
+        except Exception as e:
+            self.logger.warning(f"Database health check failed: {e!r}")
+            self.health.record_failure(e)
+        return self.health
+
+    async def shutdown(self):
+        """
+        Uygulama kapanırken connection pool'u temiz bir şekilde kapatır.
+        """
+        self.health.mark_stopping()
+        await self.connection.dispose_engine()
+        self.logger.info("Database engine disposed.")
+
+    def recently_wrote(self, user_id: Optional[int]) -> bool:
+        """
+        Kullanıcı read_your_writes_seconds içinde yazma yaptıysa True döner; bu kullanıcının
+        okumaları replica gecikmesi yüzünden kendi yazmasını kaçırmasın diye primary'ye gider.
+        """
+        if user_id is None:
+            return False
+        last_write = self._last_write.get(user_id)
+        if last_write is None:
+            return False
+        if time.monotonic() - last_write < self.read_your_writes_seconds:
+            return True
+        self._last_write.pop(user_id, None)
+        return False
+
+    @asynccontextmanager
+    async def session_scope(self, read_only: bool = False, user_id: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+        """
+        Background task'ler gibi bir HTTP isteğine bağlı olmayan işler için unit of work.
+
+        read_only=True ise session replica'ya yönlendirilir (kullanıcı yakın zamanda yazma
+        yapmadıysa). Session'da yazma yapan bir metod çalıştıysa commit'ten sonra kullanıcı
+        read-your-writes süresince primary'ye sabitlenir.
+        """
+        use_replica = read_only and not self.recently_wrote(user_id)
+        async with self.connection.session_scope(read_only=use_replica) as session:
+            yield session
+        if user_id is not None and session.info.get("wrote"):
+            self._last_write[user_id] = time.monotonic()
+
+    @staticmethod
+    def request_user_id(request: Request) -> Optional[int]:
+        payload = verify_token_from_cookie(request)
+        return int(payload["sub"]) if payload else None
+
+    async def get_session(self, request: Request) -> AsyncIterator[AsyncSession]:
+        """
+        FastAPI dependency'si: her istek kendi (primary) session'ını alır, istek sonunda tek commit yapılır.
+        """
+        async with self.session_scope(user_id=self.request_user_id(request)) as session:
+            yield session
+
+    async def get_read_session(self, request: Request) -> AsyncIterator[AsyncSession]:
+        """
+        Sadece okuma yapan endpoint'ler için FastAPI dependency'si: replica'ya yönlendirilir.
+        """
+        async with self.session_scope(read_only=True, user_id=self.request_user_id(request)) as session:
+            yield session
 
     @custom_db_crud_handler
-    async def create(self, obj: any) -> bool:
+    async def create(self, session: AsyncSession, obj: any) -> bool:
         """
-        Adds the given object to the database asynchronously.
+        Adds the given object to the current unit of work.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             obj (any): The object to be added to the database.
 
         Returns:
-            bool: True if the operation is successful, False if an error occurs.
+            bool: True if the operation is successful. Errors are raised and roll back the unit of work.
         """
-        self.connection.session.add(obj)
-        await self.connection.session.commit()
+        session.add(obj)
+        await session.flush()  # ID'leri doldurur, commit unit of work sonunda yapılır
         self.logger.info(f"the data: {obj} is added into the database.")
+        return True
+
+
+    @custom_db_crud_handler
+    async def bulk_create(self, session: AsyncSession, model: any, rows: List[dict]) -> int:
+        """
+        Inserts many rows of the given model with a single executemany statement
+        in the current unit of work (tek transaction, tek commit).
+
+        Args:
+            session (AsyncSession): Session of the current unit of work.
+            model (any): The model whose table the rows are inserted into.
+            rows (List[dict]): Column -> value dictionaries.
+
+        Returns:
+            int: Number of inserted rows.
+        """
+        if not rows:
+            return 0
+
+        await session.execute(insert(model), rows)
+        self.logger.info(f"{len(rows)} rows are bulk inserted into {model.__tablename__}.")
+        return len(rows)
 
     
     @custom_db_crud_handler
-    async def create_challenge(self, challenge: Challenges) -> Challenges:
+    async def create_challenge(self, session: AsyncSession, challenge: Challenges) -> Challenges:
         """
         Creates a new Challenge entry in the database and returns the object with ID.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             challenge (Challenges): The challenge instance to add.
 
         Returns:
             Challenges: The created challenge with ID populated.
         """
-        self.connection.session.add(challenge)
-        await self.connection.session.commit()
-        await self.connection.session.refresh(challenge)  # Challenge nesnesine ID'yi yükler
+        session.add(challenge)
+        await session.flush()  # Challenge nesnesine ID'yi yükler
         self.logger.info(f"Challenge created: {challenge}")
         return challenge
     
 
     @custom_db_crud_handler
-    async def update_challenge(self, challenge: Challenges) -> bool:
+    async def update_challenge(self, session: AsyncSession, challenge: Challenges) -> bool:
         """
         Updates a Challenge entry in the database.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             challenge (Challenges): The challenge object with updated fields.
 
         Returns:
             bool: True if successful, False otherwise.
         """
-        await self.connection.session.merge(challenge)  # Merge güncel halini DB’ye yazar
-        await self.connection.session.commit()
+        await session.merge(challenge)  # Merge güncel halini session'a yazar
+        await session.flush()
         self.logger.info(f"Challenge updated successfully: ID {challenge.id}")
         return True
 
 
-    @custom_db_crud_handler
-    async def read_by_id(self, model: any, obj_id: int) -> Union[bool, dict]:
+    @custom_db_read_handler
+    async def read_by_id(self, session: AsyncSession, model: any, obj_id: int) -> Optional[dict]:
         """
         Retrieves a record from the database by its ID asynchronously.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             model (any): The model to query.
             obj_id (int): The ID of the object to retrieve.
 
         Returns:
-            Union[bool, dict]: The retrieved object if found, or False if an error occurs.
+            Optional[dict]: The retrieved object, None if there is no row with the given ID.
         """
-        result = await self.connection.session.get(model, obj_id)
-        await self.connection.close_session()
+        result = await session.get(model, obj_id)
+        if result is None:
+            self.logger.info(f"No {model.__name__} found with ID {obj_id}")
+            return None
         self.logger.info(f"Data read successfully: {result.to_dict()}")
         return result.to_dict()
     
     @custom_db_crud_handler
-    async def read_challenge_by_id(self, challenge_id: int):
+    async def read_challenge_by_id(self, session: AsyncSession, challenge_id: int, for_update: bool = False):
         """
         Retrieves a Challenge object by its ID.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             challenge_id (int): The ID of the challenge.
+            for_update (bool): Satırı unit of work sonuna kadar kilitler (SELECT ... FOR UPDATE).
 
         Returns:
             Challenges | None: The Challenge object if found, None otherwise.
         """
-        challenge = await self.connection.session.get(Challenges, challenge_id)
-        await self.connection.close_session()
+        challenge = await session.get(Challenges, challenge_id, with_for_update=for_update)
 
         if challenge:
             self.logger.info(f"Challenge found: {challenge}")
@@ -123,37 +294,38 @@ class CRUDOperations:
         return challenge
 
 
-    @custom_db_crud_handler
-    async def read_all(self, model: any) -> Union[list, bool]:
+    @custom_db_read_handler
+    async def read_all(self, session: AsyncSession, model: any) -> Union[list, bool]:
         """
         Retrieves all records of the given model asynchronously.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             model (any): The model to query.
 
         Returns:
-            Union[list, bool]: A list of retrieved objects if successful, or False if an error occurs.
+            list: A list of retrieved objects.
         """
-        result = await self.connection.session.execute(model.__table__.select())
-        await self.connection.close_session()
-        self.logger.info(f"Data read successfully: {result.to_dict()}")
-        return result.all()
+        result = await session.execute(select(model))
+        rows = result.scalars().all()
+        self.logger.info(f"Data read successfully: {len(rows)} records of {model.__tablename__}")
+        return rows
 
     @custom_db_crud_handler
-    async def update(self, model: any, obj_id: int, new_data: dict) -> bool:
+    async def update(self, session: AsyncSession, model: any, obj_id: int, new_data: dict) -> bool:
         """
         Updates a record in the database based on its ID asynchronously.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             model (any): The model in which the record exists.
             obj_id (int): The ID of the object to be updated.
             new_data (dict): The new data containing updated values.
 
         Returns:
-            bool: True if the update is successful, False if an error occurs.
+            bool: True if the update is successful, False if the object is not found.
         """
-        new_data = new_data.to_dict()
-        object_will_be_change = await self.connection.session.get(model, obj_id)
+        object_will_be_change = await session.get(model, obj_id)
 
         if object_will_be_change is None:
             self.logger.info("Object not found.")
@@ -162,26 +334,27 @@ class CRUDOperations:
         for key, value in new_data.items():
             setattr(object_will_be_change, key, value)
 
-        await self.connection.session.commit()
-        await self.connection.close_session()
+        await session.flush()
         self.logger.info(f"Data is updated successfully from: {object_will_be_change.to_dict()}, to: {new_data}")
+        return True
 
     @custom_db_crud_handler
-    async def delete_by_id(self, model: any, obj_id: int) -> bool:
+    async def delete_by_id(self, session: AsyncSession, model: any, obj_id: int) -> bool:
         """
         Deletes a record from the database based on its ID asynchronously.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             model (any): The model from which the record should be deleted.
             obj_id (int): The ID of the object to delete.
 
         Returns:
-            bool: True if the deletion is successful, False if an error occurs.
+            bool: True if the deletion is successful, False if the object is not found.
         """
-        obj = await self.connection.session.get(model, obj_id)
+        obj = await session.get(model, obj_id)
         if obj:
-            await self.connection.session.delete(obj)
-            await self.connection.session.commit()
+            await session.delete(obj)
+            await session.flush()
             self.logger.info(f"Data is deleted successfully: {obj.to_dict()}")
             return True
         else:
@@ -189,36 +362,36 @@ class CRUDOperations:
             return False
     
     @custom_db_crud_handler
-    async def delete_challenge_by_id(self, challenge_id: int) -> bool:
+    async def delete_challenge_by_id(self, session: AsyncSession, challenge_id: int) -> bool:
         """
         Deletes a Challenge record by its ID.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             challenge_id (int): ID of the challenge to delete.
 
         Returns:
-            bool: True if deleted, False if not found or failed.
+            bool: True if deleted, False if not found.
         """
-        challenge = await self.connection.session.get(Challenges, challenge_id)
+        challenge = await session.get(Challenges, challenge_id)
         
         if challenge:
-            await self.connection.session.delete(challenge)
-            await self.connection.session.commit()
-            await self.connection.close_session()
+            await session.delete(challenge)
+            await session.flush()
             self.logger.info(f"Challenge deleted successfully: ID {challenge_id}")
             return True
         else:
             self.logger.info(f"No Challenge found with ID {challenge_id}")
-            await self.connection.close_session()
             return False
         
     
     @custom_db_crud_handler
-    async def mark_challenge_as_accepted(self, challenge_id: int, user_id: int) -> bool:
+    async def mark_challenge_as_accepted(self, session: AsyncSession, challenge_id: int, user_id: int) -> bool:
         """
         Marks a challenge as accepted by receiver if the user is the receiver.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             challenge_id (int): ID of the challenge to accept.
             user_id (int): ID of the receiver (for validation).
 
@@ -226,38 +399,35 @@ class CRUDOperations:
             bool: True if successfully marked, False otherwise.
         """
         stmt = select(Challenges).where(Challenges.id == challenge_id)
-        result = await self.connection.session.execute(stmt)
+        result = await session.execute(stmt)
         challenge = result.scalar_one_or_none()
 
         if not challenge or challenge.challenge_receiver_id != user_id:
-            await self.connection.close_session()
             return False
 
         challenge.accepted_receiver = True
-        await self.connection.session.commit()
-        await self.connection.close_session()
+        await session.flush()
         self.logger.info(f"Challenge {challenge_id} accepted by user {user_id}")
         return True
     
         
-    @custom_db_crud_handler
-    async def read_by_email(self, model: any, email: str):
+    @custom_db_read_handler
+    async def read_by_email(self, session: AsyncSession, model: any, email: str):
         """
         Retrieves a record from the database by email asynchronously.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             model (any): The model to query.
             email (str): The email address to search for.
 
         Returns:
-            Union[bool, any]: The matched object if found, or False if not found or error occurs.
+            any: The matched object if found, otherwise None.
         """
         stmt = select(model).where(model.email == email)
-        result = await self.connection.session.execute(stmt)
+        result = await session.execute(stmt)
         user = result.scalar_one_or_none()
 
-        await self.connection.close_session()
-
         if user:
             self.logger.info(f"User with email '{email}' found: {user.to_dict()}")
         else:
@@ -265,28 +435,35 @@ class CRUDOperations:
 
         return user
     
-    @custom_db_crud_handler
-    async def get_last_n_conversation(self, user_id: int, n: int = 5):
-        async with self.connection.session() as session:
-            result = await session.execute(
-                select(QuestionAnswer)
-                .where(QuestionAnswer.user_id == user_id)
-                .order_by(desc(QuestionAnswer.created_at))
-                .limit(n)
-            )
-            return result.scalars().all()
+    def recent_history_filter(self):
+        """
+        question_answers aylık partition'lı olduğu için geçmiş sorguları son history_window_days
+        ile sınırlanır; planner sadece sıcak (içinde bulunulan ve bir önceki ay) partition'lara bakar.
+        """
+        return QuestionAnswer.created_at >= func.now() - timedelta(days=self.history_window_days)
 
+    @custom_db_read_handler
+    async def get_last_n_conversation(self, session: AsyncSession, user_id: int, n: int = 5):
+        result = await session.execute(
+            select(QuestionAnswer)
+            .where(QuestionAnswer.user_id == user_id, self.recent_history_filter())
+            .order_by(desc(QuestionAnswer.created_at))
+            .limit(n)
+        )
+        return result.scalars().all()
 
-    @custom_db_crud_handler
-    async def read_challenges(self, filters: dict = None) -> Union[list, bool]:
+
+    @custom_db_read_handler
+    async def read_challenges(self, session: AsyncSession, filters: dict = None) -> Union[list, bool]:
         """
         Retrieves challenges from the database with optional filtering.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             filters (dict, optional): Filter conditions as a dictionary. Defaults to None.
 
         Returns:
-            Union[list, bool]: List of Challenges objects or False if error.
+            list: List of Challenges objects.
         """
         stmt = select(Challenges)
 
@@ -294,97 +471,222 @@ class CRUDOperations:
             for key, value in filters.items():
                 stmt = stmt.where(getattr(Challenges, key) == value)
 
-        result = await self.connection.session.execute(stmt)
+        result = await session.execute(stmt)
         challenges = result.scalars().all()
 
-        await self.connection.close_session()
-
         self.logger.info(f"Challenges read with filters: {filters}. Found: {len(challenges)} records.")
         return challenges
     
-    @custom_db_crud_handler
-    async def read_challenges_for_user(self, user_id: int):
+    @custom_db_read_handler
+    async def read_pending_challenges(self, session: AsyncSession, user_id: int) -> list:
+        """
+        Kullanıcıya gelen ve henüz kabul edilmemiş challenge'ları sadece (id, topic) olarak getirir.
+        quiz_json satırları okunmaz; topic kolonu boşsa ilk soru JSONB'den sunucu tarafında çıkarılır.
+
+        Args:
+            session (AsyncSession): Session of the current unit of work.
+            user_id (int): ID of the receiver.
+
+        Returns:
+            list: (id, topic) satırları.
+        """
+        topic = func.coalesce(
+            Challenges.topic,
+            Challenges.quiz_json["questions"][0]["question"].astext,
+            "Bilinmeyen Konu"
+        )
+        result = await session.execute(
+            select(Challenges.id, topic.label("topic"))
+            .where(
+                Challenges.challenge_receiver_id == user_id,
+                Challenges.accepted_receiver == False
+            )
+            .order_by(Challenges.id.desc())
+        )
+        return result.all()
+
+    @custom_db_read_handler
+    async def read_challenges_for_user(self, session: AsyncSession, user_id: int, limit: int = 20, before_id: int = None):
+        """
+        Kullanıcının tamamlanmış challenge'larını rakibin e-postası ile birlikte tek bir join sorgusunda getirir.
+        Keyset pagination: id'ye göre azalan sırada, before_id'den küçük kayıtlar döner.
+
+        Args:
+            session (AsyncSession): Session of the current unit of work.
+            user_id (int): ID of the user.
+            limit (int): Sayfa boyutu.
+            before_id (int, optional): Bir önceki sayfanın son challenge id'si.
+
+        Returns:
+            list: (id, challenge_sender_id, challenge_receiver_id, sender_score, receiver_score, finished_at, opponent_email) satırları.
+        """
+        opponent_id = case(
+            (Challenges.challenge_sender_id == user_id, Challenges.challenge_receiver_id),
+            else_=Challenges.challenge_sender_id
+        )
         query = (
-            select(Challenges)
+            select(
+                Challenges.id,
+                Challenges.challenge_sender_id,
+                Challenges.challenge_receiver_id,
+                Challenges.sender_score,
+                Challenges.receiver_score,
+                Challenges.finished_at,
+                User.email.label("opponent_email")
+            )
+            .outerjoin(User, User.id == opponent_id)
             .where(
                 or_(
                     Challenges.challenge_sender_id == user_id,
                     Challenges.challenge_receiver_id == user_id
+                ),
+                and_(
+                    Challenges.sender_answer_for_challenge.isnot(None),
+                    Challenges.receiver_answer_for_challenge.isnot(None)
                 )
             )
+            .order_by(Challenges.id.desc())
+            .limit(limit)
         )
-        result = await self.connection.session.execute(query)
-        return result.scalars().all()
-    
+        if before_id is not None:
+            query = query.where(Challenges.id < before_id)
+
+        result = await session.execute(query)
+        return result.all()
+
     @custom_db_crud_handler
-    async def get_or_create_user_score(self, user_id: int):
-        score = await self.connection.session.get(UserScore, user_id)
+    async def score_challenge(self, session: AsyncSession, challenge_id: int):
+        """
+        İki taraf da cevapladıysa skorları JSONB üzerinde SQL ile hesaplayıp tek bir UPDATE ile saklar.
+        Skorlar zaten hesaplanmışsa satır güncellenmez; böylece eş zamanlı istekler puanı iki kere vermez.
+        Skor kolonlarından önce bitmiş challenge'lar da aynı yolla tamamlanır (finished_at korunur).
+
+        Args:
+            session (AsyncSession): Session of the current unit of work.
+            challenge_id (int): ID of the challenge.
+
+        Returns:
+            tuple | None: (sender_score, receiver_score), bu çağrı skorlamadıysa None.
+        """
+        result = await session.execute(SCORE_CHALLENGE_SQL, {"challenge_id": challenge_id})
+        row = result.first()
+        if row is None:
+            return None
+        self.logger.info(f"Challenge {challenge_id} scored: {row.sender_score} - {row.receiver_score}")
+        return row.sender_score, row.receiver_score
+
+    @custom_db_crud_handler
+    async def get_or_create_user_score(self, session: AsyncSession, user_id: int):
+        score = await session.get(UserScore, user_id)
         if score is None:
             score = UserScore(user_id=user_id, total_score=0)
-            self.connection.session.add(score)
-            await self.connection.session.commit()
-            await self.connection.session.refresh(score)
+            session.add(score)
+            await session.flush()
         return score
 
     @custom_db_crud_handler
-    async def update_user_score(self, user_id: int, points: int):
-        async with self.connection.session as session:
-            async with session.begin():
-                result = await session.execute(select(UserScore).where(UserScore.user_id == user_id))
-                user_score = result.scalar_one_or_none()
-                
-                if user_score is None:
-                    # Yeni kullanıcı skoru başlat
-                    user_score = UserScore(user_id=user_id, total_score=points)
-                    session.add(user_score)
-                else:
-                    user_score.total_score += points
-
-            await session.commit()
-            return user_score.total_score
+    async def update_user_score(self, session: AsyncSession, user_id: int, points: int):
+        """
+        Kullanıcının puanını tek bir atomik INSERT ... ON CONFLICT DO UPDATE ... RETURNING ile artırır.
+        Eş zamanlı challenge sonuçlarında güncelleme kaybolmaz. Commit sonrası bellekteki
+        leaderboard artımlı olarak güncellenir.
+
+        Args:
+            session (AsyncSession): Session of the current unit of work.
+            user_id (int): ID of the user.
+            points (int): Eklenecek puan.
+
+        Returns:
+            int: Kullanıcının yeni toplam puanı.
+        """
+        stmt = (
+            insert(UserScore)
+            .values(user_id=user_id, total_score=points)
+            .on_conflict_do_update(
+                index_elements=[UserScore.user_id],
+                set_={"total_score": UserScore.total_score + points}
+            )
+            .returning(UserScore.total_score)
+        )
+        result = await session.execute(stmt)
+        total_score = result.scalar_one()
+
+        # Listeye yeni girecek kullanıcı için isim bilgisi lazım; sadece o durumda okunur
+        username = email = None
+        leaderboard_active = self.leaderboard.loaded_at is not None or self.leaderboard.loading
+        if leaderboard_active and self.leaderboard.qualifies(user_id, total_score):
+            user_row = (await session.execute(select(User.username, User.email).where(User.id == user_id))).one_or_none()
+            if user_row:
+                username, email = user_row.username, user_row.email
+
+        session.info.setdefault("after_commit", []).append(
+            lambda: self.leaderboard.apply(user_id, total_score, username=username, email=email)
+        )
+        return total_score
     
-    @custom_db_crud_handler
-    async def get_user_score_by_id(self, user_id: int) -> int:
-        score = await self.connection.session.get(UserScore, user_id)
-        await self.connection.close_session()
+    @custom_db_read_handler
+    async def get_user_score_by_id(self, session: AsyncSession, user_id: int) -> int:
+        score = await session.get(UserScore, user_id)
         return score.total_score if score else 0
     
-    @custom_db_crud_handler
-    async def get_top_users_by_score(self, limit: int = 5):
+    @custom_db_read_handler
+    async def get_top_users_by_score(self, session: AsyncSession, limit: int = 5):
         """
         Retrieves top N users sorted by their total_score in descending order.
-        """
-        stmt = (
-            select(UserScore.user_id, User.username, User.email, UserScore.total_score)
-            .join(User, User.id == UserScore.user_id)
-            .order_by(UserScore.total_score.desc())
-            .limit(limit)
-        )
 
-        result = await self.connection.session.execute(stmt)
-        rows = result.all()
-        await self.connection.close_session()
+        Bellekteki leaderboard tazeyse veritabanına gidilmeden döner. Değilse
+        leaderboard kapasitesi kadar kullanıcı (total_score index'i üzerinden) okunup cache yenilenir.
+        Eş zamanlı istekler tek yüklemeyi bekler; replica'dan okunan eski puanlar bellekteki
+        daha yeni puanları ezmez (bkz. Leaderboard.load).
+        """
+        if self.leaderboard.is_fresh(limit):
+            return self.leaderboard.top(limit)
+
+        async with self.leaderboard.load_lock:
+            # Kilidi beklerken başka bir istek yüklemiş olabilir
+            if self.leaderboard.is_fresh(limit):
+                return self.leaderboard.top(limit)
+
+            fetch_limit = max(limit, self.leaderboard.capacity)
+            stmt = (
+                select(UserScore.user_id, User.username, User.email, UserScore.total_score)
+                .join(User, User.id == UserScore.user_id)
+                .order_by(UserScore.total_score.desc())
+                .limit(fetch_limit)
+            )
 
-        top_users = [
-            {
-                "user_id": row.user_id,
-                "username": row.username,
-                "email": row.email,
-                "score": row.total_score
-            }
-            for row in rows
-        ]
+            self.leaderboard.begin_load()
+            try:
+                result = await session.execute(stmt)
+                rows = result.all()
+            except BaseException:
+                self.leaderboard.abort_load()
+                raise
+
+            top_users = [
+                {
+                    "user_id": row.user_id,
+                    "username": row.username,
+                    "email": row.email,
+                    "score": row.total_score
+                }
+                for row in rows
+            ]
+            self.leaderboard.load(top_users)
 
         self.logger.info(f"Top {limit} users retrieved for global ranking.")
-        return top_users
+        if limit > self.leaderboard.capacity:
+            return top_users[:limit]
+        return self.leaderboard.top(limit)
     
 
-    @custom_db_crud_handler
-    async def get_last_wrong_answers(self, user_id: int, limit: int = 5):
+    @custom_db_read_handler
+    async def get_last_wrong_answers(self, session: AsyncSession, user_id: int, limit: int = 5):
         """
         Retrieves the last `limit` wrong answers for a specific user.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             user_id (int): ID of the user.
             limit (int): Number of records to retrieve (default 5).
 
@@ -397,17 +699,18 @@ class CRUDOperations:
             .order_by(desc(WrongAnswer.created_at))  # veya created_at varsa onunla sırala
             .limit(limit)
         )
-        result = await self.connection.session.execute(stmt)
+        result = await session.execute(stmt)
         return result.scalars().all()
     
 
-    @custom_db_crud_handler
-    async def get_last_3_conversations_by_user(self, user_id: int) -> str:
+    @custom_db_read_handler
+    async def get_last_3_conversations_by_user(self, session: AsyncSession, user_id: int) -> str:
         """
         Retrieves the last 3 question-answer pairs for a given user_id and returns
         them as a single concatenated string.
 
         Args:
+            session (AsyncSession): Session of the current unit of work.
             user_id (int): ID of the user.
 
         Returns:
@@ -415,20 +718,17 @@ class CRUDOperations:
         """
         stmt = (
             select(QuestionAnswer)
-            .where(QuestionAnswer.user_id == user_id)
+            .where(QuestionAnswer.user_id == user_id, self.recent_history_filter())
             .order_by(desc(QuestionAnswer.created_at))
             .limit(3)
         )
 
-        result = await self.connection.session.execute(stmt)
+        result = await session.execute(stmt)
         qa_list = result.scalars().all()
-        await self.connection.close_session()
 
         combined = "\n\n".join([f"Q: {qa.question}\nA: {qa.answer}" for qa in qa_list])
         self.logger.info(f"Combined last 3 conversations retrieved for user_id {user_id}")
         return combined
-    
-
 
 
 
@@ -436,8 +736,9 @@ async def main(crud):
     await crud.initialize()
     user= User(name = "Akif", age = 25)
     print(crud)
-    #await crud.create(user)
-    x = await crud.read_by_id(User,6)
+    async with crud.session_scope() as session:
+        #await crud.create(session, user)
+        x = await crud.read_by_id(session, User, 6)
     print(x)
 
 
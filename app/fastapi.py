@@ -1,26 +1,29 @@
 from jose import jwt, JWTError
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import uvicorn
 from fastapi import FastAPI, Request, Depends, Response, status, UploadFile, File, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi import Form, Request
 from fastapi import BackgroundTasks
-from typing import List
+from typing import Dict, List
+from contextlib import asynccontextmanager, suppress
 from uuid import uuid4
 from app.logger import Logger
-import tempfile
 import os
+import asyncio
 import json
+import time
 from app.utils import verify_password, hash_password, create_access_token
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, StreamingResponse, Response
 from app.video_transcriper import VideoTranscript
-from app.json_handler import JsonHandler
+from app.json_handler import InvalidSubjectError, JsonHandler
 from app.regex import regex_for_id_extracting_from_the_link
 from urllib.parse import urlencode
 from app.label_extractor_from_video import LabelExtractor
-from app.utils import verify_password, verify_token_from_cookie
+from app.utils import verify_password, verify_token_from_cookie, parse_byte_range, spool_upload_to_disk
 from app.chatbot import Chatbot
+from app.chat_pipeline import ChatPipeline
 from app.context_aware_summarizer import Summarizer
 from app.rag_pipeline import RagPipeline
 from app.models.models import QuestionAnswer, Challenges, WrongAnswer
@@ -28,7 +31,12 @@ from app.agent import QuizGeneratorAgent
 from app. challenge_generator import ChallengeGenerator
 from app.flash_card_agent import FlashCardAgent
 from app.crud import CRUDOperations
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.llm_provider import LLMProvider
+from app.admission import AdmissionRejected
+from app.retention import RetentionJob
 from app.pdf_parser import PdfParser
+from app.ingestion import BulkIngestor, IngestionItem
 from app.models.models import User
 
 
@@ -40,30 +48,41 @@ class FastAPIServer:
     port: int
     reload: bool
     log_level: str
-    chatbot_model_name: str
-    temperature_for_chatbot: float
-    summarizer_model_name: str
     crud: CRUDOperations
     transcripter: VideoTranscript
     label_extractor: LabelExtractor
     json_handler: JsonHandler
     rag_pipeline: RagPipeline
+    llm_provider: LLMProvider
+    retention: RetentionJob
     logger: Logger
     retrieved_chunk_threshold_for_agent_quiz: float = 0.7
+    pdf_parser_workers: int = 2
+    ingestion: Dict[str, any] = field(default_factory=dict)
 
 
     def __post_init__(self):
-        self.app = FastAPI()
+        self.app = FastAPI(lifespan=self.lifespan)
         #self.crud = CRUDOperations(self.database_type, )
         self.templates = Jinja2Templates(directory="app/templates")
         self.app.mount(f"/static", StaticFiles(directory="app/static"), name="static")
         self.logger.info("Fastapi init")
-        self.pdf_parser = PdfParser()
-        self.summerizer = Summarizer(summarizer_model_name=self.summarizer_model_name)
-        self.challenge_generator = ChallengeGenerator(logger=self.logger)
-        self.flas_card_agent = FlashCardAgent(logger=self.logger)
-        self.agent = QuizGeneratorAgent(self.rag_pipeline, retrieved_chunk_threshold_for_agent_quiz = self.retrieved_chunk_threshold_for_agent_quiz, logger=self.logger)
-        self.chatbot = Chatbot(rag_pipeline=self.rag_pipeline, model_name=self.chatbot_model_name, temperature=self.temperature_for_chatbot, logger=self.logger)
+        self.pdf_parser = PdfParser(max_workers=self.pdf_parser_workers)
+        self.bulk_ingestor = BulkIngestor(
+            **self.ingestion,
+            transcripter=self.transcripter,
+            pdf_parser=self.pdf_parser,
+            label_extractor=self.label_extractor,
+            json_handler=self.json_handler,
+            rag_pipeline=self.rag_pipeline,
+            logger=self.logger
+        )
+        self.summerizer = Summarizer(llm_provider=self.llm_provider)
+        self.challenge_generator = ChallengeGenerator(logger=self.logger, llm_provider=self.llm_provider)
+        self.flas_card_agent = FlashCardAgent(logger=self.logger, llm_provider=self.llm_provider)
+        self.agent = QuizGeneratorAgent(self.rag_pipeline, retrieved_chunk_threshold_for_agent_quiz = self.retrieved_chunk_threshold_for_agent_quiz, logger=self.logger, llm_provider=self.llm_provider)
+        self.chatbot = Chatbot(rag_pipeline=self.rag_pipeline, llm_provider=self.llm_provider, logger=self.logger)
+        self.chat_pipeline = ChatPipeline(chatbot=self.chatbot, summarizer=self.summerizer, crud=self.crud, logger=self.logger)
 
         self.challenge_messages = []
 
@@ -81,12 +100,87 @@ class FastAPIServer:
             "felsefe":"Felsefe"
         }
 
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        # Engine, connection pool ve şema kontrolü her istekte değil, uygulama açılırken bir kere yapılır.
+        await self.crud.initialize()
+        self.logger.info("Database engine initialized.")
+        await self.retention.prepare(self.crud.connection.engine)
+        retention_task = asyncio.create_task(self.retention.run_forever())
+        try:
+            yield
+        finally:
+            # Retention task'ı engine kapanmadan önce gerçekten durmalı
+            retention_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await retention_task
+            await asyncio.to_thread(self.json_handler.close)
+            self.pdf_parser.close()
+            await self.crud.shutdown()
+
+    def duplicate_note_redirect(self, subject_id: str):
+        params = urlencode({"subject": subject_id, "success": "1", "duplicate": "1"})
+        return RedirectResponse(url=f"/subject?{params}", status_code=303)
+
+    async def save_note(self, subject_id: str, user_id: int, text: str, source: str = None, segments: List[dict] = None, video_id: str = None):
+        """
+        Çıkarılan metni etiketler, kaydeder ve sadece yeni notu vector database'e ekler.
+        segments verilirse her segment (PDF sayfası ya da video zaman penceresi) ayrı chunk olarak indekslenir.
+        Aynı içerik derste zaten varsa etiketleme ve embedding yapılmaz, None döner.
+        """
+        text = text.strip()
+        blob_store = self.json_handler.blob_store
+        digest = blob_store.text_digest(text)
+        if source is not None:
+            # Metin segmentleriyle birlikte kaydedilir ve kaynağa bağlanır: aynı kaynak tekrar geldiğinde
+            # transkript/parse atlanır, not yine segment segment indekslenir
+            await asyncio.to_thread(blob_store.put_text, text)
+            await asyncio.to_thread(blob_store.link_source, source, digest, segments)
+
+        if await asyncio.to_thread(self.json_handler.find_note, user_id, subject_id, blob=digest):
+            return None
+
+        label = await self.label_extractor.aextract(subject_id, text)
+
+        saved_note = await asyncio.to_thread(
+            self.json_handler.add_note_to_subject,
+            subject_id=subject_id,
+            user_id=user_id,
+            label=label,
+            note_text=text,
+            source=source
+        )
+
+        # Chunk'lar blob store'dan okunur, embedding ve FAISS load/save senkrondur: event loop bloklanmasın.
+        # Aynı kullanıcının index'ine eş zamanlı yazmalar update_vector_db içinde sıraya girer.
+        if segments:
+            note_chunks = await asyncio.to_thread(self.rag_pipeline.segments_to_chunks, saved_note, segments, subject_id=subject_id, user_id=user_id, video_id=video_id)
+        else:
+            note_chunks = await asyncio.to_thread(self.rag_pipeline.notes_to_chunks, [saved_note], subject_id=subject_id, user_id=user_id)
+        await asyncio.to_thread(self.rag_pipeline.update_vector_db, note_chunks, user_id)
+        return saved_note
+
     def run(self):
         self.server()
         self.logger.info("Server Initialized!")
         uvicorn.run(app=self.app, host=self.host, port=self.port, log_level=self.log_level)
 
     def server(self):
+        @self.app.exception_handler(AdmissionRejected)
+        async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+            # LLM kuyruğu dolu: isteği bekletmek yerine hızlıca 503 dön
+            self.logger.warning(f"Load shedding: {exc}")
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Sistem şu anda yoğun, lütfen biraz sonra tekrar deneyin."},
+                headers={"Retry-After": "5"}
+            )
+
+        @self.app.exception_handler(InvalidSubjectError)
+        async def invalid_subject_handler(request: Request, exc: InvalidSubjectError):
+            self.logger.warning(f"Rejected request: {exc}")
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Geçersiz ders."})
+
         @self.app.get("/")
         async def base(request: Request):
             token = request.cookies.get("access_token")
@@ -108,10 +202,9 @@ class FastAPIServer:
 
 
         @self.app.post("/login")
-        async def login_user(request: Request, email: str = Form(...), password: str = Form(...)):
+        async def login_user(request: Request, email: str = Form(...), password: str = Form(...), session: AsyncSession = Depends(self.crud.get_session)):
 
-            await self.crud.initialize()
-            user = await self.crud.read_by_email(User, str(email))
+            user = await self.crud.read_by_email(session, User, str(email))
 
             if not user or not verify_password(password, user.hashed_password):
                 return self.templates.TemplateResponse("register.html", {"request": request, "error": "Invalid credentials"})
@@ -133,10 +226,9 @@ class FastAPIServer:
             
 
         @self.app.post("/register")
-        async def register_user(request: Request,email: str = Form(...),username: str = Form(...),password: str = Form(...)):
-            await self.crud.initialize()
+        async def register_user(request: Request,email: str = Form(...),username: str = Form(...),password: str = Form(...), session: AsyncSession = Depends(self.crud.get_session)):
 
-            user_exist = await self.crud.read_by_email(User, email)
+            user_exist = await self.crud.read_by_email(session, User, email)
             if user_exist:
                 return self.templates.TemplateResponse("register.html", {"request": request, "error": "Username already exists"})
 
@@ -145,7 +237,7 @@ class FastAPIServer:
                 username=username,
                 hashed_password=hash_password(password)
             )
-            await self.crud.create(user)
+            await self.crud.create(session, user)
 
             token = create_access_token({"sub": str(user.id)})
             response = RedirectResponse("/main_page", status_code=303)
@@ -171,32 +263,32 @@ class FastAPIServer:
 
             token = request.cookies.get("access_token")
             if token:
-                video_id = regex_for_id_extracting_from_the_link(youtube_id)
-
-                text = self.transcripter.transcript(video_id, language_code)
-
-                self.logger.info(f"video transcript result:  {text}")
-
-                label = self.label_extractor.extract(subject_id, text)
-
                 try:
                     payload = verify_token_from_cookie(request)
                     user_id = int(payload["sub"])
+                    self.json_handler.validate_subject_id(subject_id)
+                    video_id = regex_for_id_extracting_from_the_link(youtube_id)
+
+                    # Aynı video + dil bu derse daha önce eklendiyse transkript, etiketleme ve embedding atlanır.
+                    source = self.json_handler.blob_store.source_key("youtube", video_id, language_code)
+                    if await asyncio.to_thread(self.json_handler.find_note, user_id, subject_id, source=source):
+                        return self.duplicate_note_redirect(subject_id)
 
-                    saved_note = self.json_handler.add_note_to_subject(
-                        subject_id=subject_id,
-                        user_id=user_id,
-                        label=label,
-                        note_text=text
-                    )
+                    # Transkript (video_id, dil) bazında cache'lidir; başka bir öğrenci aynı videoyu eklediyse tekrar çekilmez.
+                    # Zaman pencerelerine bölünür ve her segment videodaki zamanıyla ayrı chunk olarak indekslenir.
+                    text, segments = await self.transcripter.segments(video_id, language_code)
 
-                    note_chunks = self.rag_pipeline.load_notes(f"app/data/{subject_id}_{user_id}.json", subject_id=subject_id, user_id=user_id)
+                    self.logger.info(f"video transcript result: {len(text)} chars, {len(segments)} segments")
 
-                    self.rag_pipeline.update_vector_db(note_chunks, user_id=user_id)
+                    saved_note = await self.save_note(subject_id, user_id, text, source, segments=segments, video_id=video_id)
+                    if saved_note is None:
+                        return self.duplicate_note_redirect(subject_id)
 
                     params = urlencode({"subject": subject_id, "success": "1"})
                     return RedirectResponse(url=f"/subject?{params}", status_code=303)
 
+                except (AdmissionRejected, InvalidSubjectError):
+                    raise
                 except Exception as e:
                     self.logger.error(f"Error processing note for subject_id '{subject_id}': {e}")
                     raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -215,25 +307,17 @@ class FastAPIServer:
                 payload = verify_token_from_cookie(request)
                 user_id = int(payload["sub"])
 
-                label = self.label_extractor.extract(subject_id, note_text)
-                
-                # Bu method öğrenci ders ile ilgili veri eklediğinde o dersin .json dosyasına label olarak yeni note verisi ekler.
-                saved_note = self.json_handler.add_note_to_subject(
-                    subject_id=subject_id,
-                    user_id=user_id,
-                    label=label,
-                    note_text=note_text
-                )
-
-                # Bu method; öğrenci tarafından yeni bir veri eklendiğinde vector database'i günceller.
-                note_chunks = self.rag_pipeline.load_notes(f"app/data/{subject_id}_{user_id}.json", subject_id=subject_id, user_id=user_id)
-
-                self.rag_pipeline.update_vector_db(note_chunks, user_id=user_id)
+                self.json_handler.validate_subject_id(subject_id)
+                # Bu method öğrenci ders ile ilgili veri eklediğinde notu kaydeder, etiketler ve vector database'i günceller (sadece yeni not).
+                saved_note = await self.save_note(subject_id, user_id, note_text)
+                if saved_note is None:
+                    return self.duplicate_note_redirect(subject_id)
 
-                
                 params = urlencode({"subject": subject_id, "success": "1"})
                 return RedirectResponse(url=f"/subject?{params}", status_code=303)
             
+            except (AdmissionRejected, InvalidSubjectError):
+                raise
             except Exception as e:
                 self.logger.error(f"Error processing note for subject_id '{subject_id}': {e}")
                 raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -249,35 +333,82 @@ class FastAPIServer:
                 payload = verify_token_from_cookie(request)
                 user_id = int(payload["sub"])
 
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    tmp.write(await pdf_file.read())
-                    tmp_path = tmp.name
-
-
-                text = self.pdf_parser.parse(tmp_path)
-
-                label = self.label_extractor.extract(subject_id, text)
-
-                self.json_handler.add_note_to_subject(
-                    subject_id=subject_id,
-                    user_id=user_id,
-                    label=label,
-                    note_text=text
-                )
-
-                note_chunks = self.rag_pipeline.load_notes(f"app/data/{subject_id}_{user_id}.json", subject_id=subject_id, user_id=user_id)
-                self.rag_pipeline.update_vector_db(note_chunks, user_id=user_id)
+                self.json_handler.validate_subject_id(subject_id)
+                # Upload parça parça diske akıtılır (tamamı belleğe alınmaz), hash aynı geçişte hesaplanır.
+                # Temp dosya her durumda silinir.
+                tmp_path, pdf_digest = await asyncio.to_thread(spool_upload_to_disk, pdf_file.file, ".pdf")
+                try:
+                    # Aynı PDF (byte olarak) bu derse daha önce eklendiyse parse, etiketleme ve embedding atlanır.
+                    source = self.json_handler.blob_store.source_key("pdf", pdf_digest)
+                    if await asyncio.to_thread(self.json_handler.find_note, user_id, subject_id, source=source):
+                        return self.duplicate_note_redirect(subject_id)
+
+                    digest = await asyncio.to_thread(self.json_handler.blob_store.lookup_source, source)
+                    if digest:
+                        # Daha önce parse edilmiş PDF: metin ve sayfa segmentleri blob store'dan okunur
+                        text = await asyncio.to_thread(self.json_handler.blob_store.get_text, digest)
+                        segments = await asyncio.to_thread(self.json_handler.blob_store.source_segments, source)
+                    else:
+                        # Sayfalar process pool'da çıkarılır, geldikçe metne eklenir; her sayfa ayrı chunk olarak indekslenir
+                        text, segments = await self.pdf_parser.extract(tmp_path)
+                finally:
+                    os.remove(tmp_path)
+
+                saved_note = await self.save_note(subject_id, user_id, text, source, segments=segments)
+                if saved_note is None:
+                    return self.duplicate_note_redirect(subject_id)
 
                 params = urlencode({"subject": subject_id, "success": "1"})
                 return RedirectResponse(url=f"/subject?{params}", status_code=303)
 
+            except (AdmissionRejected, InvalidSubjectError):
+                raise
             except Exception as e:
                 self.logger.error(f"PDF işleme hatası: {e}")
                 raise HTTPException(status_code=500, detail=f"PDF işlenemedi: {str(e)}")
         
 
+        @self.app.post("/bulk_ingest")
+        async def bulk_ingest(
+            request: Request,
+            subject_id: str = Form(...),
+            pdf_files: List[UploadFile] = File(default=[]),
+            youtube_links: str = Form(""),
+            language_code: str = Form("tr")
+        ):
+            # Birden fazla PDF ve YouTube linki (satır ya da virgülle ayrılmış) tek istekte işlenir.
+            # Item'lar parse -> label -> store -> embed stage'lerinden pipeline olarak geçer.
+            payload = verify_token_from_cookie(request)
+            if payload is None:
+                raise HTTPException(status_code=401, detail="Unauthorized")
+            user_id = int(payload["sub"])
+            self.json_handler.validate_subject_id(subject_id)
+
+            links = [link.strip() for link in youtube_links.replace(",", "\n").splitlines() if link.strip()]
+            if not pdf_files and not links:
+                raise HTTPException(status_code=400, detail="En az bir PDF ya da YouTube linki gönderilmeli.")
+            if len(pdf_files) + len(links) > self.bulk_ingestor.max_items:
+                raise HTTPException(status_code=400, detail=f"Tek seferde en fazla {self.bulk_ingestor.max_items} kaynak yüklenebilir.")
+
+            items = [
+                IngestionItem(kind="pdf", subject_id=subject_id, user_id=user_id, name=pdf_file.filename, upload=pdf_file.file)
+                for pdf_file in pdf_files
+            ] + [
+                IngestionItem(kind="youtube", subject_id=subject_id, user_id=user_id, name=link,
+                              video_id=regex_for_id_extracting_from_the_link(link), language=language_code)
+                for link in links
+            ]
+
+            started = time.monotonic()
+            await self.bulk_ingestor.run(items)
+            return JSONResponse(content={
+                "items": [item.result() for item in items],
+                "elapsed_seconds": round(time.monotonic() - started, 3)
+            })
+
+
         @self.app.post("/ask-question")
-        async def ask_question(request: Request):
+        async def ask_question(request: Request, background_tasks: BackgroundTasks):
 
             token = request.cookies.get("access_token")
 
@@ -288,7 +419,6 @@ class FastAPIServer:
                 payload = verify_token_from_cookie(request)
                 user_id = int(payload["sub"])
 
-                await self.crud.initialize()
                 data = await request.json()
                 subject_id = data.get("subject_id")
                 question = data.get("question")
@@ -296,44 +426,26 @@ class FastAPIServer:
                 if not subject_id or not question:
                     return {"error": "Subject ID ve soru gereklidir."}
 
-
-                # Database'den kullanıcının son 3 soru-cevap çiftini getir
-                context_aware = await self.crud.get_last_3_conversations_by_user(user_id)
-
-                # BUrada bu context aware'i summarize edilir.
-                summarized_context_aware = self.summerizer.sumarize(context_aware)
-
-                self.logger.info(f"summarized context aware: {summarized_context_aware}")
-
-                answer = self.chatbot.ask_question(
+                # history+summary ve retrieval eş zamanlı çalışır, kayıt background task'e bırakılır.
+                answer, sources = await self.chat_pipeline.run(
                     subject_id=subject_id,
                     question=question,
                     user_id=user_id,
-                    summarized_context_aware = summarized_context_aware
-                )
-
-
-                question_answer = QuestionAnswer(
-                    user_id=user_id,
-                    question=question,
-                    answer=answer
+                    background_tasks=background_tasks
                 )
 
-                await self.crud.create(question_answer)
-
-                return {"answer": answer}
+                return {"answer": answer, "sources": sources}
             raise HTTPException(status_code=401, detail="Unauthorized: No access token provided.")
 
         
         @self.app.get("/profile")
-        async def get_profile_html(request: Request):
+        async def get_profile_html(request: Request, session: AsyncSession = Depends(self.crud.get_read_session)):
             token = request.cookies.get("access_token")
             
             if not token:
                 print("Token cookie'de bulunamadı.")
                 return self.templates.TemplateResponse("register.html", {"request": request})
 
-            await self.crud.initialize()
 
             payload = verify_token_from_cookie(request)
             
@@ -349,12 +461,12 @@ class FastAPIServer:
 
             user_id = int(payload["sub"])
 
-            user = await self.crud.read_by_id(User, user_id)
+            user = await self.crud.read_by_id(session, User, user_id)
             if user is None:
                 print("Kullanıcı veritabanında bulunamadı.")
                 return self.templates.TemplateResponse("error.html", {"request": request, "message": "Kullanıcı bulunamadı."})
 
-            total_score = await self.crud.get_user_score_by_id(user_id)
+            total_score = await self.crud.get_user_score_by_id(session, user_id)
             print(total_score)
 
             return self.templates.TemplateResponse("user_profile.html", {
@@ -379,7 +491,7 @@ class FastAPIServer:
             
             data = await request.json()
             topic = data.get("user_input")
-            result = self.agent.run(topic, user_id)
+            result = await self.llm_provider.run("quiz", self.agent.run, topic, user_id)
 
             return JSONResponse(content={"questions": result.get("questions", [])})
 
@@ -401,20 +513,38 @@ class FastAPIServer:
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
 
-            response = self.agent.evaluate(question, answer, correct_answer, user_id)
+            response = await self.llm_provider.run("quiz", self.agent.evaluate, question, answer, correct_answer, user_id)
+
+
+            return JSONResponse(content=response)
+        
+
+        @self.app.post("/evaluate_answers")
+        async def evaluate_answers(request: Request):
+            token = request.cookies.get("access_token")
+
+            if not token:
+                return self.templates.TemplateResponse("register.html", {"request": request})
+
+            data = await request.json()
+            answers = data.get("answers", [])
+
+            payload = verify_token_from_cookie(request)
+            user_id = int(payload["sub"])
 
+            # Tüm cevap kağıdı tek seferde değerlendirilir, yanlışlar için tek LLM çağrısı yapılır.
+            response = await self.llm_provider.run("quiz", self.agent.evaluate_batch, answers, user_id)
 
             return JSONResponse(content=response)
         
 
         @self.app.post("/save_wrong_answers")
-        async def save_wrong_answers(request: Request, data: dict):
+        async def save_wrong_answers(request: Request, data: dict, session: AsyncSession = Depends(self.crud.get_session)):
             token = request.cookies.get("access_token")
 
             if not token:
                 return self.templates.TemplateResponse("register.html", {"request": request})
             
-            await self.crud.initialize()
             wrong_answers_from_ui = data.get("wrong_answers", [])
 
             payload = verify_token_from_cookie(request)
@@ -423,24 +553,26 @@ class FastAPIServer:
             if not user_id:
                 return {"detail": "user_id eksik"}, 400
 
-            for item in wrong_answers_from_ui:
+            rows = [
+                {
+                    "question": item["question"],
+                    "user_answer": item["selected_answer"],
+                    "correct_answer": item["correct_answer"],
+                    "user_id": user_id
+                }
+                for item in wrong_answers_from_ui
+            ]
 
-                wrong_answer = WrongAnswer(
-                    question=item["question"],
-                    user_answer=item["selected_answer"],
-                    correct_answer=item["correct_answer"],
-                    user_id=user_id
-                )
-                
-                await self.crud.create(wrong_answer)
+            # Tüm yanlışlar tek bir executemany ile, tek commit'te yazılır
+            saved_count = await self.crud.bulk_create(session, WrongAnswer, rows)
             
-            return JSONResponse(content={"backend": "success"})
+            return JSONResponse(content={"backend": "success", "saved": saved_count})
 
 
 
         
         @self.app.get("/get_user_notes/{subject}")
-        def get_user_notes_by_subject(request: Request, subject: str):
+        async def get_user_notes_by_subject(request: Request, subject: str, limit: int = 20, cursor: str = None):
 
             token = request.cookies.get("access_token")
 
@@ -449,38 +581,81 @@ class FastAPIServer:
             
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
-            notes = []
-
-            # Eğer subject "all" ise tüm ders dosyalarını tara
-            if subject == "all":
-                directory = "app/data"
-                for file in os.listdir(directory):
-                    if file.endswith(f"_{user_id}.json"):
-                        current_subject = file.split("_")[0]
-                        file_path = os.path.join(directory, file)
-                        try:
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                entries = json.load(f)
-                                for entry in entries:
-                                    entry["subject"] = current_subject
-                                    notes.append(entry)
-                        except Exception:
-                            continue
-            else:
-                # Belirli bir ders için
-                file_path = f"app/data/{subject}_{user_id}.json"
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            entries = json.load(f)
-                            for entry in entries:
-                                entry["subject"] = subject
-                                notes.append(entry)
-                    except Exception:
-                        pass
-
-            return JSONResponse(content={"notes": notes})
-        
+
+            # Sadece kullanıcının manifest'i okunur: metadata ve önizleme, not gövdeleri yüklenmez.
+            # subject "all" ise kullanıcının tüm dersleri listelenir. Sayfa boyutu sınırlıdır.
+            limit = max(1, min(limit, 100))
+            try:
+                notes, next_cursor = await asyncio.to_thread(
+                    self.json_handler.list_notes_page,
+                    user_id,
+                    None if subject == "all" else subject,
+                    limit,
+                    cursor
+                )
+            except (ValueError, TypeError):
+                raise HTTPException(status_code=400, detail="Geçersiz cursor.")
+
+            return JSONResponse(content={"notes": notes, "next_cursor": next_cursor})
+
+
+        @self.app.get("/notes/export")
+        async def export_notes(request: Request, subject: str = None):
+            # Tüm notlar NDJSON olarak akıtılır: her satır bir not, bellekte aynı anda tek not tutulur.
+            # Senkron generator Starlette tarafından threadpool'da tüketilir, event loop bloklanmaz.
+            payload = verify_token_from_cookie(request)
+            if payload is None:
+                raise HTTPException(status_code=401, detail="Unauthorized")
+            user_id = int(payload["sub"])
+
+            def ndjson_lines():
+                for note in self.json_handler.iter_notes(user_id, subject_id=subject):
+                    yield json.dumps(note, ensure_ascii=False) + "\n"
+
+            return StreamingResponse(
+                ndjson_lines(),
+                media_type="application/x-ndjson",
+                headers={"Content-Disposition": f'attachment; filename="notes_{subject or "all"}.ndjson"'}
+            )
+
+
+        @self.app.get("/notes/{subject}/{note_id}")
+        async def get_note_body(request: Request, subject: str, note_id: int):
+            # Not gövdesi sadece istendiğinde blob store'dan okunur.
+            # Range header'ı (bytes=...) ile gövdenin bir kısmı istenebilir (206 Partial Content).
+            payload = verify_token_from_cookie(request)
+            if payload is None:
+                raise HTTPException(status_code=401, detail="Unauthorized")
+            user_id = int(payload["sub"])
+
+            note = await asyncio.to_thread(self.json_handler.get_note, subject, user_id, note_id)
+            if note is None:
+                raise HTTPException(status_code=404, detail="Not bulunamadı.")
+
+            # Gövde belleğe alınmaz: istenen aralık gzip blob'dan akış halinde açılarak gönderilir.
+            # Bozuk Range header'ı yok sayılır (200); sadece karşılanamayan aralık 416 döner.
+            size = await asyncio.to_thread(self.json_handler.note_byte_size, note)
+            headers = {"Accept-Ranges": "bytes"}
+            try:
+                byte_range = parse_byte_range(request.headers.get("range"), size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+            if byte_range is None:
+                return StreamingResponse(
+                    self.json_handler.iter_note_bytes(note),
+                    media_type="text/plain; charset=utf-8",
+                    headers={**headers, "Content-Length": str(size)}
+                )
+
+            start, end = byte_range
+            return StreamingResponse(
+                self.json_handler.iter_note_bytes(note, start, end),
+                status_code=206,
+                media_type="text/plain; charset=utf-8",
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)}
+            )
+
 
         @self.app.delete("/delete_note/{subject}/{note_id}")
         async def delete_note(subject: str, note_id: int, request: Request):
@@ -493,36 +668,26 @@ class FastAPIServer:
                 payload = verify_token_from_cookie(request)
                 user_id = int(payload["sub"])
 
-                filename = f"app/data/{subject}_{user_id}.json"
-                if not os.path.exists(filename):
-                    raise HTTPException(status_code=404, detail="Not dosyası bulunamadı.")
-
-                with open(filename, "r", encoding="utf-8") as f:
-                    notes = json.load(f)
-
-                updated_notes = [note for note in notes if note["id"] != note_id]
-
-                if len(updated_notes) == len(notes):
+                # Silme log'a fsync'li bir kayıt ekler ve dosya kilidi bekleyebilir; event loop bloklanmasın
+                if not await asyncio.to_thread(self.json_handler.delete_note, subject, user_id, note_id):
                     raise HTTPException(status_code=404, detail="Not bulunamadı.")
 
-                with open(filename, "w", encoding="utf-8") as f:
-                    json.dump(updated_notes, f, ensure_ascii=False, indent=2)
-
                 return JSONResponse(content={"success": True, "message": "Not silindi."})
 
+            except (HTTPException, InvalidSubjectError):
+                raise
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
             
         
         # Kullanıcıya challenge mesajı gönder
         @self.app.post("/send_challenge")
-        async def send_challenge(request: Request):
+        async def send_challenge(request: Request, session: AsyncSession = Depends(self.crud.get_session)):
             token = request.cookies.get("access_token")
 
             if not token:
                 return self.templates.TemplateResponse("register.html", {"request": request})
             
-            await self.crud.initialize()
 
             payload = verify_token_from_cookie(request)
             challenge_sender_id = int(payload["sub"])
@@ -532,10 +697,10 @@ class FastAPIServer:
             challenge_topic = data.get("topic")
 
             # Quiz json oluştur
-            challenge_quiz_json = self.challenge_generator.run(challenge_topic, challenge_sender_id)
+            challenge_quiz_json = await self.llm_provider.run("challenge", self.challenge_generator.run, challenge_topic, challenge_sender_id)
 
             # Kullanıcı kontrolü
-            challenge_receiver_user = await self.crud.read_by_email(User, challenge_receiver_user_email)
+            challenge_receiver_user = await self.crud.read_by_email(session, User, challenge_receiver_user_email)
             if not challenge_receiver_user:
                 return JSONResponse(status_code=404, content={"message": "Bu e-posta adresine sahip kullanıcı bulunamadı."})
 
@@ -544,13 +709,14 @@ class FastAPIServer:
                 challenge_sender_id=challenge_sender_id,
                 challenge_receiver_id=challenge_receiver_user.id,
                 quiz_json=challenge_quiz_json,
+                topic=challenge_topic or None,
                 sender_answer_for_challenge=None,
                 receiver_answer_for_challenge=None,
                 accepted_receiver=False
             )
 
             # DB'ye yaz ve ID’yi al
-            created_challenge = await self.crud.create_challenge(challenge)
+            created_challenge = await self.crud.create_challenge(session, challenge)
 
             return JSONResponse(content={
                 "message": "Challenge oluşturuldu.",
@@ -561,37 +727,14 @@ class FastAPIServer:
 
 
         @self.app.get("/get_challenges")
-        async def get_challenges(request: Request):
-            await self.crud.initialize()
+        async def get_challenges(request: Request, session: AsyncSession = Depends(self.crud.get_read_session)):
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
 
-            filters = {
-                "challenge_receiver_id": user_id,
-                "accepted_receiver": False
-            }
-            incoming_challenges = await self.crud.read_challenges(filters=filters)
-
-            self.logger.info(f"gelen challengelar: {incoming_challenges}")
-
-            challenges_list = []
-            for c in incoming_challenges:
-                try:
-                    # Eğer quiz_json string olarak kaydedildiyse, dict'e çevir:
-                    quiz = c.quiz_json
-                    if isinstance(quiz, str):
-                        quiz = json.loads(quiz)
+            # Sadece id ve topic okunur; quiz_json satırları veritabanından çıkmaz
+            incoming_challenges = await self.crud.read_pending_challenges(session, user_id)
 
-                    question = quiz.get("questions", [])[0].get("question", "Bilinmeyen Konu")
-
-                except Exception as e:
-                    self.logger.error(f"Challenge sorusu parse edilemedi: {e}")
-                    question = "Bilinmeyen Konu"
-
-                challenges_list.append({
-                    "id": c.id,
-                    "topic": question
-                })
+            challenges_list = [{"id": c.id, "topic": c.topic} for c in incoming_challenges]
 
             self.logger.info(f"challenge list: {challenges_list}")
 
@@ -599,36 +742,31 @@ class FastAPIServer:
         
 
         @self.app.post("/accept_challenge")
-        async def accept_challenge(request: Request):
+        async def accept_challenge(request: Request, session: AsyncSession = Depends(self.crud.get_session)):
             token = request.cookies.get("access_token")
 
             if not token:
                 return self.templates.TemplateResponse("register.html", {"request": request})
             
-            await self.crud.initialize()
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
 
             data = await request.json()
             challenge_id = int(data.get("id"))
 
-            challenge = await self.crud.read_challenge_by_id(challenge_id)
+            challenge = await self.crud.read_challenge_by_id(session, challenge_id)
 
             if not challenge or challenge.challenge_receiver_id != user_id:
                 return JSONResponse(status_code=403, content={"message": "Bu challenge size ait değil."})
 
             challenge.accepted_receiver = True
-            await self.crud.update_challenge(challenge)
+            await self.crud.update_challenge(session, challenge)
 
             # Quiz sorularını geri dön
-            quiz_json = challenge.quiz_json
-            if isinstance(quiz_json, str):
-                quiz_json = json.loads(quiz_json)
-
             return JSONResponse(content={
                 "message": "Challenge kabul edildi!",
                 "quiz_match_id": challenge_id,
-                "quiz": quiz_json,
+                "quiz": challenge.quiz_json,
                 "role": "receiver"
             })
 
@@ -636,38 +774,36 @@ class FastAPIServer:
 
 
         @self.app.post("/reject_challenge")
-        async def reject_challenge(request: Request):
+        async def reject_challenge(request: Request, session: AsyncSession = Depends(self.crud.get_session)):
             token = request.cookies.get("access_token")
 
             if not token:
                 return self.templates.TemplateResponse("register.html", {"request": request})
 
-            await self.crud.initialize()
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
             
             data = await request.json()
             challenge_id = int(data.get("id"))
 
-            challenge = await self.crud.read_challenge_by_id(challenge_id)
+            challenge = await self.crud.read_challenge_by_id(session, challenge_id)
 
             if not challenge or challenge.challenge_receiver_id != user_id:
                 return JSONResponse(status_code=403, content={"message": "Bu challenge size ait değil."})
 
-            await self.crud.delete_challenge_by_id(challenge_id)
+            await self.crud.delete_challenge_by_id(session, challenge_id)
 
             return JSONResponse(content={"message": "Challenge reddedildi."})
 
 
 
         @self.app.post("/submit_challenge_answers")
-        async def submit_challenge_answers(request: Request):
+        async def submit_challenge_answers(request: Request, session: AsyncSession = Depends(self.crud.get_session)):
             token = request.cookies.get("access_token")
 
             if not token:
                 return self.templates.TemplateResponse("register.html", {"request": request})
             
-            await self.crud.initialize()
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
 
@@ -679,7 +815,8 @@ class FastAPIServer:
             if not challenge_id or not answers or role not in ["sender", "receiver"]:
                 raise HTTPException(status_code=400, detail="Eksik ya da hatalı veri.")
 
-            challenge = await self.crud.read_challenge_by_id(challenge_id)
+            # Satır kilitlenir: iki taraf aynı anda cevap gönderirse puan bir kere hesaplanır
+            challenge = await self.crud.read_challenge_by_id(session, challenge_id, for_update=True)
             if not challenge:
                 raise HTTPException(status_code=404, detail="Challenge bulunamadı.")
 
@@ -688,68 +825,59 @@ class FastAPIServer:
                 print(role)
                 if challenge.challenge_sender_id != user_id:
                     raise HTTPException(status_code=403, detail="Gönderici siz değilsiniz.")
-                challenge.sender_answer_for_challenge = json.dumps(answers)
+                challenge.sender_answer_for_challenge = answers
 
             elif role == "receiver":
                 print(role)
                 if challenge.challenge_receiver_id != user_id:
                     raise HTTPException(status_code=403, detail="Alıcı siz değilsiniz.")
-                challenge.receiver_answer_for_challenge = json.dumps(answers)
+                challenge.receiver_answer_for_challenge = answers
 
-            await self.crud.update_challenge(challenge)
+            await self.crud.update_challenge(session, challenge)
 
-            # Her iki taraf cevapladıysa puan hesapla ve kaydet
-            if challenge.sender_answer_for_challenge and challenge.receiver_answer_for_challenge:
-                sender_answers = json.loads(challenge.sender_answer_for_challenge)
-                receiver_answers = json.loads(challenge.receiver_answer_for_challenge)
-                quiz = challenge.quiz_json if isinstance(challenge.quiz_json, dict) else json.loads(challenge.quiz_json)
-                corrects = [q["correct_answer"] for q in quiz["questions"]]
-
-                sender_score = sum([1 for s, c in zip(sender_answers, corrects) if s == c])
-                receiver_score = sum([1 for r, c in zip(receiver_answers, corrects) if r == c])
+            # Her iki taraf cevapladıysa puan SQL tarafında hesaplanır ve saklanır
+            scores = await self.crud.score_challenge(session, challenge_id)
+            if scores:
+                sender_score, receiver_score = scores
 
                 # Puanlama
                 if sender_score > receiver_score:
                     self.logger.info("sender_score > receiver score")
-                    await self.crud.update_user_score(challenge.challenge_sender_id, 10)
+                    await self.crud.update_user_score(session, challenge.challenge_sender_id, 10)
                 elif sender_score < receiver_score:
                     self.logger.info("sender_score < receiver score")
-                    await self.crud.update_user_score(challenge.challenge_receiver_id, 10)
+                    await self.crud.update_user_score(session, challenge.challenge_receiver_id, 10)
                 else:
                     self.logger.info("sender_score = receiver score")
-                    await self.crud.update_user_score(challenge.challenge_sender_id, 1)
-                    await self.crud.update_user_score(challenge.challenge_receiver_id, 1)
+                    await self.crud.update_user_score(session, challenge.challenge_sender_id, 1)
+                    await self.crud.update_user_score(session, challenge.challenge_receiver_id, 1)
 
             return JSONResponse(content={"message": f"{role} cevabı başarıyla kaydedildi."})
 
 
 
         @self.app.get("/get_challenge_messages")
-        async def get_challenge_messages(request: Request):
-            await self.crud.initialize()
+        async def get_challenge_messages(request: Request, limit: int = 20, before_id: int = None, session: AsyncSession = Depends(self.crud.get_read_session)):
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
 
-            # Sender veya Receiver olduğu tüm challenge'ları al
-            all_challenges = await self.crud.read_challenges_for_user(user_id)
+            # Tamamlanmış challenge'lar rakip e-postası ve saklanmış skorlarla tek sorguda gelir
+            limit = max(1, min(limit, 100))
+            rows = await self.crud.read_challenges_for_user(session, user_id, limit=limit, before_id=before_id)
 
             messages = []
-            for ch in all_challenges:
-                if not ch.sender_answer_for_challenge or not ch.receiver_answer_for_challenge:
-                    continue  # Her iki taraf da cevaplamamışsa geç
-
-                sender_answers = json.loads(ch.sender_answer_for_challenge)
-                receiver_answers = json.loads(ch.receiver_answer_for_challenge)
-                quiz = ch.quiz_json if isinstance(ch.quiz_json, dict) else json.loads(ch.quiz_json)
-                corrects = [q["correct_answer"] for q in quiz["questions"]]
-
-                sender_score = sum([1 for s, c in zip(sender_answers, corrects) if s == c])
-                receiver_score = sum([1 for r, c in zip(receiver_answers, corrects) if r == c])
-
-                # Rakibin e-mailini al
-                opponent_id = ch.challenge_receiver_id if ch.challenge_sender_id == user_id else ch.challenge_sender_id
-                opponent = await self.crud.read_by_id(User, opponent_id)
-                opponent_email = opponent["name"] if opponent else "Bilinmeyen"
+            for ch in rows:
+                sender_score, receiver_score = ch.sender_score, ch.receiver_score
+                if sender_score is None or receiver_score is None:
+                    # Skor kolonlarından önce bitmiş challenge: bir kere hesaplanıp saklanır
+                    # Liste replica'dan okunur; backfill yazması primary'de kendi unit of work'ünde yapılır
+                    async with self.crud.session_scope(user_id=user_id) as write_session:
+                        scores = await self.crud.score_challenge(write_session, ch.id)
+                    if not scores:
+                        continue
+                    sender_score, receiver_score = scores
+
+                opponent_email = ch.opponent_email or "Bilinmeyen"
 
                 if user_id == ch.challenge_sender_id:
                     user_score = sender_score
@@ -767,13 +895,13 @@ class FastAPIServer:
 
                 messages.append(outcome)
 
-            return JSONResponse(content={"messages": messages})
+            next_cursor = rows[-1].id if len(rows) == limit else None
+            return JSONResponse(content={"messages": messages, "next_cursor": next_cursor})
 
 
         @self.app.get("/get_global_ranking")
-        async def get_global_ranking():
-            await self.crud.initialize()
-            top_users = await self.crud.get_top_users_by_score(limit=5)
+        async def get_global_ranking(session: AsyncSession = Depends(self.crud.get_read_session)):
+            top_users = await self.crud.get_top_users_by_score(session, limit=5)
             return top_users
         
 
@@ -783,11 +911,12 @@ class FastAPIServer:
             if not token:
                 return self.templates.TemplateResponse("register.html", {"request": request})
 
-            await self.crud.initialize()
             payload = verify_token_from_cookie(request)
             user_id = int(payload["sub"])
 
-            flashcards = await self.crud.get_last_wrong_answers(user_id=user_id)
+            # Bağlantı LLM çağrısı boyunca tutulmasın diye okuma kendi kısa unit of work'ünde yapılır
+            async with self.crud.session_scope(read_only=True, user_id=user_id) as session:
+                flashcards = await self.crud.get_last_wrong_answers(session, user_id=user_id)
             
             flashcard_dicts = [
                 {
@@ -798,7 +927,7 @@ class FastAPIServer:
                 for f in flashcards
             ]
 
-            explanations = self.flas_card_agent.generate_advice_for_wrong_answers(flashcard_dicts)
+            explanations = await self.llm_provider.run("flashcard", self.flas_card_agent.generate_advice_for_wrong_answers, flashcard_dicts)
 
             # Frontend için birleşik JSON
             return JSONResponse(content={
@@ -809,6 +938,27 @@ class FastAPIServer:
             })
 
 
+        @self.app.get("/healthz")
+        async def healthz():
+            # Liveness: process ve event loop cevap veriyor mu; veritabanına gidilmez
+            return JSONResponse(content={"status": "alive", "database": self.crud.health.to_dict()})
+
+
+        @self.app.get("/readyz")
+        async def readyz():
+            # Readiness: pool kullanılabilir değilse 503, load balancer bu worker'a trafik göndermez
+            health = await self.crud.check_health()
+            return JSONResponse(
+                status_code=status.HTTP_200_OK if health.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+                content=health.to_dict()
+            )
+
+
+        @self.app.get("/llm_metrics")
+        async def get_llm_metrics():
+            return JSONResponse(content=self.llm_provider.metrics())
+
+
         @self.app.get("/logout")
         async def logout_user():
             response = RedirectResponse("/", status_code=status.HTTP_302_FOUND)
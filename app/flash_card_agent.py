@@ -3,7 +3,6 @@ from dataclasses import dataclass
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Union
 import xml.etree.ElementTree as ET
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import AIMessage
 from langchain.agents import AgentType, Tool, initialize_agent
 from langchain.chains import LLMChain
@@ -12,22 +11,19 @@ from langchain_core.tools import tool
 from langchain.prompts import PromptTemplate
 import requests
 from app.rag_pipeline import RagPipeline
+from app.admission import AdmissionRejected
+from app.llm_provider import LLMProvider
 import os
-from dotenv import load_dotenv
 
 
 @dataclass
 class FlashCardAgent:
 
     logger: any
+    llm_provider: LLMProvider
 
     def __post_init__(self):
-        load_dotenv()
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-            temperature=0.2
-        )
+        self.llm = self.llm_provider.get("flashcard")
         self.flashcard_prompt = PromptTemplate.from_template(
             "Sen bir eğitim uzmanısın. Öğrenci bu soruda hata yaptı:\n\n"
             "Soru: {question}\n"
@@ -56,6 +52,9 @@ class FlashCardAgent:
             try:
                 response = self.llm.invoke(prompt)
                 explanations.append(response.content)
+            except AdmissionRejected:
+                # Yük altında reddedilen istek 503 olarak dönmeli, yedek açıklamayla gizlenmemeli
+                raise
             except Exception as e:
                 self.logger.error(f"LLM cevabı alınamadı: {e}")
                 explanations.append("Açıklama üretilemedi.")
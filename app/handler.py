@@ -1,48 +1,90 @@
+import asyncio
+import random
 import time
 
 
-def custom_db_crud_handler(func):
-    async def inner(self, *args, **kwargs):
+class ReadOnlySessionError(RuntimeError):
+    """
+    Yazma yapan bir CRUD metodu replica'ya yönlendirilmiş (read-only) bir session ile çağrıldığında fırlatılır.
+    """
+
+
+def _crud_handler(func, read_only: bool):
+    # CRUD metodlarının ilk argümanı, isteğe ait (unit of work) session'dır.
+    # Session'ı kapatmak ve commit etmek session_scope'un işidir.
+    async def inner(self, session, *args, **kwargs):
+        if not read_only:
+            if session.info.get("read_only"):
+                raise ReadOnlySessionError(f"{func.__name__} writes to the database and can not run on a replica session.")
+            # Read-your-writes: session_scope commit'ten sonra bu kullanıcıyı primary'ye sabitler
+            session.info["wrote"] = True
         try:
-            result = await func(self, *args, **kwargs)
-            return result
+            return await func(self, session, *args, **kwargs)
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            await self.connection.session.rollback()
-            self.logger.error(f"[DBHandler] Exception in {func.__name__}: {e}")
-            return False
-        finally:
-            await self.connection.close_session()
+            # Hata yutulmaz: session_scope tüm unit of work'ü rollback eder. Burada rollback yapılıp
+            # False dönülseydi önceki yazmalar kaybolur, sonraki yazmalar yine de commit edilirdi.
+            self.logger.error(f"[DBHandler] Exception in {func.__name__}: {e!r}")
+            raise
+    inner.__name__ = func.__name__
+    inner.__doc__ = func.__doc__
+    inner.read_only = read_only
     return inner
 
+def custom_db_crud_handler(func):
+    # Yazma yapan (read-write) metodlar: her zaman primary'de çalışır
+    return _crud_handler(func, read_only=False)
+
+def custom_db_read_handler(func):
+    # Sadece okuyan metodlar: replica session'ında da çalışabilir
+    return _crud_handler(func, read_only=True)
+
 def custom_db_connection_handler(func):
-    start_time = time.time()
     async def inner(self, *args):
+        start_time = time.perf_counter()
         try:
-            await func(self, *args)
-            end_time = time.time()
-            self.logger.info(f"{func.__name__} method is done successfully and it took : {end_time-start_time:.4f} seconds")
+            result = await func(self, *args)
         except Exception as e:
-            self.logger.error(f"Database connection failed: {e}")
+            # Hata yutulmaz: yarım kalmış bir kurulum (ör. engine=None) sessizce devam etmemeli
+            self.logger.error(f"Database connection failed in {func.__name__}: {e}")
+            raise
+        self.logger.info(f"{func.__name__} method is done successfully and it took : {time.perf_counter()-start_time:.4f} seconds")
+        return result
+    inner.__name__ = func.__name__
+    inner.__doc__ = func.__doc__
     return inner
 
 def connection_handler(func):
+    # Başlangıç bağlantısı için async retry: jitter'lı exponential backoff ve toplam bir süre sınırı.
+    # Bekleme asyncio.sleep ile yapıldığı için event loop bloklanmaz.
     async def inner(self, *args):
-        exception_type = None
-        counter = 2
-        while counter <= 8:
+        deadline = time.monotonic() + self.startup_timeout
+        delay = self.connect_base_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.health is not None:
+                self.health.record_attempt()
+            remaining = deadline - time.monotonic()
             try:
-                print("calling connection function")
-                result = await func(self, *args)
-                self.logger.info(f"Connection has been established.")
+                # Tek bir deneme de deadline'ı aşamaz (asyncpg'nin kendi connect timeout'u daha uzun)
+                result = await asyncio.wait_for(func(self, *args), timeout=max(remaining, 0.1))
+                self.logger.info(f"Connection has been established after {attempt} attempt(s).")
                 return result
             except Exception as e:
-                self.logger.error(f"Database connection failed: {e}")
-                exception_type = e
-            time.sleep(counter)
-            counter *= 2
-        raise exception_type
+                remaining = deadline - time.monotonic()
+                final = remaining <= 0
+                self.logger.error(f"Database connection attempt {attempt} failed: {e!r}")
+                if self.health is not None:
+                    self.health.record_failure(e, final=final)
+                if final:
+                    raise TimeoutError(f"Database was not reachable within {self.startup_timeout}s ({attempt} attempts).") from e
+            # Full jitter: aynı anda açılan worker'lar veritabanına aynı anda yüklenmesin
+            sleep_for = min(random.uniform(0, delay), remaining)
+            self.logger.info(f"Retrying database connection in {sleep_for:.2f}s.")
+            await asyncio.sleep(sleep_for)
+            delay = min(delay * 2, self.connect_max_delay)
+    inner.__name__ = func.__name__
+    inner.__doc__ = func.__doc__
     return inner
 
 
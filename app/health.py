@@ -0,0 +1,65 @@
+from dataclasses import dataclass, field
+from typing import Optional
+import time
+
+
+@dataclass
+class HealthState:
+    """
+    Veritabanı bağlantısının yapılandırılmış sağlık durumu (/healthz ve /readyz için).
+
+    status:
+        starting  : Uygulama açılıyor, bağlantı henüz kurulmadı (trafik alınmaz).
+        ready     : Pool kullanılabilir durumda.
+        degraded  : Açılış tamamlandı ama son kontrolde veritabanına ulaşılamadı.
+        failed    : Açılış süresi (startup_timeout) içinde bağlantı kurulamadı.
+        stopping  : Uygulama kapanıyor.
+    """
+
+    status: str = "starting"
+    attempts: int = 0
+    last_error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    ready_at: Optional[float] = None
+    last_check_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def record_attempt(self):
+        self.attempts += 1
+
+    def record_failure(self, error: Exception, final: bool = False):
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.last_check_at = time.time()
+        if final:
+            self.status = "failed"
+        elif self.status == "ready":
+            self.status = "degraded"
+
+    def mark_ready(self):
+        now = time.time()
+        if self.ready_at is None:
+            self.ready_at = now
+        self.status = "ready"
+        self.last_check_at = now
+        self.last_error = None
+
+    def mark_stopping(self):
+        self.status = "stopping"
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "started_at": self.started_at,
+            "ready_at": self.ready_at,
+            "startup_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "last_check_at": self.last_check_at,
+        }
+
+
+if __name__ == "__main__":
+    pass
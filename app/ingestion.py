@@ -0,0 +1,282 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import os
+import time
+from app.blob_store import BlobStore
+from app.json_handler import JsonHandler, NoteEntry
+from app.label_extractor_from_video import LabelExtractor
+from app.pdf_parser import PdfParser
+from app.rag_pipeline import RagPipeline
+from app.utils import spool_upload_to_disk
+from app.video_transcriper import VideoTranscript
+
+
+# Stage worker'larına "kuyruk bitti" işareti
+_DONE = object()
+
+
+@dataclass
+class IngestionItem:
+    """
+    Toplu yüklemedeki tek bir PDF ya da YouTube videosu.
+
+    status:
+        pending   : Pipeline'da ilerliyor.
+        done      : Kaydedildi ve indekslendi.
+        duplicate : Aynı kaynak ya da içerik bu derste zaten var; işlenmedi.
+        failed    : Bir stage'de hata oluştu (error alanında).
+    """
+
+    kind: str
+    subject_id: str
+    user_id: int
+    name: str
+    upload: Any = None
+    video_id: Optional[str] = None
+    language: Optional[str] = None
+    source: Optional[str] = None
+    text: Optional[str] = None
+    segments: Optional[List[dict]] = None
+    label: Optional[str] = None
+    note: Optional[NoteEntry] = None
+    chunks: list = field(default_factory=list)
+    status: str = "pending"
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def result(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "status": self.status,
+            "note_id": self.note.id if self.note else None,
+            "label": self.label,
+            "error": self.error,
+            "timings": {stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+        }
+
+
+@dataclass
+class Stage:
+    """
+    Args
+    name(str)           : Stage adı.
+    func(callable)      : async func(item) ya da batch_size > 1 ise async func(items).
+    workers(int)        : Bu stage'i aynı anda çalıştıran worker sayısı.
+    queue_size(int)     : Stage'in giriş kuyruğunun kapasitesi; dolunca önceki stage bekler (backpressure).
+    batch_size(int)     : Tek çağrıda işlenecek maksimum item sayısı.
+    batch_wait(float)   : Batch dolmadan önce yeni item için beklenecek maksimum süre (saniye).
+    """
+
+    name: str
+    func: Callable
+    workers: int = 1
+    queue_size: int = 8
+    batch_size: int = 1
+    batch_wait: float = 0.0
+
+
+@dataclass
+class PipelineExecutor:
+    """
+    Item'ları sınırlı kuyruklarla birbirine bağlanmış stage'lerden geçirir. Her stage kendi worker
+    sayısıyla eş zamanlı çalışır; bir item label aşamasındayken bir sonraki parse edilir. Toplam süre
+    stage sürelerinin toplamına değil, en yavaş stage'e yaklaşır.
+
+    Stage fonksiyonu item'ı bitirirse (status pending değilse) item sonraki stage'lere geçmez.
+    Bir stage'de hata oluşursa item failed olarak işaretlenir, diğer item'lar etkilenmez.
+    """
+
+    stages: List[Stage]
+    logger: any
+
+    async def _next_batch(self, stage: Stage, inbox: asyncio.Queue) -> tuple:
+        first = await inbox.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = inbox.get_nowait() if remaining <= 0 else await asyncio.wait_for(inbox.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        finished = False
+        while not finished:
+            batch, finished = await self._next_batch(stage, inbox)
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                await (stage.func(batch) if stage.batch_size > 1 else stage.func(batch[0]))
+            except Exception as e:
+                self.logger.error(f"[Ingestion] Stage '{stage.name}' failed for {[item.name for item in batch]}: {e!r}")
+                for item in batch:
+                    item.status, item.error = "failed", f"{stage.name}: {e}"
+            elapsed = time.monotonic() - started
+            for item in batch:
+                item.timings[stage.name] = elapsed
+                if outbox is not None and item.status == "pending":
+                    await outbox.put(item)
+
+    async def run(self, items: List[IngestionItem]) -> List[IngestionItem]:
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        workers = [
+            [
+                asyncio.create_task(self._worker(stage, queues[index], queues[index + 1] if index + 1 < len(queues) else None))
+                for _ in range(stage.workers)
+            ]
+            for index, stage in enumerate(self.stages)
+        ]
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        async def close_after(index: int):
+            # Bir stage'in tüm worker'ları bitince sonraki stage'in worker'larına bitiş işareti gönderilir
+            await asyncio.gather(*workers[index])
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put(_DONE)
+
+        try:
+            await asyncio.gather(feed(), *(close_after(index) for index in range(len(self.stages))))
+        finally:
+            for task in (task for stage_workers in workers for task in stage_workers):
+                task.cancel()
+        return items
+
+
+@dataclass
+class BulkIngestor:
+    """
+    Çok sayıda PDF'i ve YouTube videosunu tek istekte işler: extract -> label -> store -> embed.
+
+    - extract : PDF'i diske akıtır ve process pool'da sayfa sayfa çıkarır ya da videonun transkriptini alır.
+                Kaynak bu derste zaten varsa item duplicate olarak biter; daha önce işlenmiş bir PDF'in
+                metni ve sayfa segmentleri blob store'dan, daha önce çekilmiş bir transkript transkript cache'inden okunur.
+    - label   : LabelExtractor ile etiketler (aynı içerik derste varsa etiketlemeden önce elenir).
+    - store   : Notu kaydeder ve chunk'larını oluşturur (tek worker).
+    - embed   : Birden fazla dokümanın chunk'larını tek embedding çağrısında toplar (kullanıcı bazında).
+
+    Args
+    stages(dict)          : stage adı -> {workers, queue_size} (embed için ayrıca batch_size, batch_wait).
+    max_items(int)        : Tek istekte kabul edilen maksimum PDF + video sayısı.
+    """
+
+    transcripter: VideoTranscript
+    pdf_parser: PdfParser
+    label_extractor: LabelExtractor
+    json_handler: JsonHandler
+    rag_pipeline: RagPipeline
+    logger: any
+    stages: Dict[str, dict] = field(default_factory=dict)
+    max_items: int = 50
+
+    def __post_init__(self):
+        self.blob_store: BlobStore = self.json_handler.blob_store
+        functions = {"extract": self.extract, "label": self.label, "store": self.store, "embed": self.embed}
+        stages = []
+        for name, func in functions.items():
+            settings = dict(self.stages.get(name, {}))
+            if name == "store":
+                # Tekrar kontrolü ile kaydın arasında başka bir item araya girmesin
+                settings["workers"] = 1
+            stages.append(Stage(name=name, func=func, **settings))
+        self.executor = PipelineExecutor(stages=stages, logger=self.logger)
+
+    async def extract(self, item: IngestionItem):
+        if item.kind == "pdf":
+            tmp_path, pdf_digest = await asyncio.to_thread(spool_upload_to_disk, item.upload, ".pdf")
+            try:
+                item.source = self.blob_store.source_key("pdf", pdf_digest)
+                if await self._is_duplicate(item, source=item.source):
+                    return
+                digest = await asyncio.to_thread(self.blob_store.lookup_source, item.source)
+                if digest:
+                    item.text = await asyncio.to_thread(self.blob_store.get_text, digest)
+                    item.segments = await asyncio.to_thread(self.blob_store.source_segments, item.source)
+                else:
+                    item.text, item.segments = await self.pdf_parser.extract(tmp_path)
+            finally:
+                os.remove(tmp_path)
+        else:
+            item.source = self.blob_store.source_key("youtube", item.video_id, item.language)
+            if await self._is_duplicate(item, source=item.source):
+                return
+            # Transkript cache'i tekrarlanan videoları zaten karşılar; segmentler için snippet zamanları gerekir
+            item.text, item.segments = await self.transcripter.segments(item.video_id, item.language)
+
+        item.text = item.text.strip()
+        if not item.text:
+            item.status, item.error = "failed", "extract: no text found"
+            return
+        digest = await asyncio.to_thread(self.blob_store.put_text, item.text)
+        await asyncio.to_thread(self.blob_store.link_source, item.source, digest, item.segments)
+
+    async def label(self, item: IngestionItem):
+        if await self._is_duplicate(item, blob=self.blob_store.text_digest(item.text)):
+            return
+        item.label = await self.label_extractor.aextract(item.subject_id, item.text)
+
+    async def store(self, item: IngestionItem):
+        # Aynı istekteki iki item aynı içeriğe sahip olabilir; store tek worker'la çalıştığı için kontrol burada kesindir
+        if await self._is_duplicate(item, blob=self.blob_store.text_digest(item.text)):
+            return
+        item.note = await asyncio.to_thread(
+            self.json_handler.add_note_to_subject,
+            subject_id=item.subject_id,
+            user_id=item.user_id,
+            label=item.label,
+            note_text=item.text,
+            source=item.source
+        )
+        if item.segments:
+            item.chunks = self.rag_pipeline.segments_to_chunks(item.note, item.segments, subject_id=item.subject_id, user_id=item.user_id, video_id=item.video_id)
+        else:
+            item.chunks = self.rag_pipeline.notes_to_chunks([item.note], subject_id=item.subject_id, user_id=item.user_id)
+
+    async def embed(self, items: List[IngestionItem]):
+        by_user: Dict[int, List[IngestionItem]] = {}
+        for item in items:
+            by_user.setdefault(item.user_id, []).append(item)
+        for user_id, user_items in by_user.items():
+            chunks = [chunk for item in user_items for chunk in item.chunks]
+            try:
+                await asyncio.to_thread(self.rag_pipeline.update_vector_db, chunks, user_id)
+                status, error = "done", None
+            except Exception as e:
+                self.logger.error(f"[Ingestion] Embedding failed for user {user_id}: {e!r}")
+                status, error = "failed", f"embed: {e}"
+            for item in user_items:
+                item.status, item.error = status, error
+                item.text = item.segments = item.chunks = None
+
+    async def _is_duplicate(self, item: IngestionItem, source: Optional[str] = None, blob: Optional[str] = None) -> bool:
+        existing = await asyncio.to_thread(self.json_handler.find_note, item.user_id, item.subject_id, source=source, blob=blob)
+        if existing is not None:
+            item.status, item.note = "duplicate", existing
+            return True
+        return False
+
+    async def run(self, items: List[IngestionItem]) -> List[IngestionItem]:
+        started = time.monotonic()
+        await self.executor.run(items)
+        counts = {status: sum(item.status == status for item in items) for status in ("done", "duplicate", "failed")}
+        self.logger.info(f"[Ingestion] {len(items)} items ingested in {time.monotonic() - started:.2f}s: {counts}")
+        return items
+
+
+if __name__ == "__main__":
+    pass
@@ -1,70 +1,540 @@
 from dataclasses import dataclass
+from contextlib import contextmanager
+from datetime import datetime
+import base64
 import json
 import os
-from typing import List, Dict, Union
-from pydantic import BaseModel, Field
+import re
+import tempfile
+import threading
+from typing import List, Dict, Iterator, Optional, Tuple
+from pydantic import BaseModel
+from app.blob_store import BlobStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: process'ler arası kilit yok, sadece thread kilidi kullanılır
+    fcntl = None
 
 
 class NoteEntry(BaseModel):
     """
-    JSON dosyasına kaydedilecek her bir not kaydını temsil eder.
+    Kullanıcının bir derse eklediği her bir not kaydını temsil eder.
+    Gövde BlobStore'da tutulur; kayıt sadece referansını (blob: SHA-256 digest) taşır.
+    Gövde gerektiğinde JsonHandler.read_note ile okunur.
     """
     id: int
     label: str
-    note: str
+    blob: str
+    size: int = 0
+    source: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+class InvalidSubjectError(ValueError):
+    """
+    subject_id dosya adı olarak güvenli değilse fırlatılır (ör. "../", "/" ya da boş). FastAPI tarafında 400 olarak döner.
+    """
+
+
+# subject_id log dosyasının adıdır: sadece harf, rakam, "_" ve "-" (ders slug'ları: kimya, turkce, ...)
+SUBJECT_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+# Manifest formatı değiştiğinde artırılır; eski formattaki manifest'ler log'dan yeniden oluşturulur
+MANIFEST_FORMAT = 2
+
 
 @dataclass
 class JsonHandler:
+    """
+    Kullanıcı notları için append-only, log-structured store.
+
+    Her (kullanıcı, ders) çifti kendi log dosyasına sahiptir: {directory}/{user_id}/{subject_id}.log
+    Her satır tek bir JSON kaydıdır:
+        {"seq": 8, "op": "add", "id": 8, "label": "...", "blob": "<sha256>", "size": 1200,
+         "preview": "...", "source": "<sha256>|null", "created_at": "..."}
+        {"seq": 9, "op": "delete", "id": 3}
+
+    Not gövdeleri log'da değil, içerik adresli BlobStore'da (gzip) tutulur; aynı metin tek kopya
+    saklanır. source, notun çıkarıldığı kaynağın (YouTube video + dil, PDF byte'ları) anahtarıdır ve
+    find_note ile pahalı işlemlerden önce tekrar eklemeleri yakalamak için kullanılır. Gövdesi
+    log'un içinde olan eski kayıtlar log yeniden indekslenirken blob store'a taşınır.
+
+    Not ekleme ve silme dosyanın sonuna tek satır eklemektir (O(1)); mevcut notlar okunup
+    yeniden yazılmaz.
+
+    Her kullanıcının bir manifest'i vardır: {directory}/{user_id}/manifest.json. Manifest dersleri
+    ve notların metadata'sını (id, label, size, created_at, preview, blob, source) tutar. Listeleme
+    sadece manifest'i okur; not gövdesi sadece istendiğinde blob store'dan okunur. Manifest'teki log_size gerçek dosya boyutundan farklıysa (ör. yarım
+    kalmış bir yazma) o dersin metadata'sı log'dan yeniden oluşturulur.
+
+    Eski {subject_id}_{user_id}.json dosyaları ilk açılışta bir kere log formatına taşınır.
+
+    Dayanıklılık ve eş zamanlılık:
+        - Log'a eklenen her kayıt fsync edilir; yarım kalmış son satır bir sonraki okumada kesilir.
+        - Manifest ve taşınan dosyalar temp dosyaya yazılıp fsync edilir ve rename ile değiştirilir.
+        - Kullanıcı bazında thread kilidi + process'ler arası advisory kilit (flock) kullanılır.
+        - Manifest yazımı write-behind'dır: art arda gelen ekleme/silmeler bellekte birleştirilir ve
+          manifest flush_delay sonra tek seferde yazılır. Flush'tan önce çökülürse manifest log'dan
+          yeniden oluşturulur (log_size kontrolü), veri kaybı olmaz.
+
+    Args
+    directory(str)      : Notların tutulduğu kök klasör.
+    preview_chars(int)  : Manifest'te saklanan önizleme uzunluğu.
+    flush_delay(float)  : Manifest write-behind gecikmesi (saniye). 0 ise her değişiklikte hemen yazılır.
+    """
 
     directory: str
     logger: any
+    blob_store: BlobStore
+    preview_chars: int = 250
+    flush_delay: float = 0.5
 
     def __post_init__(self):
-        pass
+        os.makedirs(self.directory, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # user_id -> henüz diske yazılmamış manifest
+        self._pending_manifests: Dict[int, dict] = {}
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_guard = threading.Lock()
+        self.migrate_legacy_files()
+
+    def _user_directory(self, user_id: int) -> str:
+        return os.path.join(self.directory, str(user_id))
+
+    @staticmethod
+    def validate_subject_id(subject_id: str) -> str:
+        if not isinstance(subject_id, str) or not SUBJECT_ID_PATTERN.fullmatch(subject_id):
+            raise InvalidSubjectError(f"Invalid subject_id: {subject_id!r}")
+        return subject_id
+
+    def _log_path(self, subject_id: str, user_id: int) -> str:
+        # subject_id istekten gelir; kullanıcının klasörü dışına çıkan bir yol oluşturulamaz
+        return os.path.join(self._user_directory(user_id), f"{self.validate_subject_id(subject_id)}.log")
+
+    def _manifest_path(self, user_id: int) -> str:
+        return os.path.join(self._user_directory(user_id), "manifest.json")
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def _user_lock(self, user_id: int):
+        # Manifest kullanıcının tüm dersleri için ortak olduğu için kilit kullanıcı bazındadır.
+        # Thread kilidi aynı process'teki, flock aynı klasörü kullanan diğer worker process'lerini sıraya sokar.
+        user_directory = self._user_directory(user_id)
+        with self._lock_for(user_directory):
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(user_directory, exist_ok=True)
+            with open(os.path.join(user_directory, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _fsync_directory(directory: str):
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _atomic_write(self, path: str, data: bytes):
+        """
+        Dosyayı yerinde açıp üzerine yazmak yerine: temp dosyaya yaz, fsync, rename. Çökme anında
+        dosya ya eski ya da yeni haliyle kalır, hiçbir zaman yarım kalmaz.
+        """
+        directory = os.path.dirname(path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._fsync_directory(directory)
+
+    def _note_metadata(self, record: dict) -> dict:
+        return {
+            "id": record["id"],
+            "label": record["label"],
+            "size": record["size"],
+            "created_at": record.get("created_at"),
+            "preview": record["preview"],
+            "blob": record["blob"],
+            "source": record.get("source"),
+        }
+
+    def _externalize(self, record: dict):
+        """
+        Gövdesi kaydın içinde olan (eski formattaki) bir add kaydının gövdesini blob store'a taşır.
+        """
+        note_text = record.pop("note")
+        record["blob"] = self.blob_store.put_text(note_text)
+        record["size"] = len(note_text)
+        record["preview"] = note_text[:self.preview_chars]
+        record.setdefault("source", None)
+
+    def _index_log(self, path: str) -> dict:
+        """
+        Log'u baştan okuyup dersin manifest kaydını oluşturur. Sadece manifest yoksa ya da
+        log ile uyuşmuyorsa çalışır. Çökme yüzünden yarım kalmış son satır log'dan kesilir;
+        gövdesi log'un içinde olan eski kayıtlar blob store'a taşınıp log yeniden yazılır.
+        """
+        records = []
+        valid_size = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    self.logger.warning(f"Truncating incomplete record at the end of {path} ({len(line)} bytes).")
+                    break
+                valid_size += len(line)
+                if line.strip():
+                    records.append(json.loads(line))
+        if os.path.getsize(path) != valid_size:
+            os.truncate(path, valid_size)
+
+        if any(record["op"] == "add" and "note" in record for record in records):
+            for record in records:
+                if record["op"] == "add" and "note" in record:
+                    self._externalize(record)
+            lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+            self._atomic_write(path, "".join(lines).encode("utf-8"))
+            self.logger.info(f"Inline note bodies moved to the blob store: {path}")
+
+        notes: Dict[int, dict] = {}
+        next_seq = 1
+        for record in records:
+            next_seq = max(next_seq, record["seq"] + 1)
+            if record["op"] == "add":
+                notes[record["id"]] = self._note_metadata(record)
+            elif record["op"] == "delete":
+                notes.pop(record["id"], None)
+        return {"log_size": os.path.getsize(path), "next_seq": next_seq, "notes": list(notes.values())}
+
+    def _write_manifest(self, user_id: int, manifest: dict):
+        self._atomic_write(self._manifest_path(user_id), json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+
+    def _save_manifest(self, user_id: int, manifest: dict):
+        """
+        Manifest'i write-behind kuyruğuna koyar; art arda gelen değişiklikler tek yazımda birleşir.
+        """
+        if self.flush_delay <= 0:
+            self._write_manifest(user_id, manifest)
+            return
+        with self._flush_guard:
+            self._pending_manifests[user_id] = manifest
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """
+        Bekleyen tüm manifest'leri diske yazar. Uygulama kapanırken de çağrılır.
+        """
+        with self._flush_guard:
+            self._flush_timer = None
+            user_ids = list(self._pending_manifests)
+        for user_id in user_ids:
+            with self._user_lock(user_id):
+                manifest = self._pending_manifests.pop(user_id, None)
+                if manifest is not None:
+                    self._write_manifest(user_id, manifest)
+
+    def close(self):
+        """
+        Bekleyen zamanlayıcıyı iptal eder ve kalan manifest'leri yazar (lifespan kapanışında çağrılır).
+        """
+        with self._flush_guard:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+        self.flush()
+
+    def _load_manifest(self, user_id: int) -> dict:
+        """
+        Kullanıcının manifest'ini okur ve log dosyalarıyla uyumunu (sadece stat ile) kontrol eder.
+        Maliyeti sadece bu kullanıcının ders ve not sayısına bağlıdır.
+        """
+        # Henüz yazılmamış (write-behind) manifest varsa o en günceldir
+        manifest = self._pending_manifests.get(user_id)
+        path = self._manifest_path(user_id)
+        if manifest is None:
+            manifest = {"format": MANIFEST_FORMAT, "subjects": {}}
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
 
-    def _load_data(self, subject_id: str, user_id: int) -> List[NoteEntry]:
-        filepath = os.path.join(self.directory, f"{subject_id}_{user_id}.json")
-        if not os.path.exists(filepath):
+        dirty = False
+        if manifest.get("format") != MANIFEST_FORMAT:
+            manifest = {"format": MANIFEST_FORMAT, "subjects": {}}
+            dirty = True
+        subjects = manifest["subjects"]
+        log_subjects = set(self.list_subjects(user_id))
+        for subject_id in list(subjects):
+            if subject_id not in log_subjects:
+                subjects.pop(subject_id)
+                dirty = True
+        for subject_id in log_subjects:
+            log_path = self._log_path(subject_id, user_id)
+            entry = subjects.get(subject_id)
+            if entry is None or entry["log_size"] != os.path.getsize(log_path):
+                self.logger.info(f"Rebuilding note manifest for user {user_id}, subject '{subject_id}'.")
+                subjects[subject_id] = self._index_log(log_path)
+                dirty = True
+
+        if dirty:
+            self._save_manifest(user_id, manifest)
+        return manifest
+
+    def _append(self, path: str, record: dict) -> tuple:
+        """
+        Kaydı log'un sonuna ekler ve (offset, length) döndürür.
+        """
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        return offset, len(line)
+
+    @staticmethod
+    def _to_entry(note: dict) -> NoteEntry:
+        return NoteEntry(**{key: note[key] for key in NoteEntry.model_fields if key in note})
+
+    def read_note(self, note: NoteEntry) -> str:
+        """
+        Notun gövdesini blob store'dan okur.
+        """
+        return self.blob_store.get_text(note.blob)
+
+    def note_byte_size(self, note: NoteEntry) -> int:
+        """
+        Gövdenin UTF-8 byte uzunluğu (NoteEntry.size karakter sayısıdır).
+        """
+        return self.blob_store.size(note.blob)
+
+    def iter_note_bytes(self, note: NoteEntry, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Gövdeyi (ya da [start, end] byte aralığını) blob'u tamamen açmadan parça parça üretir.
+        """
+        return self.blob_store.iter_range(note.blob, start, end)
+
+    def list_subjects(self, user_id: int) -> List[str]:
+        user_directory = self._user_directory(user_id)
+        if not os.path.isdir(user_directory):
             return []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-        return [NoteEntry(**item) for item in raw_data]
-    
+        return sorted(filename[:-len(".log")] for filename in os.listdir(user_directory) if filename.endswith(".log"))
 
-    def _save_data(self, subject_id: str, user_id: int, data: List[NoteEntry]):
-        filepath = os.path.join(self.directory, f"{subject_id}_{user_id}.json")
-        json_data = [item.model_dump() for item in data]
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, indent=4, ensure_ascii=False)
+    def _snapshot_notes(self, user_id: int, subject_id: Optional[str] = None) -> List[Tuple[str, List[dict]]]:
+        """
+        Seçilen derslerin not listelerinin kopyasını kilit içinde alır. Manifest _pending_manifests ile
+        paylaşıldığı için kilit bırakıldıktan sonra eş zamanlı bir add/delete tarafından değiştirilebilir.
+        """
+        with self._user_lock(user_id):
+            subjects = self._load_manifest(user_id)["subjects"]
+            selected = [subject_id] if subject_id is not None else sorted(subjects)
+            return [(current_subject, list(subjects.get(current_subject, {}).get("notes", []))) for current_subject in selected]
 
+    def _subject_notes(self, user_id: int, subject_id: str) -> List[dict]:
+        return self._snapshot_notes(user_id, subject_id)[0][1]
 
-    def get_subject_notes(self, subject_id: str) -> List[NoteEntry]:
+    def list_notes(self, user_id: int, subject_id: Optional[str] = None) -> List[dict]:
         """
-        Belirtilen subject_id'ye ait tüm notları döndürür.
+        Not metadata'sını (gövde olmadan) manifest'ten döndürür: id, subject, label, size, created_at, preview.
+        subject_id verilmezse kullanıcının tüm dersleri listelenir.
         """
-        return self._load_data(subject_id)
-        
-    
-    def add_note_to_subject(self, subject_id: str, user_id: int, label: str, note_text: str) -> NoteEntry:
+        return [
+            {**note, "subject": current_subject}
+            for current_subject, notes in self._snapshot_notes(user_id, subject_id)
+            for note in notes
+        ]
+
+    @staticmethod
+    def encode_cursor(subject_id: str, note_id: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([subject_id, note_id]).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        subject_id, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return subject_id, int(note_id)
+
+    def list_notes_page(self, user_id: int, subject_id: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        list_notes'un cursor ile sayfalanmış hali. Sıralama (ders, id); cursor bir önceki sayfanın
+        son notunu gösterir ve opak bir string olarak döner. Son sayfada next_cursor None'dır.
+        """
+        notes = self.list_notes(user_id, subject_id=subject_id)
+        if cursor:
+            position = self.decode_cursor(cursor)
+            notes = [note for note in notes if (note["subject"], note["id"]) > position]
+        page = notes[:limit]
+        next_cursor = self.encode_cursor(page[-1]["subject"], page[-1]["id"]) if len(notes) > limit else None
+        return page, next_cursor
+
+    def iter_notes(self, user_id: int, subject_id: Optional[str] = None) -> Iterator[dict]:
+        """
+        Notları gövdeleriyle birlikte tek tek üretir (toplu dışa aktarım için); bellekte aynı anda tek not tutulur.
+        """
+        for current_subject, notes in self._snapshot_notes(user_id, subject_id):
+            for note in notes:
+                yield {
+                    "subject": current_subject,
+                    "id": note["id"],
+                    "label": note["label"],
+                    "created_at": note.get("created_at"),
+                    "note": self.blob_store.get_text(note["blob"]),
+                }
+
+    def get_note(self, subject_id: str, user_id: int, note_id: int) -> Optional[NoteEntry]:
+        """
+        Tek bir notun kaydını döndürür (sadece manifest okunur); gövde için read_note kullanılır.
+        """
+        for note in self._subject_notes(user_id, subject_id):
+            if note["id"] == note_id:
+                return self._to_entry(note)
+        return None
+
+    def find_note(self, user_id: int, subject_id: str, source: Optional[str] = None, blob: Optional[str] = None) -> Optional[NoteEntry]:
+        """
+        Derste aynı kaynaktan (source) ya da aynı içerikle (blob) eklenmiş bir not varsa döndürür.
+        Tekrar yüklemeleri transkript, parse, etiketleme ve embedding'den önce yakalamak için kullanılır.
+        """
+        for note in self._subject_notes(user_id, subject_id):
+            if (source is not None and note.get("source") == source) or (blob is not None and note["blob"] == blob):
+                return self._to_entry(note)
+        return None
+
+    def get_subject_notes(self, subject_id: str, user_id: int) -> List[NoteEntry]:
+        """
+        Belirtilen kullanıcının, belirtilen subject_id'ye ait tüm not kayıtlarını döndürür.
+        """
+        return [self._to_entry(note) for note in self._subject_notes(user_id, subject_id)]
+
+    def add_note_to_subject(self, subject_id: str, user_id: int, label: str, note_text: str, source: Optional[str] = None) -> NoteEntry:
+        """
+        Gövdeyi blob store'a yazar ve log'a referansını ekler. Derste aynı içerikte bir not
+        zaten varsa yeni kayıt eklenmez, mevcut not döndürülür.
+        """
+        path = self._log_path(subject_id, user_id)
         note_text = note_text.strip()
-        existing_notes = self._load_data(subject_id, user_id)
+        digest = self.blob_store.put_text(note_text)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._user_lock(user_id):
+            manifest = self._load_manifest(user_id)
+            entry = manifest["subjects"].setdefault(subject_id, {"log_size": 0, "next_seq": 1, "notes": []})
+            for note in entry["notes"]:
+                if note["blob"] == digest:
+                    return self._to_entry(note)
+
+            new_id = entry["next_seq"]
+            record = {
+                "seq": new_id,
+                "op": "add",
+                "id": new_id,
+                "label": label,
+                "blob": digest,
+                "size": len(note_text),
+                "preview": note_text[:self.preview_chars],
+                "source": source,
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            offset, length = self._append(path, record)
+
+            metadata = self._note_metadata(record)
+            entry["notes"].append(metadata)
+            entry["next_seq"] = new_id + 1
+            entry["log_size"] = offset + length
+            self._save_manifest(user_id, manifest)
+        return self._to_entry(metadata)
+
+    def delete_note(self, subject_id: str, user_id: int, note_id: int) -> bool:
+        """
+        Notu silindi olarak işaretler (log'a bir delete kaydı ekler). Not bulunamazsa False döner.
+        Blob'lar başka notlar tarafından da kullanılabileceği için silinmez.
+        """
+        path = self._log_path(subject_id, user_id)
+        with self._user_lock(user_id):
+            manifest = self._load_manifest(user_id)
+            entry = manifest["subjects"].get(subject_id)
+            if entry is None or not any(note["id"] == note_id for note in entry["notes"]):
+                return False
+            offset, length = self._append(path, {"seq": entry["next_seq"], "op": "delete", "id": note_id})
+
+            entry["notes"] = [note for note in entry["notes"] if note["id"] != note_id]
+            entry["next_seq"] += 1
+            entry["log_size"] = offset + length
+            self._save_manifest(user_id, manifest)
+        return True
+
+    def get_all_notes(self, user_id: int) -> Dict[str, List[NoteEntry]]:
+        """
+        Kullanıcının tüm derslerdeki not kayıtlarını subject_id -> notlar olarak döndürür.
+        Sadece bu kullanıcının klasörü okunur.
+        """
+        return {subject_id: self.get_subject_notes(subject_id, user_id) for subject_id in self.list_subjects(user_id)}
+
+    def migrate_legacy_files(self) -> int:
+        """
+        Eski {subject_id}_{user_id}.json dosyalarını log formatına taşır (id'ler korunur).
+        Taşınan dosya .json.migrated olarak yeniden adlandırılır; tekrar çalıştırmak güvenlidir.
+        """
+        migrated = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            stem = filename[:-len(".json")]
+            subject_id, _, user_id = stem.rpartition("_")
+            if not subject_id or not user_id.isdigit():
+                continue
+
+            legacy_path = os.path.join(self.directory, filename)
+            if not SUBJECT_ID_PATTERN.fullmatch(subject_id):
+                self.logger.error(f"Legacy note file has an invalid subject_id, skipping: {legacy_path}")
+                continue
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    entries = sorted(json.load(f), key=lambda item: item["id"])
+            except Exception as e:
+                self.logger.error(f"Legacy note file could not be read, skipping: {legacy_path}: {e}")
+                continue
 
-        new_id = max((note.id for note in existing_notes), default=0) + 1
-        new_note_entry = NoteEntry(id=new_id, label=label, note=note_text)
+            path = self._log_path(subject_id, int(user_id))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._user_lock(int(user_id)):
+                if os.path.exists(path):
+                    self.logger.warning(f"Log already exists for {legacy_path}, skipping migration.")
+                    continue
+                records = [{"seq": item["id"], "op": "add", "id": item["id"], "label": item["label"], "note": item["note"], "created_at": None} for item in entries]
+                for record in records:
+                    self._externalize(record)
+                lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+                self._atomic_write(path, "".join(lines).encode("utf-8"))
+            os.replace(legacy_path, legacy_path + ".migrated")
+            migrated += 1
 
-        existing_notes.append(new_note_entry)
-        self._save_data(subject_id, user_id, existing_notes)
-        return new_note_entry
-    
-    def get_all_notes(self) -> Dict[str, List[NoteEntry]]:
-        all_notes_by_subject = {}
-        # Data dizinindeki tüm json dosyalarını listele
-        for filename in os.listdir(self.data_directory):
-            if filename.endswith(".json"):
-                subject_id = filename.replace(".json", "")
-                all_notes_by_subject[subject_id] = self._load_data(subject_id)
-        return all_notes_by_subject
+        if migrated:
+            self.logger.info(f"{migrated} legacy note file(s) migrated to the log store.")
+        return migrated
 
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+from collections import Counter
+from typing import List, Tuple
+import math
+import re
+
+
+TURKISH_STOPWORDS = {
+    "acaba", "ama", "ancak", "artık", "aslında", "az", "bana", "bazen", "bazı", "belki", "ben", "beni", "benim",
+    "beş", "bile", "bir", "birçok", "biri", "birkaç", "birşey", "biz", "bize", "bizi", "bizim", "bu", "buna",
+    "bunda", "bundan", "bunu", "bunun", "burada", "böyle", "çok", "çünkü", "da", "daha", "de", "defa", "değil",
+    "diğer", "diye", "dolayı", "dört", "elbette", "en", "fakat", "gibi", "göre", "hala", "halde", "hangi", "hem",
+    "hep", "hepsi", "her", "herhangi", "hiç", "için", "ile", "ilgili", "ise", "işte", "iki", "kadar", "karşın",
+    "kendi", "kendine", "kez", "ki", "kim", "kime", "kimi", "kimse", "mı", "mi", "mu", "mü", "nasıl", "ne",
+    "neden", "nedenle", "nerede", "nereye", "niçin", "niye", "o", "olan", "olarak", "oldu", "olduğu", "olduğunu",
+    "olmak", "olması", "olmayan", "olmaz", "olsa", "olup", "olur", "on", "ona", "ondan", "onlar", "onları",
+    "onların", "onu", "onun", "orada", "öyle", "pek", "rağmen", "sadece", "sanki", "sen", "siz", "sonra",
+    "şey", "şeyi", "şeyler", "şimdi", "şöyle", "şu", "şuna", "şunu", "tarafından", "tüm", "üç", "üzere", "var",
+    "vardır", "ve", "veya", "ya", "yani", "yapılan", "yapmak", "yine", "yoksa", "zaten", "eğer", "etmek", "eden",
+    "edilen", "ayrıca", "aynı", "başka", "bütün", "dır", "dir", "dur", "dür", "tır", "tir", "tur", "tür",
+    "ın", "in", "un", "ün", "nin", "nın", "nun", "nün", "dan", "den", "tan", "ten", "yı", "yi", "yu", "yü",
+    "şekilde", "şekil", "arasında", "böylece", "bunlar", "bunları", "şöyle", "oluşan", "olabilir", "olur",
+}
+
+ENGLISH_STOPWORDS = {
+    "a", "about", "above", "after", "again", "all", "also", "am", "an", "and", "any", "are", "as", "at", "be",
+    "because", "been", "before", "being", "between", "both", "but", "by", "can", "could", "did", "do", "does",
+    "doing", "down", "during", "each", "few", "for", "from", "further", "had", "has", "have", "having", "he",
+    "her", "here", "hers", "him", "his", "how", "i", "if", "in", "into", "is", "it", "its", "itself", "just",
+    "me", "more", "most", "my", "no", "nor", "not", "now", "of", "off", "on", "once", "only", "or", "other",
+    "our", "out", "over", "own", "same", "she", "should", "so", "some", "such", "than", "that", "the", "their",
+    "them", "then", "there", "these", "they", "this", "those", "through", "to", "too", "under", "until", "up",
+    "very", "was", "we", "were", "what", "when", "where", "which", "while", "who", "whom", "why", "will",
+    "with", "would", "you", "your", "yours", "let", "like", "get", "got", "one", "two", "okay", "yeah", "gonna",
+}
+
+STOPWORDS = TURKISH_STOPWORDS | ENGLISH_STOPWORDS
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+def turkish_lower(text: str) -> str:
+    """
+    Python'un str.lower() metodu 'I' ve 'İ' harflerini Türkçe kurallarına göre küçültmez.
+    """
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def turkish_title(text: str) -> str:
+    return " ".join(
+        ("İ" if word[0] == "i" else "I" if word[0] == "ı" else word[0].upper()) + word[1:]
+        for word in text.split(" ") if word
+    )
+
+
+@dataclass
+class KeywordExtractor:
+    """
+    LLM'e gitmeden metinden anahtar kelime/kelime grubu çıkaran lokal extractor.
+
+    Metin parçalara (chunk) bölünür; her aday terim için tek dokümanlık bir skor hesaplanır:
+    frekans * (1 + yayılım) * konum ağırlığı. Yayılım, terimin geçtiği chunk oranıdır; metnin geneline
+    yayılmış terim konuyu tek bir paragrafta yoğunlaşan terimden daha iyi temsil eder. Konum ağırlığı
+    metnin başında geçen terimleri öne çıkarır (YAKE benzeri).
+
+    Bu bir TF-IDF skoru değildir: referans korpus olmadığı için IDF yoktur ve dilde genel olarak sık
+    geçen kelimeler skorla cezalandırılmaz; bunlar yalnızca stopword listesi ile elenir.
+    Confidence, en iyi adayın ilk 10 aday skoru içindeki payının, adayın metinde yeterince
+    tekrar edip etmediği (min_support) ile çarpımıdır.
+
+    Args
+    min_token_length(int) : Bu uzunluktan kısa tokenlar aday olarak kullanılmaz.
+    min_support(int)      : En iyi adayın tam confidence alması için metinde geçmesi gereken minimum sayı.
+    chunk_size(int)       : Yayılım hesabı için bir chunk'taki token sayısı.
+    top_n(int)            : Döndürülecek maksimum aday sayısı.
+    """
+
+    min_token_length: int = 3
+    min_support: int = 3
+    chunk_size: int = 200
+    top_n: int = 3
+
+    def tokenize(self, text: str) -> List[str]:
+        return [turkish_lower(token) for token in TOKEN_PATTERN.findall(text)]
+
+    def _is_candidate(self, token: str) -> bool:
+        return len(token) >= self.min_token_length and token not in STOPWORDS and not token.isdigit()
+
+    def extract(self, text: str) -> Tuple[List[str], float]:
+        """
+        Returns:
+            Tuple[List[str], float]: Skora göre sıralı anahtar kelimeler ve 0-1 arası confidence.
+        """
+        tokens = self.tokenize(text)
+        if not tokens:
+            return [], 0.0
+
+        chunks = [tokens[i:i + self.chunk_size] for i in range(0, len(tokens), self.chunk_size)]
+
+        term_frequency = Counter()
+        chunk_frequency = Counter()
+        first_position = {}
+
+        for chunk_index, chunk in enumerate(chunks):
+            seen_in_chunk = set()
+            for i, token in enumerate(chunk):
+                if not self._is_candidate(token):
+                    continue
+                position = chunk_index * self.chunk_size + i
+                candidates = [token]
+                if i + 1 < len(chunk) and self._is_candidate(chunk[i + 1]):
+                    candidates.append(f"{token} {chunk[i + 1]}")
+                for candidate in candidates:
+                    term_frequency[candidate] += 1
+                    seen_in_chunk.add(candidate)
+                    first_position.setdefault(candidate, position)
+            chunk_frequency.update(seen_in_chunk)
+
+        # Tek seferlik bigramlar gürültüdür
+        scores = {}
+        for term, frequency in term_frequency.items():
+            is_bigram = " " in term
+            if is_bigram and frequency < 2:
+                continue
+            spread = chunk_frequency[term] / len(chunks)
+            position_weight = 1.0 / math.log(3 + first_position[term] / max(len(tokens), 1) * 10)
+            scores[term] = frequency * (1.0 + spread) * position_weight * (1.5 if is_bigram else 1.0)
+
+        if not scores:
+            return [], 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+        # Bir unigram, onu içeren ve yeterince güçlü bir bigram varsa bigram ile temsil edilir
+        keywords = []
+        for term, score in ranked:
+            if " " not in term:
+                bigram = next(
+                    (other for other, other_score in ranked
+                     if " " in other and term in other.split(" ") and other_score >= score * 0.5),
+                    None
+                )
+                term = bigram or term
+            if term in keywords or any(term in other.split(" ") for other in keywords):
+                continue
+            keywords.append(term)
+            if len(keywords) >= self.top_n:
+                break
+
+        top_term, top_score = ranked[0]
+        total_score = sum(score for _, score in ranked[:10])
+        dominance = top_score / total_score if total_score else 0.0
+        support = min(1.0, (term_frequency[top_term] - 1) / max(self.min_support - 1, 1))
+        return keywords, dominance * support
+
+
+if __name__ == "__main__":
+    pass
@@ -1,35 +1,28 @@
 from dataclasses import dataclass
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import List, Optional, Tuple
+import asyncio
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from dotenv import load_dotenv
-import os 
+from app.admission import AdmissionRejected
+from app.keyword_extractor import KeywordExtractor, turkish_title
+from app.llm_provider import LLMProvider
  
 
 @dataclass
 class LabelExtractor:
 
-    model_name: str # gemini-2.0-flash" or "gemini-pro"
+    llm_provider: LLMProvider
     logger:any
-    temperature: float = 0.2
-    max_retries: int = 2
+    local_confidence_threshold: float = 0.15 # lokal extractor bu değerin altında kalırsa LLM'e gidilir
+    max_llm_chars: int = 6000 # LLM'e gönderilecek örneklenmiş metnin maksimum uzunluğu
 
     def __post_init__(self):
-        load_dotenv()
-        self.GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-        if not self.GOOGLE_API_KEY:
-            self.logger.error("GOOGLE_API_KEY environment variable not set.")
-            raise ValueError("GOOGLE_API_KEY environment variable not set.")
+        self.keyword_extractor = KeywordExtractor()
 
-    def extract(self, subject_id, text):
-        """
-        Gemini modelini kullanarak verilen metni etiketler.
-        Metni temsil eden bir veya birkaç anahtar kelime/etiket döndürür.
-        """
-        llm = ChatGoogleGenerativeAI(model=self.model_name, temperature=self.temperature)
-
-        prompt_template = PromptTemplate.from_template(
-            f"""
+        # Client ve chain her çağrıda değil, bir kere oluşturulur.
+        self.llm = self.llm_provider.get("label")
+        self.prompt_template = PromptTemplate.from_template(
+            """
             Read the following text about {subject_id} and label it with 1 to 3 comma-separated keywords or short phrases that best describe it.
             Return only the keywords/phrases, add nothing else.
 
@@ -39,14 +32,80 @@ class LabelExtractor:
             Labels:
             """
         )
-        labeling_chain = prompt_template | llm | StrOutputParser()
+        self.labeling_chain = self.prompt_template | self.llm | StrOutputParser()
+
+    def sample_excerpt(self, text: str) -> str:
+        """
+        Uzun metinlerden baş, orta ve son kısımlardan eşit parçalar alarak LLM'e gidecek metni sınırlar.
+        """
+        if len(text) <= self.max_llm_chars:
+            return text
+
+        window = self.max_llm_chars // 3
+        middle = len(text) // 2 - window // 2
+        return "\n...\n".join([
+            text[:window],
+            text[middle:middle + window],
+            text[-window:]
+        ])
+
+    def _local_label(self, text) -> Tuple[Optional[str], List[str]]:
+        """
+        Lokal extractor yeterince eminse etiketi, değilse None döndürür; anahtar kelimeler LLM hatasında yedek olarak kullanılır.
+        """
+        keywords, confidence = self.keyword_extractor.extract(text)
+        self.logger.info(f"local keyword extractor: {keywords} (confidence: {confidence:.3f})")
+
+        if keywords and confidence >= self.local_confidence_threshold:
+            label = turkish_title(keywords[0])
+            self.logger.info(f"extractor extract like this (local): {label}")
+            return label, keywords
+        return None, keywords
 
-        labels = labeling_chain.invoke({"text": text})
-        label = labels.strip().split(",")[0]
+    def _fallback_label(self, keywords: List[str], error: Exception) -> str:
+        # Admission reddi yük durumudur; 503 olarak çağırana ulaşmalı
+        if isinstance(error, AdmissionRejected) or not keywords:
+            raise error
+        self.logger.error(f"LLM label extraction failed, falling back to local keyword: {error}")
+        return turkish_title(keywords[0])
+
+    def extract(self, subject_id, text):
+        """
+        Metni temsil eden bir anahtar kelime/etiket döndürür.
+
+        Önce lokal keyword extractor denenir. Confidence düşükse Gemini modeline
+        metnin tamamı yerine sınırlı, örneklenmiş bir kesiti gönderilir.
+        """
+        label, keywords = self._local_label(text)
+        if label is not None:
+            return label
+
+        try:
+            labels = self.labeling_chain.invoke({"subject_id": subject_id, "text": self.sample_excerpt(text)})
+            label = labels.strip().split(",")[0]
+        except Exception as e:
+            label = self._fallback_label(keywords, e)
 
         self.logger.info(f"extractor extract like this: {label}")
         return label
 
+    async def aextract(self, subject_id, text):
+        """
+        extract'ın async hali: lokal extractor thread'de çalışır, LLM'e sadece gerekirse ve
+        async (admission kuyruğunda thread tutmadan) gidilir.
+        """
+        label, keywords = await asyncio.to_thread(self._local_label, text)
+        if label is not None:
+            return label
+
+        try:
+            labels = await self.labeling_chain.ainvoke({"subject_id": subject_id, "text": self.sample_excerpt(text)})
+            label = labels.strip().split(",")[0]
+        except Exception as e:
+            label = self._fallback_label(keywords, e)
+
+        self.logger.info(f"extractor extract like this: {label}")
+        return label
 
 
 if __name__ == "__main__":
@@ -57,15 +116,11 @@ if __name__ == "__main__":
     }
     logger = Logger(**logger_config)
 
-    label_extractor_config = {
-        "model_name" : "gemini-2.5-flash", # gemini-2.0-flash"
-        "temperature" : 0.2,
-        "max_retries" : 2
-    }
+    llm_provider = LLMProvider(model_name="gemini-2.5-flash", logger=logger)
 
-    extractor = LabelExtractor(**label_extractor_config, logger=logger)
+    extractor = LabelExtractor(llm_provider=llm_provider, logger=logger)
     text = """
     Karbon atomunun ayrı bir kimyasının olmasının nedeni; karbon atomunun elektroniközelliğinden ve bağ yapma kabiliyetinden ileri gelir.Karbon atomu kendisiyle düz zincir halinde, dallanmıĢ ve halkalı kararlı bileĢiklermeydana getirebilir. Karbon atomu bir baĢka karbon atomu veya oksijen, kükürt gibi baĢka biratomla tekli, ikili ve üçlü bağlar oluĢturarak sağlam yapılı bileĢikler oluĢtururlar. Bu önemliözellik baĢka atomlarda yoktur. Ġnorganik bileĢikler iyonik yapılı olduklarından suda iyiçözünürler. Organik bileĢikler ise kovalent yapılı olduklarından suda çözünmez. Fakat eter,benzen, karbontetraklorür gibi çözücülerde iyi çözünürler. Anorganik bileĢikler yanmaözelliği göstermezken, organik bileĢiklerde yanma özelliği gözlenir. Anorganik bileĢiklerdeizomere çok az rastlanır. Organik bileĢiklerde ise oldukça çok rastlanır. (Kapalı formülleriaynı açık formülleri farklı olan bileĢiklere izomer bileĢikler denir.) Anorganik bileĢikleriyonik reaksiyonlar verirken organik bileĢikler moleküler reaksiyon verirler. OrganikbileĢikleri karbon veya hidrojen bileĢikleri veya onların türevleri olarak tanımlamakmümkündür. Gerçekten hidrojen bulundurmayan organik bileĢiklerin sayısı çok azdır
     """
     
-    extractor.extract(text)
\ No newline at end of file
+    extractor.extract("kimya", text)
\ No newline at end of file
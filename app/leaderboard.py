@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import asyncio
+import time
+
+
+@dataclass
+class Leaderboard:
+    """
+    Global sıralamanın (top-N) bellekte tutulan kopyası.
+
+    Puanlar sadece artabildiği için liste artımlı olarak kesin şekilde güncellenebilir: bir
+    kullanıcının puanı arttığında sadece o kullanıcı listede yukarı çıkar ya da listeye girer.
+    Başka worker process'lerinin yaptığı güncellemeler için liste refresh_seconds'da bir
+    veritabanından yeniden yüklenir. Yükleme load_lock ile tek seferde yapılır; okunan satırlar
+    (replica geride olabilir) bellekteki puanlarla kullanıcı bazında max() ile birleştirilir.
+
+    Args
+    capacity(int)           : Bellekte tutulan kullanıcı sayısı (servis edilen limit bundan büyük olamaz).
+    refresh_seconds(float)  : Bu süreden eski liste veritabanından yeniden yüklenir.
+    """
+
+    capacity: int = 50
+    refresh_seconds: float = 60
+    entries: List[dict] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.loaded_at: Optional[float] = None
+        self.loading = False
+        self._pending: Dict[int, dict] = {}
+        # Eş zamanlı yüklemeler birbirinin _pending'ini sıfırlamasın diye tek yükleme
+        self.load_lock = asyncio.Lock()
+
+    def is_fresh(self, limit: int) -> bool:
+        return (
+            self.loaded_at is not None
+            and limit <= self.capacity
+            and time.monotonic() - self.loaded_at < self.refresh_seconds
+        )
+
+    def top(self, limit: int) -> List[dict]:
+        return [dict(entry) for entry in self.entries[:limit]]
+
+    def begin_load(self):
+        self.loading = True
+        self._pending = {}
+
+    def load(self, rows: List[dict]):
+        # Puanlar sadece artar: geride kalan bir replica'dan okunan satır, commit sonrası
+        # uygulanmış bir artışı geri almasın
+        merged = {entry["user_id"]: dict(entry) for entry in self.entries}
+        for row in rows:
+            current = merged.get(row["user_id"])
+            if current is None or current["score"] <= row["score"]:
+                merged[row["user_id"]] = dict(row)
+        self.entries = sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)[:self.capacity]
+        self.loaded_at = time.monotonic()
+        self._finish_load()
+
+    def abort_load(self):
+        # Okuma başarısız oldu: eski liste kalır, yükleme sırasında gelen güncellemeler yine uygulanır
+        self._finish_load()
+
+    def _finish_load(self):
+        self.loading = False
+        # Yükleme sırasında gelen güncellemeler kaybolmasın
+        pending, self._pending = self._pending, {}
+        for entry in pending.values():
+            self.apply(**entry)
+
+    def qualifies(self, user_id: int, score: int) -> bool:
+        if any(entry["user_id"] == user_id for entry in self.entries):
+            return True
+        return len(self.entries) < self.capacity or score > self.entries[-1]["score"]
+
+    def apply(self, user_id: int, score: int, username: Optional[str] = None, email: Optional[str] = None):
+        """
+        Commit edilmiş bir puan değişikliğini listeye uygular.
+        """
+        if self.loading:
+            previous = self._pending.get(user_id)
+            if previous is None or previous["score"] < score:
+                self._pending[user_id] = {"user_id": user_id, "score": score, "username": username, "email": email}
+            return
+        if self.loaded_at is None:
+            return
+
+        for entry in self.entries:
+            if entry["user_id"] == user_id:
+                entry["score"] = max(entry["score"], score)
+                break
+        else:
+            if username is None and email is None:
+                # Kullanıcı bilgisi olmadan listeye eklenemez, bir sonraki refresh'te gelir
+                return
+            self.entries.append({"user_id": user_id, "username": username, "email": email, "score": score})
+
+        self.entries.sort(key=lambda entry: entry["score"], reverse=True)
+        del self.entries[self.capacity:]
+
+
+if __name__ == "__main__":
+    pass
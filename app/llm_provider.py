@@ -0,0 +1,148 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Tuple
+import asyncio
+import os
+import threading
+from pydantic import PrivateAttr
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_google_genai import ChatGoogleGenerativeAI
+from dotenv import load_dotenv
+from app.admission import AdmissionController
+
+
+class PooledChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """
+    Gerçek model çağrısını (_generate/_agenerate) admission controller'a ve process genelindeki
+    token bucket'a bağlar. bind_tools ve chain'ler de bu metodlardan geçtiği için limitler
+    her kullanımda geçerlidir. Token, admission'dan sonra alınır; böylece bucket'taki sıra da
+    önceliğe göre belirlenir.
+    """
+
+    _admission: AdmissionController = PrivateAttr(default=None)
+    _priority_class: str = PrivateAttr(default=None)
+    _token_bucket: InMemoryRateLimiter = PrivateAttr(default=None)
+
+    def _generate(self, *args, **kwargs):
+        with self._admission.slot(self._priority_class):
+            self._token_bucket.acquire(blocking=True)
+            return super()._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        async with self._admission.aslot(self._priority_class):
+            await self._token_bucket.aacquire(blocking=True)
+            return await super()._agenerate(*args, **kwargs)
+
+
+@dataclass
+class LLMProvider:
+    """
+    Uygulamadaki tüm LLM client'larını role göre dağıtan merkezi provider.
+
+    Aynı (model, temperature, öncelik sınıfı) üçlüsüne sahip roller aynı client'ı paylaşır.
+    Tüm client'lar tek bir token-bucket rate limiter ve tek bir öncelikli admission controller
+    kullanır, böylece ani yüklenmelerde istekler 429 almak yerine önceliğine göre kuyrukta bekler.
+
+    Args
+    model_name(str)             : Rol için özel model belirtilmemişse kullanılacak model.
+    temperature(float)          : Rol için özel temperature belirtilmemişse kullanılacak değer.
+    max_retries(int)            : Client seviyesinde retry sayısı.
+    requests_per_minute(float)  : Process genelindeki ortalama istek limiti (quota).
+    max_bucket_size(int)        : Token bucket kapasitesi, yani izin verilen anlık burst.
+    max_concurrency(int)        : Aynı anda uçuşta olabilecek maksimum istek sayısı.
+    context_tokens(int)         : Rol için belirtilmemişse retrieval context'inin token bütçesi.
+    roles(dict)                 : role -> {model_name, temperature, priority_class, context_tokens} override'ları.
+    priority_classes(dict)      : sınıf -> {priority, max_concurrency, max_queue, queue_timeout}
+    """
+
+    model_name: str
+    logger: any
+    temperature: float = 0.2
+    max_retries: int = 2
+    requests_per_minute: float = 60
+    max_bucket_size: int = 10
+    max_concurrency: int = 8
+    context_tokens: int = 8000
+    roles: Dict[str, dict] = field(default_factory=dict)
+    priority_classes: Dict[str, dict] = field(default_factory=lambda: {
+        "interactive": {"priority": 0, "max_concurrency": 8, "max_queue": 32, "queue_timeout": 10},
+        "generation": {"priority": 1, "max_concurrency": 4, "max_queue": 16, "queue_timeout": 60},
+        "background": {"priority": 2, "max_concurrency": 2, "max_queue": 64, "queue_timeout": 120},
+    })
+    default_priority_class: str = "background"
+
+    def __post_init__(self):
+        load_dotenv()
+        self.google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not self.google_api_key:
+            self.logger.error("GOOGLE_API_KEY environment variable not set.")
+            raise ValueError("GOOGLE_API_KEY environment variable not set.")
+
+        self.rate_limiter = InMemoryRateLimiter(
+            requests_per_second=self.requests_per_minute / 60,
+            check_every_n_seconds=0.1,
+            max_bucket_size=self.max_bucket_size
+        )
+        self.admission = AdmissionController(
+            max_concurrency=self.max_concurrency,
+            classes=self.priority_classes,
+            logger=self.logger
+        )
+        self._clients: Dict[Tuple[str, float, str], PooledChatGoogleGenerativeAI] = {}
+        self._lock = threading.Lock()
+        self.logger.info(
+            f"LLMProvider initialized: {self.requests_per_minute} rpm, burst {self.max_bucket_size}, "
+            f"max concurrency {self.max_concurrency}, roles: {list(self.roles)}, "
+            f"priority classes: {list(self.priority_classes)}"
+        )
+
+    def role_config(self, role: str) -> Tuple[str, float, str]:
+        role_settings = self.roles.get(role, {})
+        return (
+            role_settings.get("model_name", self.model_name),
+            float(role_settings.get("temperature", self.temperature)),
+            role_settings.get("priority_class", self.default_priority_class)
+        )
+
+    def context_budget(self, role: str) -> int:
+        """
+        Rolün prompt'una girecek retrieval context'i için token bütçesi.
+        """
+        return int(self.roles.get(role, {}).get("context_tokens", self.context_tokens))
+
+    def get(self, role: str) -> ChatGoogleGenerativeAI:
+        """
+        Verilen rol için paylaşılan (pooled) chat client'ını döndürür.
+        """
+        key = self.role_config(role)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                model_name, temperature, priority_class = key
+                client = PooledChatGoogleGenerativeAI(
+                    model=model_name,
+                    temperature=temperature,
+                    max_retries=self.max_retries,
+                    google_api_key=self.google_api_key
+                )
+                client._admission = self.admission
+                client._priority_class = priority_class
+                client._token_bucket = self.rate_limiter
+                self._clients[key] = client
+                self.logger.info(f"LLM client created for role '{role}': {model_name} (temperature={temperature}, priority_class={priority_class})")
+        return client
+
+    async def run(self, role: str, func: Callable, *args, **kwargs):
+        """
+        Senkron, LLM çağıran bir işi (chain.invoke vb.) rolün öncelik sınıfında slot aldıktan sonra
+        thread'de çalıştırır. Kuyrukta beklerken thread tutulmaz; iş içindeki LLM çağrıları bu slotu
+        sırayla kullanır (paralel çağrılar da birbirini bekler, bkz. admission._HeldSlot).
+        """
+        async with self.admission.aslot(self.role_config(role)[2]):
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    def metrics(self) -> dict:
+        return self.admission.metrics()
+
+
+if __name__ == "__main__":
+    pass
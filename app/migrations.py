@@ -0,0 +1,253 @@
+from dataclasses import dataclass, field
+from typing import List
+import re
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class Migration:
+    """
+    Tek bir şema değişikliği.
+
+    Args
+    version(int)          : Artan sürüm numarası, bir kere uygulanan sürüm tekrar çalışmaz.
+    description(str)      : Kısa açıklama (schema_migrations tablosuna yazılır).
+    statements(List[str]) : Sırasıyla çalıştırılacak SQL ifadeleri.
+    concurrent(bool)      : True ise ifadeler transaction dışında (AUTOCOMMIT) çalışır.
+                            CREATE INDEX CONCURRENTLY tabloyu yazmaya kilitlemez ama transaction içinde çalışamaz.
+    """
+
+    version: int
+    description: str
+    statements: List[str] = field(default_factory=list)
+    concurrent: bool = False
+
+
+# create_all yeni tabloları oluşturur ama mevcut tablolara kolon/index eklemez.
+# Şemaya eklenen her şey buraya yeni bir sürüm olarak eklenir; eski sürümler değiştirilmez.
+MIGRATIONS = [
+    Migration(
+        version=1,
+        description="challenge result columns",
+        statements=[
+            "ALTER TABLE challenges ADD COLUMN IF NOT EXISTS sender_score INTEGER",
+            "ALTER TABLE challenges ADD COLUMN IF NOT EXISTS receiver_score INTEGER",
+            "ALTER TABLE challenges ADD COLUMN IF NOT EXISTS finished_at TIMESTAMP WITHOUT TIME ZONE",
+        ],
+    ),
+    Migration(
+        version=2,
+        description="hot query indexes",
+        concurrent=True,
+        statements=[
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_scores_total_score ON user_scores (total_score)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_question_answers_user_id_created_at ON question_answers (user_id, created_at)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_wrong_answers_user_id_created_at ON wrong_answers (user_id, created_at)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_challenges_receiver_id_accepted ON challenges (challenge_receiver_id, accepted_receiver)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_challenges_sender_id ON challenges (challenge_sender_id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_challenges_pending_receiver_id ON challenges (challenge_receiver_id) WHERE accepted_receiver = false",
+        ],
+    ),
+    Migration(
+        version=3,
+        description="challenge jsonb columns and topic",
+        # ::text üzerinden cast hem eski (json/varchar) hem yeni (jsonb) kolonlarda çalışır.
+        # String olarak iki kere encode edilmiş quiz'ler açılarak saklanır.
+        statements=[
+            "ALTER TABLE challenges ADD COLUMN IF NOT EXISTS topic VARCHAR",
+            "ALTER TABLE challenges ALTER COLUMN quiz_json TYPE JSONB USING "
+            "CASE WHEN left(quiz_json::text, 1) = '\"' THEN (quiz_json::text::jsonb #>> '{}')::jsonb ELSE quiz_json::text::jsonb END",
+            "ALTER TABLE challenges ALTER COLUMN sender_answer_for_challenge TYPE JSONB USING sender_answer_for_challenge::text::jsonb",
+            "ALTER TABLE challenges ALTER COLUMN receiver_answer_for_challenge TYPE JSONB USING receiver_answer_for_challenge::text::jsonb",
+            "UPDATE challenges SET topic = quiz_json -> 'questions' -> 0 ->> 'question' WHERE topic IS NULL",
+        ],
+    ),
+    Migration(
+        version=4,
+        description="monthly partitioned question_answers",
+        # Mevcut (partition'sız) tablo yeniden adlandırılır, aylık partition'lı tabloya kopyalanır ve silinir.
+        # create_all tabloyu zaten partition'lı oluşturduysa (yeni kurulum) sadece DEFAULT partition eklenir.
+        # Sonraki aylar için partition'ları app.retention.RetentionJob açar.
+        statements=[
+            """
+            DO $$
+            DECLARE
+                month_start date;
+            BEGIN
+                IF (SELECT relkind FROM pg_class WHERE oid = 'question_answers'::regclass) = 'r' THEN
+                    ALTER TABLE question_answers RENAME TO question_answers_unpartitioned;
+                    ALTER TABLE question_answers_unpartitioned RENAME CONSTRAINT question_answers_pkey TO question_answers_unpartitioned_pkey;
+                    ALTER INDEX IF EXISTS ix_question_answers_user_id_created_at RENAME TO ix_question_answers_unpartitioned_user_id_created_at;
+                    ALTER SEQUENCE question_answers_id_seq OWNED BY NONE;
+
+                    CREATE TABLE question_answers (
+                        id INTEGER NOT NULL DEFAULT nextval('question_answers_id_seq'),
+                        user_id INTEGER NOT NULL REFERENCES users (id),
+                        question TEXT NOT NULL,
+                        answer TEXT NOT NULL,
+                        created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+                        PRIMARY KEY (id, created_at)
+                    ) PARTITION BY RANGE (created_at);
+                    ALTER SEQUENCE question_answers_id_seq OWNED BY question_answers.id;
+                    CREATE INDEX ix_question_answers_user_id_created_at ON question_answers (user_id, created_at);
+
+                    FOR month_start IN
+                        SELECT generate_series(
+                            date_trunc('month', coalesce((SELECT min(created_at) FROM question_answers_unpartitioned), now())),
+                            date_trunc('month', now()),
+                            interval '1 month'
+                        )::date
+                    LOOP
+                        EXECUTE format(
+                            'CREATE TABLE IF NOT EXISTS %I PARTITION OF question_answers FOR VALUES FROM (%L) TO (%L)',
+                            'question_answers_y' || to_char(month_start, 'YYYY"m"MM'),
+                            month_start,
+                            (month_start + interval '1 month')::date
+                        );
+                    END LOOP;
+
+                    INSERT INTO question_answers (id, user_id, question, answer, created_at)
+                        SELECT id, user_id, question, answer, coalesce(created_at, now()) FROM question_answers_unpartitioned;
+                    DROP TABLE question_answers_unpartitioned;
+                END IF;
+
+                -- Aralığı olmayan satırlar için güvenlik ağı; normalde boş kalır
+                CREATE TABLE IF NOT EXISTS question_answers_default PARTITION OF question_answers DEFAULT;
+            END $$
+            """,
+        ],
+    ),
+]
+
+# Aynı anda açılan birden fazla worker'ın migration'ı paralel çalıştırmasını engeller
+MIGRATION_LOCK_ID = 7_354_210
+
+CONCURRENT_INDEX_PATTERN = re.compile(r"CREATE INDEX CONCURRENTLY IF NOT EXISTS (\w+) ON (\w+)", re.IGNORECASE)
+
+
+@dataclass
+class MigrationRunner:
+    """
+    MIGRATIONS listesindeki uygulanmamış sürümleri sırayla uygular ve schema_migrations tablosuna yazar.
+    """
+
+    engine: AsyncEngine
+    logger: any
+    migrations: List[Migration] = field(default_factory=lambda: MIGRATIONS)
+
+    async def applied_versions(self, conn) -> set:
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now())"
+        ))
+        result = await conn.execute(text("SELECT version FROM schema_migrations"))
+        return {row.version for row in result}
+
+    async def drop_invalid_index(self, conn, statement: str):
+        """
+        Yarıda kalmış bir CREATE INDEX CONCURRENTLY geride INVALID bir index bırakır ve
+        IF NOT EXISTS onu atlar. Böyle bir index varsa önce kaldırılır.
+        """
+        match = CONCURRENT_INDEX_PATTERN.search(statement)
+        if not match:
+            return
+        index_name = match.group(1)
+        result = await conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": index_name})
+        if result.first():
+            self.logger.warning(f"Invalid index {index_name} found, dropping before rebuild.")
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+    async def prepare_concurrent_statement(self, conn, statement: str) -> str:
+        """
+        Partition'lı tablolarda CREATE INDEX CONCURRENTLY desteklenmez. Yeni kurulumda create_all
+        question_answers'ı zaten partition'lı (ve boş) oluşturduğu için index bu durumda
+        CONCURRENTLY olmadan oluşturulur; partition'lara PostgreSQL kendisi yayar.
+        """
+        match = CONCURRENT_INDEX_PATTERN.search(statement)
+        if not match:
+            return statement
+        result = await conn.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": match.group(2)}
+        )
+        row = result.first()
+        if row is not None and row.relkind == "p":
+            self.logger.info(f"{match.group(2)} is partitioned, creating {match.group(1)} without CONCURRENTLY.")
+            return re.sub(r"\s+CONCURRENTLY\b", "", statement, count=1, flags=re.IGNORECASE)
+        return statement
+
+    async def run(self) -> List[int]:
+        applied_now = []
+        async with self.engine.connect() as conn:
+            # AUTOCOMMIT: CONCURRENTLY ifadeleri transaction dışında çalışmalı
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+            try:
+                applied = await self.applied_versions(conn)
+                for migration in sorted(self.migrations, key=lambda m: m.version):
+                    if migration.version in applied:
+                        continue
+
+                    self.logger.info(f"Applying migration {migration.version}: {migration.description}")
+                    if migration.concurrent:
+                        for statement in migration.statements:
+                            await self.drop_invalid_index(conn, statement)
+                            await conn.execute(text(await self.prepare_concurrent_statement(conn, statement)))
+                    else:
+                        await conn.execute(text("BEGIN"))
+                        try:
+                            for statement in migration.statements:
+                                await conn.execute(text(statement))
+                        except Exception:
+                            await conn.execute(text("ROLLBACK"))
+                            raise
+                        await conn.execute(text("COMMIT"))
+
+                    await conn.execute(
+                        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                        {"version": migration.version, "description": migration.description}
+                    )
+                    applied_now.append(migration.version)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+
+        if applied_now:
+            self.logger.info(f"Migrations applied: {applied_now}")
+        else:
+            self.logger.info("Database schema is up to date.")
+        return applied_now
+
+
+async def main(configs):
+    from app.logger import Logger
+    from app.connection import Connection
+
+    logger = Logger(**configs["logger"])
+    crud_config = {key: value for key, value in configs["crud"].items() if key in Connection.__dataclass_fields__}
+    connection = Connection(**crud_config, logger=logger)
+    await connection.create_engine()
+    try:
+        applied = await MigrationRunner(engine=connection.engine, logger=logger).run()
+        print(f"applied migrations: {applied}")
+    finally:
+        await connection.dispose_engine()
+
+
+if __name__ == "__main__":
+    # Uygulamayı durdurmadan şemayı güncellemek için: python -m app.migrations -e local
+    import argparse
+    import asyncio
+    from app.config import Configs
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-e", "--environment", type=str)
+    args = parser.parse_args()
+
+    configs = Configs().load(config_name=args.environment)
+    asyncio.run(main(configs))
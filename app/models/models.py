@@ -1,9 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-import json
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, text
 from . import Base
 
 
@@ -25,40 +25,68 @@ class User(Base):
 
 class QuestionAnswer(Base):
     __tablename__ = 'question_answers'
-
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        # Son N konuşma: WHERE user_id = ? ORDER BY created_at DESC LIMIT N
+        Index("ix_question_answers_user_id_created_at", "user_id", "created_at"),
+        # Aylık range partition'lar (question_answers_yYYYYmMM); partition'ları app.retention yönetir.
+        # Partition key primary key'in parçası olmak zorunda: (id, created_at)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, primary_key=True, default=func.now())
 
     user = relationship("User", back_populates="questions")
 
 
 class Challenges(Base):
     __tablename__ = 'challenges'
+    __table_args__ = (
+        Index("ix_challenges_receiver_id_accepted", "challenge_receiver_id", "accepted_receiver"),
+        Index("ix_challenges_sender_id", "challenge_sender_id"),
+        # Bekleyen challenge listesi (/get_challenges) için partial index
+        Index(
+            "ix_challenges_pending_receiver_id",
+            "challenge_receiver_id",
+            postgresql_where=text("accepted_receiver = false")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     challenge_sender_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     challenge_receiver_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     accepted_sender = Column(Boolean, default=True)
     accepted_receiver = Column(Boolean, default=False)
-    quiz_json = Column(JSON)
-    sender_answer_for_challenge = Column(String, default=None)
-    receiver_answer_for_challenge = Column(String, default=None)
+    # JSONB: quiz ve cevaplar SQL tarafında okunabilir (topic projeksiyonu, puanlama).
+    # none_as_null: Python None JSON 'null' değil SQL NULL olarak yazılır, IS NULL kontrolleri çalışır.
+    quiz_json = Column(JSONB(none_as_null=True))
+    sender_answer_for_challenge = Column(JSONB(none_as_null=True), default=None)
+    receiver_answer_for_challenge = Column(JSONB(none_as_null=True), default=None)
+    # Listelemede quiz_json yüklenmeden gösterilen kısa başlık
+    topic = Column(String, default=None)
+    # İki taraf da cevapladığında bir kere hesaplanıp saklanır, listelemede tekrar parse edilmez
+    sender_score = Column(Integer, default=None)
+    receiver_score = Column(Integer, default=None)
+    finished_at = Column(DateTime, default=None)
 
 
 class UserScore(Base):
     __tablename__ = "user_scores"
 
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    total_score = Column(Integer, default=0)
+    total_score = Column(Integer, default=0, index=True)
 
     user = relationship("User", back_populates="score")
 
 
 class WrongAnswer(Base):
     __tablename__ = "wrong_answers"
+    __table_args__ = (
+        Index("ix_wrong_answers_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
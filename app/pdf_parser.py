@@ -1,18 +1,119 @@
 from dataclasses import dataclass
-from langchain_community.document_loaders import PyPDFLoader
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+import asyncio
+from pypdf import PdfReader
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """
+    [start, end) aralığındaki sayfaların metnini döndürür. Process pool'da çalıştığı için modül seviyesindedir.
+    """
+    reader = PdfReader(file_path)
+    return [(reader.pages[index].extract_text() or "") for index in range(start, end)]
+
 
 @dataclass
 class PdfParser:
+    """
+    PDF'ten sayfa sayfa metin çıkarır.
+
+    CPU ağırlıklı çıkarma işi sınırlı bir process pool'da, sayfa aralıkları halinde çalışır: büyük bir
+    PDF birden fazla çekirdeğe dağılır ve event loop bloklanmaz. Sayfalar sırasıyla, hazır oldukça
+    üretilir; tüm PDF'in bitmesi beklenmez. Bir PDF için aynı anda en fazla max_pending görev
+    oluşturulur, yenisi ancak en eskisi tüketilince eklenir; tüketici yavaşsa çıkarılmış sayfalar birikmez.
+
+    Args
+    max_workers(int)      : Process pool boyutu.
+    pages_per_task(int)   : Bir pool görevine verilen sayfa sayısı.
+    max_pending(int)      : Aynı anda pool'a verilmiş görev sayısı ve bir PDF'in görev penceresi (varsayılan max_workers * 2).
+    """
+
+    max_workers: int = 2
+    pages_per_task: int = 8
+    max_pending: Optional[int] = None
 
     def __post_init__(self):
-        pass
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = asyncio.Semaphore(self.max_pending or self.max_workers * 2)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def iter_pages(self, file_path: str) -> Iterator[str]:
+        """
+        Senkron, sayfa sayfa çıkarma (pool kullanılmaz); bellekte aynı anda tek sayfa tutulur.
+        """
+        reader = PdfReader(file_path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
 
     def parse(self, file_path):
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        text = "\n\n".join([doc.page_content for doc in documents])
-        return text
+        return "\n\n".join(self.iter_pages(file_path))
+
+    async def _run(self, func, *args):
+        async with self._pending:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), func, *args)
+
+    async def aiter_pages(self, file_path: str) -> AsyncIterator[str]:
+        """
+        Sayfaları process pool'da çıkarır ve sırasıyla üretir.
+        """
+        page_count = await self._run(count_pages, file_path)
+        starts = iter(range(0, page_count, self.pages_per_task))
+        window = deque()
+
+        def schedule_next():
+            start = next(starts, None)
+            if start is not None:
+                window.append(asyncio.ensure_future(
+                    self._run(extract_page_range, file_path, start, min(start + self.pages_per_task, page_count))
+                ))
+
+        for _ in range(self.max_pending or self.max_workers * 2):
+            schedule_next()
+        try:
+            while window:
+                page_texts = await window.popleft()
+                schedule_next()
+                for page_text in page_texts:
+                    yield page_text
+        finally:
+            for task in window:
+                task.cancel()
+
+    async def extract(self, file_path: str, separator: str = "\n\n") -> Tuple[str, List[dict]]:
+        """
+        Sayfalar geldikçe boş olmayanları separator ile birleştirir ve her sayfa için
+        {"page": sayfa no, "span": [start, end)} segmentini döndürür; sayfa listesi ayrıca tutulmaz.
+        """
+        parts, segments = [], []
+        offset = 0
+        page_number = 0
+        async for page_text in self.aiter_pages(file_path):
+            page_number += 1
+            page_text = page_text.strip()
+            if not page_text:
+                continue
+            if parts:
+                offset += len(separator)
+            parts.append(page_text)
+            segments.append({"page": page_number, "span": [offset, offset + len(page_text)]})
+            offset += len(page_text)
+        return separator.join(parts), segments
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
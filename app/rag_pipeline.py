@@ -1,11 +1,12 @@
 from dataclasses import dataclass
 import os
 import json
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
+import threading
 import uuid
+from app.blob_store import BlobStore
 
 
 @dataclass
@@ -20,6 +21,14 @@ class NoteChunk:
     subject_id: str
     label: str
     content: str
+    blob: Optional[str] = None
+    # Chunk notun sadece bir parçasıysa (ör. PDF sayfası) gövde içindeki [start, end) aralığı
+    span: Optional[Tuple[int, int]] = None
+    page: Optional[int] = None
+    # Video transkript segmentleri için videodaki zaman aralığı (saniye)
+    video_id: Optional[str] = None
+    start: Optional[float] = None
+    end: Optional[float] = None
 
 
 @dataclass
@@ -27,27 +36,73 @@ class RagPipeline:
     model_name: str
     vector_db_directory: str
     logger: any
+    blob_store: Optional[BlobStore] = None
 
     def __post_init__(self):
         self.logger.info("Embedding model initializing...")
         self.embedding_model = GoogleGenerativeAIEmbeddings(model=self.model_name)
+        # user_id -> kullanıcının FAISS index'i için kilit (bkz. update_vector_db)
+        self._index_locks: Dict[int, threading.Lock] = {}
+        self._index_locks_guard = threading.Lock()
+
+    def _index_lock(self, user_id: int) -> threading.Lock:
+        with self._index_locks_guard:
+            lock = self._index_locks.get(user_id)
+            if lock is None:
+                lock = self._index_locks[user_id] = threading.Lock()
+            return lock
 
     def load_notes(self, json_path: str, subject_id: str, user_id: int) -> List[NoteChunk]:
         self.logger.info(f"Loading notes from JSON file: {json_path}")
         with open(json_path, "r", encoding="utf-8") as f:
             notes = json.load(f)
+        return self.notes_to_chunks(notes, subject_id=subject_id, user_id=user_id)
 
+    def notes_to_chunks(self, notes: List[dict], subject_id: str, user_id: int) -> List[NoteChunk]:
+        """
+        Not kayıtlarını (dict ya da NoteEntry) NoteChunk objelerine çevirir.
+        NoteEntry sadece blob referansı taşıdığı için gövde blob store'dan okunur.
+        """
         chunks = []
         for note in notes:
+            if not isinstance(note, dict):
+                note = note.model_dump()
+            blob = note.get("blob")
             chunks.append(NoteChunk(
                 id=str(uuid.uuid4()),
                 subject_id=subject_id,
                 label=note["label"],
-                content=note["note"]
+                content=note["note"] if "note" in note else self.blob_store.get_text(blob),
+                blob=blob
             ))
         self.logger.info(f"{len(chunks)} notes loaded and converted to NoteChunk objects for subject '{subject_id}' and user {user_id}.")
         return chunks
 
+    def segments_to_chunks(self, note, segments: List[dict], subject_id: str, user_id: int, video_id: Optional[str] = None) -> List[NoteChunk]:
+        """
+        Not gövdesinin segmentlerini ayrı chunk'lara çevirir: PDF sayfaları ({"page", "span"},
+        PdfParser.extract) ya da video zaman pencereleri ({"start", "end", "span"}, VideoTranscript.build_segments).
+        Segment metni not gövdesindeki span ile blob'a referans verir.
+        """
+        text = self.blob_store.get_text(note.blob)
+        chunks = [
+            NoteChunk(
+                id=str(uuid.uuid4()),
+                subject_id=subject_id,
+                label=note.label,
+                content=text[segment["span"][0]:segment["span"][1]],
+                blob=note.blob,
+                span=tuple(segment["span"]),
+                page=segment.get("page"),
+                video_id=video_id,
+                start=segment.get("start"),
+                end=segment.get("end")
+            )
+            for segment in segments
+        ]
+        self.logger.info(f"{len(chunks)} segment chunks created for subject '{subject_id}' and user {user_id}.")
+        return chunks
+
     def update_vector_db(self, note_chunks: List[NoteChunk], user_id: int):
         if not note_chunks:
             self.logger.info("No note chunks provided. Skipping vectorstore update.")
@@ -55,30 +110,42 @@ class RagPipeline:
 
         self.logger.info(f"Updating vectorstore with {len(note_chunks)} new note chunks...")
 
-        documents = [
-            Document(
-                page_content=chunk.content,
-                metadata={"label": chunk.label, "subject_id": chunk.subject_id}
-            )
+        # Gövdesi blob store'da olan chunk'lar docstore'a metin olarak değil, blob referansı olarak yazılır;
+        # metin sorgu sonucunda blob store'dan okunur (aynı metin diskte ikinci kez saklanmaz).
+        embeddings = self.embedding_model.embed_documents([chunk.content for chunk in note_chunks])
+        text_embeddings = [("" if chunk.blob else chunk.content, embedding) for chunk, embedding in zip(note_chunks, embeddings)]
+        metadatas = [
+            {
+                "label": chunk.label,
+                "subject_id": chunk.subject_id,
+                **({"blob": chunk.blob} if chunk.blob else {}),
+                **({"span": list(chunk.span)} if chunk.span else {}),
+                **({"page": chunk.page} if chunk.page else {}),
+                **({"video_id": chunk.video_id, "start": chunk.start, "end": chunk.end} if chunk.video_id else {}),
+            }
             for chunk in note_chunks
         ]
 
         user_db_path = os.path.join(self.vector_db_directory, f"user_{user_id}")
         os.makedirs(user_db_path, exist_ok=True)  # 👈 Klasörü burada da garantile
 
-        if os.listdir(user_db_path):  # 👈 içi doluysa yükle ve ekle
-            self.logger.info(f"Loading existing vectorstore for user {user_id}")
-            vectorstore = FAISS.load_local(
-                user_db_path,
-                self.embedding_model,
-                allow_dangerous_deserialization=True
-            )
-            vectorstore.add_documents(documents)
-        else:
-            self.logger.info(f"Creating new vectorstore for user {user_id}")
-            vectorstore = FAISS.from_documents(documents, self.embedding_model)
-
-        vectorstore.save_local(user_db_path)  # 👈 dosyayı user_{id} klasörüne kaydet
+        # load/add/save kullanıcı bazında sıraya girer: aynı kullanıcıya eş zamanlı yazan iki istek
+        # (ör. save_note ve BulkIngestor) aynı index'i yükleyip birbirinin eklediklerini ezmesin.
+        # Embedding hesaplaması kilit dışında kalır.
+        with self._index_lock(user_id):
+            if os.listdir(user_db_path):  # 👈 içi doluysa yükle ve ekle
+                self.logger.info(f"Loading existing vectorstore for user {user_id}")
+                vectorstore = FAISS.load_local(
+                    user_db_path,
+                    self.embedding_model,
+                    allow_dangerous_deserialization=True
+                )
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+            else:
+                self.logger.info(f"Creating new vectorstore for user {user_id}")
+                vectorstore = FAISS.from_embeddings(text_embeddings, self.embedding_model, metadatas=metadatas)
+
+            vectorstore.save_local(user_db_path)  # 👈 dosyayı user_{id} klasörüne kaydet
         self.logger.info(f"Vectorstore saved to {user_db_path}")
 
 
@@ -89,14 +156,24 @@ class RagPipeline:
             self.logger.warning(f"No vectorstore found for user {user_id}. Returning empty results.")
             return []
 
-        vectorstore = FAISS.load_local(
-            user_db_path,
-            self.embedding_model,
-            allow_dangerous_deserialization=True
-        )
+        # Yarım kalmış bir save_local'ı (index ve docstore ayrı dosyalar) okumamak için
+        with self._index_lock(user_id):
+            vectorstore = FAISS.load_local(
+                user_db_path,
+                self.embedding_model,
+                allow_dangerous_deserialization=True
+            )
 
         self.logger.info(f"Querying vectorstore for user {user_id} with query: '{query}'")
         results_with_scores = vectorstore.similarity_search_with_score(query, k=k)
+        texts = {}
+        for doc, _ in results_with_scores:
+            blob = doc.metadata.get("blob")
+            if not doc.page_content and blob:
+                if blob not in texts:
+                    texts[blob] = self.blob_store.get_text(blob)
+                span = doc.metadata.get("span")
+                doc.page_content = texts[blob][span[0]:span[1]] if span else texts[blob]
         return results_with_scores
 
 
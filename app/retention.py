@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Optional
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+PARTITION_NAME_PATTERN = re.compile(r"^question_answers_y(\d{4})m(\d{2})$")
+
+# Aynı anda birden fazla worker'ın retention çalıştırmasını engeller
+RETENTION_LOCK_ID = 7_354_211
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    month_index = day.year * 12 + (day.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(start: date) -> str:
+    return f"question_answers_y{start.year:04d}m{start.month:02d}"
+
+
+@dataclass
+class RetentionJob:
+    """
+    question_answers tablosunun aylık partition'larını yönetir.
+
+    - Önümüzdeki months_ahead ay için partition'ları önceden açar (insert'ler DEFAULT partition'a düşmesin).
+    - retention_months aydan eski partition'ları ayırır (DETACH), gzip'li JSONL olarak arşivler ve siler.
+      archive_mode="table" ise arşiv question_answers_archive tablosuna ay başına tek satır (bytea) olarak,
+      "jsonl" ise archive_dir altına .jsonl.gz dosyası olarak yazılır.
+
+    Args
+    retention_months(int)   : Ana tabloda tutulacak ay sayısı (içinde bulunulan ay dahil).
+    months_ahead(int)       : Önceden açılacak gelecek ay partition sayısı.
+    archive_mode(str)       : "table" ya da "jsonl".
+    archive_dir(str)        : archive_mode="jsonl" için hedef klasör.
+    interval_hours(float)   : Uygulama içinde periyodik çalıştırma aralığı.
+    """
+
+    logger: any
+    retention_months: int = 6
+    months_ahead: int = 2
+    archive_mode: str = "table"
+    archive_dir: str = "./archive/question_answers"
+    interval_hours: float = 24
+
+    def __post_init__(self):
+        if self.archive_mode not in ("table", "jsonl"):
+            raise ValueError(f"Unknown archive_mode: {self.archive_mode}")
+        self.engine: Optional[AsyncEngine] = None
+
+    async def ensure_partitions(self, conn, today: Optional[date] = None):
+        today = today or datetime.utcnow().date()
+        for offset in range(self.months_ahead + 1):
+            start = month_start(today, offset)
+            end = month_start(start, 1)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF question_answers "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+
+    async def list_partitions(self, conn) -> List[tuple]:
+        """
+        Aylık partition tablolarını (name, ay başı, bağlı mı) olarak döndürür. Önceki bir çalıştırmada
+        ayrılmış ama arşivlenememiş tablolar da bağlı değil (False) olarak listelenir.
+        """
+        result = await conn.execute(text(
+            "SELECT c.relname, c.relispartition FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = current_schema() AND c.relkind = 'r' AND c.relname LIKE 'question\\_answers\\_y%'"
+        ))
+        partitions = []
+        for name, attached in result:
+            match = PARTITION_NAME_PATTERN.match(name)
+            if match:
+                partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1), attached))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    async def export_partition(self, conn, name: str) -> tuple:
+        """
+        Partition'ı satır satır (server-side cursor) okuyup gzip'li JSONL'e yazar.
+
+        Returns:
+            tuple: (gzip bytes, satır sayısı)
+        """
+        buffer = io.BytesIO()
+        row_count = 0
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+            result = await conn.stream(text(f"SELECT id, user_id, question, answer, created_at FROM {name} ORDER BY created_at"))
+            async for row in result:
+                record = dict(row._mapping)
+                record["created_at"] = record["created_at"].isoformat()
+                gz.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                row_count += 1
+        return buffer.getvalue(), row_count
+
+    async def archive_partition(self, conn, name: str, start: date):
+        payload, row_count = await self.export_partition(conn, name)
+
+        if self.archive_mode == "table":
+            await conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS question_answers_archive ("
+                "partition_name VARCHAR PRIMARY KEY, "
+                "month DATE NOT NULL, "
+                "row_count INTEGER NOT NULL, "
+                "payload BYTEA NOT NULL, "
+                "archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now())"
+            ))
+            await conn.execute(text(
+                "INSERT INTO question_answers_archive (partition_name, month, row_count, payload) "
+                "VALUES (:name, :month, :row_count, :payload) "
+                "ON CONFLICT (partition_name) DO NOTHING"
+            ), {"name": name, "month": start, "row_count": row_count, "payload": payload})
+        else:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            archive_path = os.path.join(self.archive_dir, f"{name}.jsonl.gz")
+            temp_path = archive_path + ".tmp"
+            await asyncio.to_thread(self._write_file, temp_path, payload)
+            os.replace(temp_path, archive_path)
+
+        await conn.execute(text(f"DROP TABLE {name}"))
+        self.logger.info(f"[Retention] {name} archived ({row_count} rows, {len(payload)} bytes, mode={self.archive_mode}).")
+
+    @staticmethod
+    def _write_file(path: str, payload: bytes):
+        with open(path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def run_once(self, engine: Optional[AsyncEngine] = None, today: Optional[date] = None) -> List[str]:
+        engine = engine or self.engine
+        today = today or datetime.utcnow().date()
+        cutoff = month_start(today, -(self.retention_months - 1))
+        archived = []
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": RETENTION_LOCK_ID})).scalar()
+            if not locked:
+                self.logger.info("[Retention] Another worker is running retention, skipping.")
+                return archived
+            try:
+                await self.ensure_partitions(conn, today)
+                for name, start, attached in await self.list_partitions(conn):
+                    if start >= cutoff:
+                        continue
+                    if attached:
+                        # DETACH ana tabloyu kısa süre kilitler; bu yüzden arşivleme transaction'ından önce,
+                        # tek başına çalışır. Arşivleme yarıda kalırsa tablo ayrık kalır ve sonraki çalıştırmada arşivlenir.
+                        await conn.execute(text(f"ALTER TABLE question_answers DETACH PARTITION {name}"))
+                    # Arşiv yazılmadan partition silinmez
+                    await conn.execute(text("BEGIN"))
+                    try:
+                        await self.archive_partition(conn, name, start)
+                    except Exception:
+                        await conn.execute(text("ROLLBACK"))
+                        raise
+                    await conn.execute(text("COMMIT"))
+                    archived.append(name)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": RETENTION_LOCK_ID})
+        return archived
+
+    async def prepare(self, engine: AsyncEngine):
+        """
+        Açılışta, trafik alınmadan önce bu ayın ve sonraki ayların partition'larını açar.
+        Aksi halde ilk insert'ler DEFAULT partition'a düşer ve o ayın partition'ı sonradan açılamaz.
+        """
+        self.engine = engine
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await self.ensure_partitions(conn)
+
+    async def run_forever(self):
+        """
+        Uygulama ömrü boyunca interval_hours'da bir retention çalıştırır (lifespan'den task olarak başlatılır).
+        """
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.logger.error(f"[Retention] Retention run failed: {e!r}")
+            await asyncio.sleep(self.interval_hours * 3600)
+
+
+async def main(configs):
+    from app.logger import Logger
+    from app.connection import Connection
+
+    logger = Logger(**configs["logger"])
+    crud_config = {key: value for key, value in configs["crud"].items() if key in Connection.__dataclass_fields__}
+    connection = Connection(**crud_config, logger=logger)
+    await connection.create_engine()
+    try:
+        archived = await RetentionJob(**configs["retention"], logger=logger).run_once(connection.engine)
+        print(f"archived partitions: {archived}")
+    finally:
+        await connection.dispose_engine()
+
+
+if __name__ == "__main__":
+    # Elle çalıştırmak için: python -m app.retention -e local
+    import argparse
+    from app.config import Configs
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-e", "--environment", type=str)
+    args = parser.parse_args()
+
+    configs = Configs().load(config_name=args.environment)
+    asyncio.run(main(configs))
@@ -3,7 +3,10 @@ from datetime import datetime, timedelta
 from jose import jwt, JWTError, ExpiredSignatureError
 from dotenv import load_dotenv
 from fastapi import Request
+import hashlib
 import os
+import re
+import tempfile
 
 load_dotenv()
 
@@ -36,4 +39,56 @@ def verify_token_from_cookie(request: Request):
         return None
     except JWTError as e:
         print(f"JWT decode hatası: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def parse_byte_range(range_header: str, size: int):
+    """
+    "bytes=start-end", "bytes=start-" ve "bytes=-suffix" biçimindeki tek aralıklı Range header'ını
+    (start, end) (end dahil) olarak döndürür.
+
+    Header yoksa, biçimi bozuksa ya da desteklenmiyorsa (ör. çoklu aralık) None döner; Range yok
+    sayılır ve gövdenin tamamı 200 ile gönderilir (RFC 9110 14.2). Sadece biçimi geçerli ama
+    gövdeyle karşılanamayan aralıklar (start >= size, "bytes=-0") ValueError fırlatır (416).
+    """
+    if not range_header:
+        return None
+    match = RANGE_PATTERN.fullmatch(range_header.strip())
+    if match is None:
+        return None
+    start_text, end_text = match.groups()
+    if start_text == "":
+        if end_text == "":
+            return None
+        suffix = int(end_text)
+        if suffix == 0 or size == 0:
+            raise ValueError(f"unsatisfiable range: {range_header}")
+        return max(size - suffix, 0), size - 1
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"unsatisfiable range: {range_header}")
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    return start, end
+
+
+def spool_upload_to_disk(source_file, suffix: str = "", chunk_size: int = 1024 * 1024):
+    """
+    Upload'u parça parça bir temp dosyaya kopyalar ve SHA-256 özetini aynı geçişte hesaplar.
+    (temp dosya yolu, hex digest) döndürür; dosyayı silmek çağıranın sorumluluğundadır.
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source_file.read(chunk_size):
+                digest.update(chunk)
+                target.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
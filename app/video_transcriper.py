@@ -1,30 +1,233 @@
 from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
 from youtube_transcript_api import YouTubeTranscriptApi
 
+
+class TimeoutSession(requests.Session):
+    """
+    Timeout verilmeyen her isteğe varsayılan timeout ekleyen requests.Session. youtube_transcript_api
+    istekleri timeout'suz yapar; asyncio tarafındaki wait_for thread'i durduramadığı için istek
+    kendi timeout'u ile bitmelidir.
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+
+@dataclass
+class YouTubeFetcher:
+    """
+    Transkripti YouTube'dan çeker. Tüm istekler connection pool'lu tek bir requests.Session'ı paylaşır.
+
+    Args
+    pool_size(int)    : HTTP connection pool boyutu.
+    timeout(float)    : Tek bir HTTP isteği için bağlantı ve okuma timeout'u (saniye).
+    """
+
+    pool_size: int = 10
+    timeout: float = 30
+
+    def __post_init__(self):
+        session = TimeoutSession(timeout=self.timeout)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.ytt_api = YouTubeTranscriptApi(http_client=session)
+
+    def fetch(self, video_id: str, language: str) -> List[dict]:
+        return self.ytt_api.fetch(str(video_id), languages=[language]).to_raw_data()
+
+
+@dataclass
+class LocalFileFetcher:
+    """
+    Ağa çıkmadan (offline test ve benchmark için) transkripti dosyadan okur:
+    {directory}/{video_id}.{language}.json -> [{"text": ..., "start": ..., "duration": ...}, ...]
+
+    Args
+    latency(float) : Ağ gecikmesini taklit etmek için her okumada beklenecek süre (saniye).
+    """
+
+    directory: str
+    latency: float = 0.0
+
+    def fetch(self, video_id: str, language: str) -> List[dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        with open(os.path.join(self.directory, f"{video_id}.{language}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
 @dataclass
 class VideoTranscript:
-    
-    logger:any
+    """
+    YouTube transkriptlerini çeker ve (video_id, dil) bazında diskte cache'ler.
+
+    - Cache process'ler arası paylaşılır: {cache_dir}/{sha256(video_id:dil)}.json.gz, cache_ttl_hours sonra bayatlar.
+    - Aynı video için eş zamanlı istekler tek fetch'i bekler (single-flight); kütüphane senkron olduğu
+      için fetch thread'de, fetch_timeout ile çalışır ve event loop bloklanmaz. Her HTTP isteği de
+      fetch_timeout ile sınırlıdır; bekleyen taraf vazgeçtiğinde thread asılı kalmaz.
+    - fetcher="file" ise transkriptler local_directory'den okunur (offline benchmark için).
+    - segments() snippet zamanlamasını koruyarak transkripti örtüşen zaman pencerelerine böler;
+      her pencere ayrı chunk olarak indekslenir ve cevaplar videonun o anına link verebilir.
+
+    Args
+    cache_dir(str)          : Transkript cache klasörü.
+    cache_ttl_hours(float)  : Cache kaydının geçerlilik süresi.
+    fetch_timeout(float)    : Tek bir fetch için maksimum süre (saniye).
+    pool_size(int)          : HTTP connection pool boyutu.
+    fetcher(str)            : "youtube" ya da "file".
+    local_directory(str)    : fetcher="file" için transkript klasörü.
+    segment_seconds(float)  : Segment (zaman penceresi) uzunluğu.
+    segment_overlap_seconds(float) : Ardışık segmentlerin örtüşme süresi.
+    """
+
+    logger: any
+    cache_dir: str = "./cache/transcripts"
+    cache_ttl_hours: float = 24 * 7
+    fetch_timeout: float = 30
+    pool_size: int = 10
+    fetcher: str = "youtube"
+    local_directory: Optional[str] = None
+    segment_seconds: float = 75
+    segment_overlap_seconds: float = 15
 
     def __post_init__(self):
         self.logger.info(f"Video Transcipt post_init")
-        self.ytt_api = YouTubeTranscriptApi()
-
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self.fetcher == "youtube":
+            self.source = YouTubeFetcher(pool_size=self.pool_size, timeout=self.fetch_timeout)
+        elif self.fetcher == "file":
+            self.source = LocalFileFetcher(directory=self.local_directory)
+        else:
+            raise ValueError(f"Unknown transcript fetcher: {self.fetcher}")
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        # _load farklı thread'lerde çalışır
+        self._count_lock = threading.Lock()
+        self.fetch_count = 0
 
-    def transcript(self, video_id: str, language: str):
-        transcript = self.ytt_api.fetch(str(video_id), languages=[language])
-        all_texts = []
+    def _cache_path(self, video_id: str, language: str) -> str:
+        key = hashlib.sha256(f"{video_id}:{language}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
 
-        for snippet in transcript:
-            all_texts.append(snippet.text)
+    def _read_cache(self, video_id: str, language: str) -> Optional[List[dict]]:
+        path = self._cache_path(video_id, language)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Corrupt transcript cache entry {path} ignored: {e}")
+            return None
+        if time.time() - cached["fetched_at"] > self.cache_ttl_hours * 3600:
+            return None
+        return cached["snippets"]
 
-        full_text = " ".join(all_texts)
+    def _write_cache(self, video_id: str, language: str, snippets: List[dict]):
+        path = self._cache_path(video_id, language)
+        payload = json.dumps({"video_id": video_id, "language": language, "fetched_at": time.time(), "snippets": snippets}, ensure_ascii=False)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(payload.encode("utf-8")))
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
 
-        return full_text
+    def _load(self, video_id: str, language: str) -> List[dict]:
+        snippets = self._read_cache(video_id, language)
+        if snippets is not None:
+            return snippets
+        with self._count_lock:
+            self.fetch_count += 1
+        snippets = self.source.fetch(video_id, language)
+        self._write_cache(video_id, language, snippets)
+        return snippets
 
+    async def fetch(self, video_id: str, language: str) -> List[dict]:
+        """
+        Transkripti {text, start, duration} snippet'leri olarak döndürür (cache -> single-flight fetch).
+        """
+        key = (str(video_id), language)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(asyncio.wait_for(asyncio.to_thread(self._load, *key), self.fetch_timeout))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: bekleyenlerden biri iptal edilirse ortak fetch iptal olmasın
+        return await asyncio.shield(future)
 
+    @staticmethod
+    def join_snippets(snippets: List[dict]) -> Tuple[str, List[tuple]]:
+        """
+        Snippet'leri tek metinde birleştirir ve her snippet için (başlangıç sn, bitiş sn, metindeki [start, end)) döndürür.
+        """
+        parts, positions = [], []
+        offset = 0
+        for snippet in snippets:
+            text = snippet["text"].strip()
+            if not text:
+                continue
+            if parts:
+                offset += 1
+            parts.append(text)
+            positions.append((snippet["start"], snippet["start"] + snippet.get("duration", 0), offset, offset + len(text)))
+            offset += len(text)
+        return " ".join(parts), positions
 
+    def build_segments(self, snippets: List[dict]) -> Tuple[str, List[dict]]:
+        """
+        Transkript metnini ve örtüşen zaman pencerelerini döndürür. Her segment
+        {"start", "end"} (saniye) ve metin içindeki "span" ([start, end) karakter aralığı) taşır.
+        """
+        text, positions = self.join_snippets(snippets)
+        segments = []
+        first = 0
+        while first < len(positions):
+            window_start = positions[first][0]
+            window_end = window_start + self.segment_seconds
+            last = first
+            while last + 1 < len(positions) and positions[last + 1][0] < window_end:
+                last += 1
+            segments.append({
+                "start": window_start,
+                "end": positions[last][1],
+                "span": [positions[first][2], positions[last][3]],
+            })
+            if last + 1 >= len(positions):
+                break
+            # Sonraki pencere, bu pencerenin son overlap saniyesinden başlar
+            next_first = first + 1
+            while next_first <= last and positions[next_first][0] < window_end - self.segment_overlap_seconds:
+                next_first += 1
+            first = next_first
+        return text, segments
 
+    async def segments(self, video_id: str, language: str) -> Tuple[str, List[dict]]:
+        return self.build_segments(await self.fetch(video_id, language))
 
+    async def transcript(self, video_id: str, language: str) -> str:
+        text, _ = self.join_snippets(await self.fetch(video_id, language))
+        return text
 
 
+if __name__ == "__main__":
+    pass
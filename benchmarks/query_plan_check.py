@@ -0,0 +1,105 @@
+"""
+Sıcak sorguların planlarının beklenen index'leri kullandığını kontrol eder.
+
+Küçük tablolarda planner seq scan'i tercih edebildiği için kontrol sırasında
+enable_seqscan kapatılır; böylece kullanılabilir bir index varsa plan onu göstermek zorundadır.
+
+Kullanım: python -m benchmarks.query_plan_check -e local
+"""
+from dataclasses import dataclass
+from typing import List
+import argparse
+import asyncio
+import sys
+from datetime import timedelta
+from sqlalchemy import select, desc, func, text
+from sqlalchemy.dialects import postgresql
+from app.config import Configs
+from app.connection import Connection
+from app.logger import Logger
+from app.models.models import QuestionAnswer, WrongAnswer, Challenges, UserScore
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    statement: any
+    expected_index: str
+
+
+def hot_queries(user_id: int = 1) -> List[PlanCheck]:
+    return [
+        PlanCheck(
+            name="last conversations",
+            statement=(
+                select(QuestionAnswer)
+                .where(QuestionAnswer.user_id == user_id, QuestionAnswer.created_at >= func.now() - timedelta(days=30))
+                .order_by(desc(QuestionAnswer.created_at))
+                .limit(3)
+            ),
+            # Partition'lı tabloda plan, partition'ların kendi index'lerini (<partition>_user_id_created_at_idx) gösterir
+            expected_index="user_id_created_at_idx",
+        ),
+        PlanCheck(
+            name="last wrong answers",
+            statement=select(WrongAnswer).where(WrongAnswer.user_id == user_id).order_by(desc(WrongAnswer.created_at)).limit(5),
+            expected_index="ix_wrong_answers_user_id_created_at",
+        ),
+        PlanCheck(
+            name="pending challenges",
+            statement=select(Challenges).where(Challenges.challenge_receiver_id == user_id, Challenges.accepted_receiver == False),
+            expected_index="ix_challenges_pending_receiver_id",
+        ),
+        PlanCheck(
+            name="sent challenges",
+            statement=select(Challenges).where(Challenges.challenge_sender_id == user_id),
+            expected_index="ix_challenges_sender_id",
+        ),
+        PlanCheck(
+            name="received challenges",
+            statement=select(Challenges).where(Challenges.challenge_receiver_id == user_id, Challenges.accepted_receiver == True),
+            expected_index="ix_challenges_receiver_id_accepted",
+        ),
+        PlanCheck(
+            name="top scores",
+            statement=select(UserScore).order_by(UserScore.total_score.desc()).limit(50),
+            expected_index="ix_user_scores_total_score",
+        ),
+    ]
+
+
+async def explain(conn, statement) -> str:
+    sql = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    result = await conn.execute(text(f"EXPLAIN {sql}"))
+    return "\n".join(row[0] for row in result)
+
+
+async def main(configs) -> int:
+    logger = Logger(**configs["logger"])
+    crud_config = {key: value for key, value in configs["crud"].items() if key in Connection.__dataclass_fields__}
+    connection = Connection(**crud_config, logger=logger)
+    await connection.create_engine()
+
+    failures = 0
+    try:
+        async with connection.engine.connect() as conn:
+            await conn.execute(text("SET enable_seqscan = off"))
+            for check in hot_queries():
+                plan = await explain(conn, check.statement)
+                passed = check.expected_index in plan
+                failures += not passed
+                print(f"[{'OK' if passed else 'FAIL'}] {check.name}: expected {check.expected_index}")
+                if not passed:
+                    print(plan)
+    finally:
+        await connection.dispose_engine()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-e", "--environment", type=str)
+    args = parser.parse_args()
+
+    configs = Configs().load(config_name=args.environment)
+    sys.exit(1 if asyncio.run(main(configs)) else 0)
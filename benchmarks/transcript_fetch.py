@@ -0,0 +1,60 @@
+"""
+VideoTranscript'in cache ve single-flight davranışını ağa çıkmadan ölçer.
+
+LocalFileFetcher sahte transkriptleri geçici bir klasörden, her okumada --latency kadar bekleyerek okur.
+Aynı videolar için eş zamanlı istekler gönderilir; kaynağa giden fetch sayısı ve süreler raporlanır.
+
+Kullanım: python -m benchmarks.transcript_fetch --videos 5 --requests 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from app.video_transcriper import VideoTranscript
+
+
+def write_fake_transcripts(directory: str, videos: int, language: str, snippets: int = 300):
+    for index in range(videos):
+        data = [{"text": f"video {index} cümle {n}", "start": n * 4.0, "duration": 4.0} for n in range(snippets)]
+        with open(os.path.join(directory, f"video{index:05d}.{language}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+async def run_round(transcripter: VideoTranscript, videos: int, requests: int, language: str) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(transcripter.transcript(f"video{n % videos:05d}", language) for n in range(requests)))
+    return time.perf_counter() - started
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as cache_dir:
+        write_fake_transcripts(source_dir, args.videos, args.language)
+        transcripter = VideoTranscript(
+            logger=logging.getLogger("benchmark"),
+            cache_dir=cache_dir,
+            fetcher="file",
+            local_directory=source_dir
+        )
+        transcripter.source.latency = args.latency
+
+        cold = await run_round(transcripter, args.videos, args.requests, args.language)
+        print(f"cold : {args.requests} requests, {transcripter.fetch_count} fetches, {cold:.3f}s")
+
+        fetches = transcripter.fetch_count
+        warm = await run_round(transcripter, args.videos, args.requests, args.language)
+        print(f"warm : {args.requests} requests, {transcripter.fetch_count - fetches} fetches, {warm:.3f}s")
+        print(f"uncached sequential estimate: {args.requests * args.latency:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--language", type=str, default="tr")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
@@ -0,0 +1,79 @@
+class FakeSession:
+    """
+    session_scope testleri için commit/rollback çağrılarını kaydeden sahte AsyncSession.
+    """
+
+    def __init__(self, fail_commit: bool = False, rows: dict = None):
+        self.info = {}
+        self.fail_commit = fail_commit
+        self.calls = []
+        # (model, id) -> nesne; session.get için
+        self.rows = rows or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.calls.append("close")
+
+    async def commit(self):
+        self.calls.append("commit")
+        if self.fail_commit:
+            raise RuntimeError("commit failed")
+
+    async def rollback(self):
+        self.calls.append("rollback")
+
+    def add(self, obj):
+        self.calls.append("add")
+
+    async def flush(self):
+        self.calls.append("flush")
+
+    async def get(self, model, obj_id):
+        return self.rows.get((model, obj_id))
+
+
+class FakeLogger:
+    def __init__(self):
+        self.records = []
+
+    def __getattr__(self, level):
+        return lambda message, *args, **kwargs: self.records.append((level, message))
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def execute(self, statement, *args):
+        self.engine.statements.append(str(statement))
+
+    async def run_sync(self, func, *args):
+        self.engine.statements.append(func.__name__)
+
+
+class FakeEngine:
+    """
+    İlk failures kadar bağlantı denemesi hata veren sahte AsyncEngine.
+    """
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = 0
+        self.statements = []
+
+    def connect(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise OSError("connection refused")
+        return FakeConnection(self)
+
+    def begin(self):
+        return FakeConnection(self)
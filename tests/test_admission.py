@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import threading
+import time
+import pytest
+from langchain_core.runnables import RunnableLambda
+from app.admission import AdmissionController, AdmissionRejected
+from app.llm_provider import LLMProvider
+
+
+def make_controller(max_concurrency=1, **overrides):
+    classes = {
+        "interactive": {"priority": 0, "max_concurrency": 1, "max_queue": 8, "queue_timeout": 5},
+        "background": {"priority": 2, "max_concurrency": 1, "max_queue": 8, "queue_timeout": 5},
+    }
+    for name, settings in overrides.items():
+        classes[name].update(settings)
+    return AdmissionController(max_concurrency=max_concurrency, classes=classes, logger=logging.getLogger("test"))
+
+
+def test_higher_priority_waiter_is_admitted_first():
+    async def scenario():
+        controller = make_controller()
+        order = []
+        await controller.aacquire("background")
+
+        async def waiter(name):
+            async with controller.aslot(name):
+                order.append(name)
+
+        tasks = [asyncio.create_task(waiter("background"))]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(waiter("interactive")))
+        await asyncio.sleep(0.01)
+        controller.release("background")
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "background"]
+
+
+def test_async_waiters_do_not_hold_threads():
+    async def scenario():
+        controller = make_controller(background={"max_queue": 64})
+        await controller.aacquire("background")
+        threads_before = threading.active_count()
+        tasks = [asyncio.create_task(controller.aacquire("background")) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        assert controller.priority_classes["background"].queued == 50
+        assert threading.active_count() == threads_before
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.priority_classes["background"].queued == 0
+
+
+def test_cancelled_waiter_releases_granted_slot():
+    async def scenario():
+        controller = make_controller()
+        await controller.aacquire("interactive")
+        task = asyncio.create_task(controller.aacquire("interactive"))
+        await asyncio.sleep(0.01)
+        # Slot bekleyene devredilir, ama bekleyen uyanmadan iptal edilir
+        controller.release("interactive")
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight == 0
+    assert controller.priority_classes["interactive"].in_flight == 0
+    assert controller.priority_classes["interactive"].queued == 0
+
+
+def test_async_waiter_times_out_and_queue_limit():
+    async def scenario():
+        controller = make_controller(interactive={"queue_timeout": 0.05, "max_queue": 1})
+        await controller.aacquire("interactive")
+        waiter = asyncio.create_task(controller.aacquire("interactive"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected, match="queue is full"):
+            await controller.aacquire("interactive")
+        with pytest.raises(AdmissionRejected, match="waited more than"):
+            await waiter
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.priority_classes["interactive"].rejected == 2
+    assert controller.priority_classes["interactive"].queued == 0
+    assert controller.in_flight == 1
+
+
+def test_thread_waiter_is_woken_by_async_release():
+    async def scenario():
+        controller = make_controller()
+        await controller.aacquire("interactive")
+        acquired = threading.Event()
+
+        def blocking():
+            with controller.slot("interactive"):
+                acquired.set()
+
+        thread = asyncio.create_task(asyncio.to_thread(blocking))
+        await asyncio.sleep(0.02)
+        assert not acquired.is_set()
+        controller.release("interactive")
+        await thread
+        return controller, acquired
+
+    controller, acquired = asyncio.run(scenario())
+    assert acquired.is_set()
+    assert controller.in_flight == 0
+
+
+def test_provider_run_reuses_slot_in_thread(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    provider = LLMProvider(
+        model_name="gemini-2.5-flash",
+        logger=logging.getLogger("test"),
+        max_concurrency=1,
+        roles={"chat": {"priority_class": "interactive"}},
+    )
+
+    def nested_llm_calls():
+        # Thread içindeki LLM çağrıları (_generate -> slot) aynı slotu kullanır, kilitlenmez
+        for _ in range(3):
+            with provider.admission.slot("interactive"):
+                time.sleep(0.001)
+        return provider.admission.in_flight
+
+    in_flight = asyncio.run(provider.run("chat", nested_llm_calls))
+    assert in_flight == 1
+    assert provider.admission.in_flight == 0
+    assert provider.admission.priority_classes["interactive"].admitted == 1
+
+
+def test_parallel_nested_calls_share_held_slot(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    provider = LLMProvider(
+        model_name="gemini-2.5-flash",
+        logger=logging.getLogger("test"),
+        max_concurrency=4,
+        roles={"chat": {"priority_class": "interactive"}},
+    )
+    active = 0
+    peak = 0
+    counter_lock = threading.Lock()
+
+    def fake_llm_call(_):
+        nonlocal active, peak
+        with provider.admission.slot("interactive"):
+            with counter_lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with counter_lock:
+                active -= 1
+        return provider.admission.in_flight
+
+    def parallel_llm_calls():
+        # batch context'i worker thread'lere kopyalar; çağrılar yine de tek slotu sırayla kullanır
+        return RunnableLambda(fake_llm_call).batch(list(range(6)), config={"max_concurrency": 6})
+
+    in_flight = asyncio.run(provider.run("chat", parallel_llm_calls))
+    assert peak == 1
+    assert in_flight == [1] * 6
+    assert provider.admission.in_flight == 0
+    assert provider.admission.priority_classes["interactive"].admitted == 1
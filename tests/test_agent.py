@@ -0,0 +1,71 @@
+import logging
+import threading
+from types import SimpleNamespace
+import pytest
+from app.admission import AdmissionRejected
+from app.agent import FALLBACK_FEEDBACK, QuizGeneratorAgent
+
+
+class FakeLLMProvider:
+    def get(self, role):
+        return SimpleNamespace(invoke=lambda prompt: SimpleNamespace(content="[]"))
+
+    def context_budget(self, role):
+        return 1000
+
+
+def make_agent(**kwargs):
+    return QuizGeneratorAgent(rag_pipeline=None, logger=logging.getLogger("test"), llm_provider=FakeLLMProvider(), **kwargs)
+
+
+def test_feedback_cache_is_lru():
+    agent = make_agent(feedback_cache_size=2)
+    agent._set_cached_feedback("q1", "A", "B", "f1")
+    agent._set_cached_feedback("q2", "A", "B", "f2")
+    assert agent._get_cached_feedback("q1", "A", "B") == "f1"
+    agent._set_cached_feedback("q3", "A", "B", "f3")
+    assert agent._get_cached_feedback("q2", "A", "B") is None
+    assert agent._get_cached_feedback("q1", "A", "B") == "f1"
+
+
+def test_feedback_cache_concurrent_access():
+    agent = make_agent(feedback_cache_size=8)
+    errors = []
+
+    def worker(offset):
+        try:
+            for n in range(2000):
+                key = (f"q{(n + offset) % 16}", "A", "B")
+                agent._set_cached_feedback(*key, f"f{n}")
+                agent._get_cached_feedback(*key)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(agent.feedback_cache) == 8
+
+
+class RejectingLLM:
+    def invoke(self, prompt):
+        raise AdmissionRejected("generation", "queue is full")
+
+
+def test_admission_rejection_is_not_hidden_by_fallback_feedback():
+    agent = make_agent()
+    agent.llm = RejectingLLM()
+    with pytest.raises(AdmissionRejected):
+        agent.generate_batch_feedback([{"question": "q", "answer": "A", "correct_answer": "B"}])
+    with pytest.raises(AdmissionRejected):
+        agent.evaluate("q", "A", "B", 1)
+
+
+def test_other_llm_errors_fall_back():
+    agent = make_agent()
+    agent.llm = SimpleNamespace(invoke=lambda prompt: 1 / 0)
+    assert agent.generate_batch_feedback([{"question": "q", "answer": "A", "correct_answer": "B"}]) == [FALLBACK_FEEDBACK]
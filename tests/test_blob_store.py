@@ -0,0 +1,56 @@
+import pytest
+from app.blob_store import BlobStore
+from tests.fakes import FakeLogger
+
+
+@pytest.fixture
+def blob_store(tmp_path):
+    return BlobStore(directory=str(tmp_path), logger=FakeLogger())
+
+
+TEXT = "Karbon atomu çok yönlü bağ yapar. İzomer bileşikler ğüşıöç. " * 2000
+
+
+def test_put_is_content_addressed(blob_store):
+    assert blob_store.put_text(TEXT) == blob_store.put_text(TEXT) == BlobStore.text_digest(TEXT)
+    assert blob_store.get_text(BlobStore.text_digest(TEXT)) == TEXT
+
+
+def test_size_is_utf8_byte_length(blob_store):
+    digest = blob_store.put_text(TEXT)
+    assert blob_store.size(digest) == len(TEXT.encode("utf-8"))
+    assert blob_store.size(digest) != len(TEXT)
+
+
+@pytest.mark.parametrize("start, end", [(0, None), (0, 0), (17, 70_000), (100_000, None), (5, 5)])
+def test_iter_range_streams_in_bounded_chunks(blob_store, start, end):
+    digest = blob_store.put_text(TEXT)
+    body = TEXT.encode("utf-8")
+    chunks = list(blob_store.iter_range(digest, start, end, chunk_size=4096))
+    assert b"".join(chunks) == body[start:None if end is None else end + 1]
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+
+
+def test_source_index(blob_store):
+    digest = blob_store.put_text(TEXT)
+    source = BlobStore.source_key("pdf", "abc")
+    assert blob_store.lookup_source(source) is None
+    blob_store.link_source(source, digest)
+    assert blob_store.lookup_source(source) == digest
+
+
+def test_source_keeps_segments(blob_store):
+    digest = blob_store.put_text("birinci\n\nikinci")
+    source = BlobStore.source_key("pdf", "abc")
+    segments = [{"page": 1, "span": [0, 7]}, {"page": 2, "span": [9, 15]}]
+    blob_store.link_source(source, digest, segments)
+    assert blob_store.lookup_source(source) == digest
+    assert blob_store.source_segments(source) == segments
+
+
+def test_legacy_source_record_has_no_segments(blob_store, tmp_path):
+    digest = blob_store.put_text(TEXT)
+    source = BlobStore.source_key("pdf", "legacy")
+    (tmp_path / "sources" / source).write_text(digest, encoding="ascii")
+    assert blob_store.lookup_source(source) == digest
+    assert blob_store.source_segments(source) is None
@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import pytest
+from app.connection import Connection
+from app.handler import ReadOnlySessionError, custom_db_crud_handler
+from tests.fakes import FakeEngine, FakeLogger, FakeSession
+
+
+def make_connection(**kwargs):
+    return Connection(
+        database_type="postgresql", db_username="user", db_password="password", db_host="localhost",
+        db_port="5432", db_name="test", logger=FakeLogger(), **kwargs
+    )
+
+
+class Repository:
+    def __init__(self):
+        self.logger = FakeLogger()
+
+    @custom_db_crud_handler
+    async def write(self, session, value):
+        session.info.setdefault("rows", []).append(value)
+        return True
+
+    @custom_db_crud_handler
+    async def failing_write(self, session):
+        raise ValueError("constraint violated")
+
+
+def test_crud_error_rolls_back_the_whole_unit_of_work():
+    connection = make_connection()
+    session = FakeSession()
+    connection.session_maker = lambda: session
+    repository = Repository()
+
+    async def scenario():
+        async with connection.session_scope() as scoped:
+            await repository.write(scoped, 1)
+            await repository.failing_write(scoped)
+            await repository.write(scoped, 2)
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+    # İkinci yazma hiç çalışmaz, commit yapılmaz; tek rollback session_scope'tan gelir
+    assert session.info["rows"] == [1]
+    assert session.calls == ["rollback", "close"]
+    assert repository.logger.records[0][0] == "error"
+
+
+def test_after_commit_callbacks_run_only_after_commit():
+    connection = make_connection()
+    session = FakeSession()
+    connection.session_maker = lambda: session
+    called = []
+
+    async def scenario():
+        async with connection.session_scope() as scoped:
+            scoped.info.setdefault("after_commit", []).append(lambda: called.append("score"))
+
+    asyncio.run(scenario())
+    assert called == ["score"]
+    assert "after_commit" not in session.info
+
+
+@pytest.mark.parametrize("fail_commit", [False, True])
+def test_after_commit_callbacks_are_dropped_on_rollback(fail_commit):
+    connection = make_connection()
+    session = FakeSession(fail_commit=fail_commit)
+    connection.session_maker = lambda: session
+    called = []
+
+    async def scenario():
+        async with connection.session_scope() as scoped:
+            scoped.info.setdefault("after_commit", []).append(lambda: called.append("score"))
+            if not fail_commit:
+                raise ValueError("request failed")
+
+    with pytest.raises((ValueError, RuntimeError)):
+        asyncio.run(scenario())
+    assert called == []
+    assert "after_commit" not in session.info
+    assert "rollback" in session.calls
+
+
+class SlowMigrationRunner:
+    runs = 0
+
+    def __init__(self, engine, logger):
+        pass
+
+    async def run(self):
+        SlowMigrationRunner.runs += 1
+        await asyncio.sleep(0.3)
+
+
+def test_startup_deadline_covers_only_the_connection(monkeypatch):
+    monkeypatch.setattr("app.connection.MigrationRunner", SlowMigrationRunner)
+    connection = make_connection(startup_timeout=0.2, connect_base_delay=0.01, connect_max_delay=0.01)
+    connection.engine = FakeEngine(failures=2)
+
+    asyncio.run(connection.connect())
+
+    assert connection.engine.attempts == 3
+    # Migration deadline'dan uzun sürse de kesilmez ve tekrar denenmez
+    assert SlowMigrationRunner.runs == 1
+    assert connection.health.attempts == 3
+
+
+def test_unreachable_database_fails_after_deadline():
+    connection = make_connection(startup_timeout=0.1, connect_base_delay=0.01, connect_max_delay=0.02)
+    connection.engine = FakeEngine(failures=1000)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(connection.connect())
+    assert "create_all" not in connection.engine.statements
+
+
+def test_read_only_sessions_round_robin_over_replicas():
+    connection = make_connection()
+    primary, first, second = FakeSession(), FakeSession(), FakeSession()
+    connection.session_maker = lambda: primary
+    connection._replica_cycle = itertools.cycle([lambda: first, lambda: second])
+    used = []
+
+    async def scenario():
+        for read_only in (True, True, True, False):
+            async with connection.session_scope(read_only=read_only) as scoped:
+                used.append((scoped, scoped.info["read_only"]))
+
+    asyncio.run(scenario())
+    assert used == [(first, True), (second, True), (first, True), (primary, False)]
+
+
+def test_read_only_falls_back_to_primary_without_replicas():
+    connection = make_connection()
+    primary = FakeSession()
+    connection.session_maker = lambda: primary
+
+    async def scenario():
+        async with connection.session_scope(read_only=True) as scoped:
+            return scoped
+
+    assert asyncio.run(scenario()) is primary
+    assert primary.info["read_only"] is False
+
+
+def test_writes_are_rejected_on_replica_sessions():
+    connection = make_connection()
+    replica = FakeSession()
+    connection._replica_cycle = itertools.cycle([lambda: replica])
+    repository = Repository()
+
+    async def scenario():
+        async with connection.session_scope(read_only=True) as scoped:
+            await repository.write(scoped, 1)
+
+    with pytest.raises(ReadOnlySessionError):
+        asyncio.run(scenario())
+    assert "rows" not in replica.info
+    assert replica.calls == ["rollback", "close"]
@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+from app.context_packer import ContextPacker
+from tests.fakes import FakeLogger
+
+
+BLOB_TEXT = "Asitler proton verir.  Bazlar proton alır.  Tuzlar nötrleşme ile oluşur."
+
+
+def blob_doc(span_start, span_end, **metadata):
+    return Document(page_content=BLOB_TEXT[span_start:span_end], metadata={"blob": "b1", "span": [span_start, span_end], **metadata})
+
+
+def make_packer(**kwargs):
+    return ContextPacker(logger=FakeLogger(), token_factor=1.0, chunk_overhead_tokens=0, **kwargs)
+
+
+def test_budget_cutoff_skips_chunks_that_do_not_fit():
+    packer = make_packer(max_tokens=10, min_chunk_tokens=5)
+    results = [
+        (Document(page_content="bir iki üç dört beş altı yedi"), 0.1),
+        (Document(page_content="sekiz dokuz on on bir on iki on üç"), 0.2),
+        (Document(page_content="kısa cümle"), 0.3),
+    ]
+    packed = packer.pack(results)
+
+    # İkinci chunk'a 3 token kalır (min_chunk_tokens'tan az), daha kısa üçüncü chunk yine de sığar
+    assert [doc.page_content for doc, _ in packed] == ["bir iki üç dört beş altı yedi", "kısa cümle"]
+
+
+def test_overlapping_spans_keep_only_new_text_with_matching_span():
+    packer = make_packer()
+    first = blob_doc(0, 42)
+    second = blob_doc(21, 72)
+    packed = packer.pack([(first, 0.1), (second, 0.2), (blob_doc(5, 20), 0.3)])
+
+    assert len(packed) == 2
+    assert packed[0][0] is first
+    clipped = packed[1][0]
+    assert clipped.page_content == "Tuzlar nötrleşme ile oluşur."
+    start, end = clipped.metadata["span"]
+    # Boşluklar atıldıktan sonra span metinle birebir örtüşür
+    assert BLOB_TEXT[start:end] == clipped.page_content
+    assert second.metadata["span"] == [21, 72]
+
+
+def test_truncation_updates_span_and_video_times():
+    packer = make_packer(max_tokens=3, min_chunk_tokens=1)
+    doc = blob_doc(23, 72, video_id="v1", start=100.0, end=149.0)
+    packed = packer.pack([(doc, 0.1)])
+
+    truncated = packed[0][0]
+    assert truncated.page_content == "Bazlar proton alır"
+    start, end = truncated.metadata["span"]
+    assert BLOB_TEXT[start:end] == truncated.page_content
+    # Zamanlar metindeki konuma göre orantılı olarak daralır
+    assert truncated.metadata["start"] == 100.0
+    assert truncated.metadata["end"] == 100.0 + (end - 23)
+    assert doc.metadata == {"blob": "b1", "span": [23, 72], "video_id": "v1", "start": 100.0, "end": 149.0}
+
+
+def test_clipped_front_moves_video_start():
+    packer = make_packer()
+    packed = packer.pack([(blob_doc(0, 21), 0.1), (blob_doc(0, 42, video_id="v1", start=0.0, end=42.0), 0.2)])
+
+    clipped = packed[1][0]
+    assert clipped.page_content == "Bazlar proton alır."
+    assert clipped.metadata["span"] == [23, 42]
+    assert (clipped.metadata["start"], clipped.metadata["end"]) == (23.0, 42.0)
@@ -0,0 +1,99 @@
+import asyncio
+from contextlib import asynccontextmanager
+from app.crud import CRUDOperations
+from app.models.models import User
+from tests.fakes import FakeLogger, FakeSession
+
+
+def make_crud(**kwargs):
+    return CRUDOperations(
+        database_type="postgresql", db_username="user", db_password="password", db_host="localhost",
+        db_port="5432", db_name="test", logger=FakeLogger(), **kwargs
+    )
+
+
+class FakeUser:
+    def to_dict(self):
+        return {"id": 6, "name": "ayse@example.com"}
+
+
+def test_read_by_id_returns_row_as_dict():
+    crud = make_crud()
+    session = FakeSession(rows={(User, 6): FakeUser()})
+    assert asyncio.run(crud.read_by_id(session, User, 6)) == {"id": 6, "name": "ayse@example.com"}
+
+
+def test_read_by_id_returns_none_for_missing_row():
+    crud = make_crud()
+    session = FakeSession()
+    assert asyncio.run(crud.read_by_id(session, User, 404)) is None
+    assert not any(level == "error" for level, _ in crud.logger.records)
+
+
+class RoutingConnection:
+    """
+    CRUDOperations.session_scope testleri için: hangi session'ın (primary/replica) açıldığını kaydeder.
+    """
+
+    def __init__(self):
+        self.routes = []
+
+    @asynccontextmanager
+    async def session_scope(self, read_only=False):
+        self.routes.append("replica" if read_only else "primary")
+        session = FakeSession()
+        session.info["read_only"] = read_only
+        yield session
+
+
+def test_reads_go_to_replica_until_user_writes():
+    crud = make_crud(read_your_writes_seconds=60)
+    crud.connection = RoutingConnection()
+
+    async def scenario():
+        async with crud.session_scope(read_only=True, user_id=7):
+            pass
+        async with crud.session_scope(user_id=7) as session:
+            await crud.create(session, object())
+        async with crud.session_scope(read_only=True, user_id=7):
+            pass
+        # Başka bir kullanıcının okuması etkilenmez
+        async with crud.session_scope(read_only=True, user_id=8):
+            pass
+
+    asyncio.run(scenario())
+    assert crud.connection.routes == ["replica", "primary", "primary", "replica"]
+    assert crud.recently_wrote(7)
+    assert not crud.recently_wrote(8)
+
+
+def test_read_your_writes_window_expires(monkeypatch):
+    crud = make_crud(read_your_writes_seconds=5)
+    crud.connection = RoutingConnection()
+    now = [1000.0]
+    monkeypatch.setattr("app.crud.time.monotonic", lambda: now[0])
+
+    async def scenario():
+        async with crud.session_scope(user_id=7) as session:
+            await crud.create(session, object())
+        async with crud.session_scope(read_only=True, user_id=7):
+            pass
+        now[0] += 6
+        async with crud.session_scope(read_only=True, user_id=7):
+            pass
+
+    asyncio.run(scenario())
+    assert crud.connection.routes == ["primary", "primary", "replica"]
+    assert 7 not in crud._last_write
+
+
+def test_read_only_session_does_not_pin_user():
+    crud = make_crud()
+    crud.connection = RoutingConnection()
+
+    async def scenario():
+        async with crud.session_scope(read_only=True, user_id=7) as session:
+            await crud.read_by_id(session, User, 1)
+
+    asyncio.run(scenario())
+    assert not crud.recently_wrote(7)
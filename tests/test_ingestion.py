@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from app.blob_store import BlobStore
+from app.ingestion import BulkIngestor, IngestionItem, PipelineExecutor, Stage
+from app.json_handler import JsonHandler
+from tests.fakes import FakeLogger
+
+
+def make_item(name, user_id=1, video_id=None):
+    return IngestionItem(kind="youtube", subject_id="kimya", user_id=user_id, name=name, video_id=video_id or name, language="tr")
+
+
+def test_failed_item_does_not_reach_later_stages_or_block_others():
+    reached = []
+
+    async def parse(item):
+        if item.name == "bozuk":
+            raise ValueError("parse error")
+
+    async def finish(item):
+        reached.append(item.name)
+        item.status = "done"
+
+    executor = PipelineExecutor(
+        stages=[Stage(name="parse", func=parse, workers=2), Stage(name="finish", func=finish)],
+        logger=FakeLogger()
+    )
+    items = asyncio.run(executor.run([make_item("a"), make_item("bozuk"), make_item("b")]))
+
+    assert sorted(reached) == ["a", "b"]
+    assert [item.status for item in items] == ["done", "failed", "done"]
+    assert items[1].error == "parse: parse error"
+    assert "finish" not in items[1].timings
+
+
+def test_batched_stage_groups_items():
+    batches = []
+
+    async def passthrough(item):
+        pass
+
+    async def collect(items):
+        batches.append([item.name for item in items])
+        for item in items:
+            item.status = "done"
+
+    executor = PipelineExecutor(
+        stages=[Stage(name="parse", func=passthrough), Stage(name="embed", func=collect, batch_size=3, batch_wait=0.5)],
+        logger=FakeLogger()
+    )
+    asyncio.run(executor.run([make_item(str(index)) for index in range(5)]))
+
+    assert batches == [["0", "1", "2"], ["3", "4"]]
+
+
+class FakeTranscripter:
+    def __init__(self, texts):
+        self.texts = texts
+        self.calls = []
+
+    async def segments(self, video_id, language):
+        self.calls.append(video_id)
+        if video_id not in self.texts:
+            raise LookupError("transcript not found")
+        return self.texts[video_id], None
+
+
+class FakeLabelExtractor:
+    def __init__(self):
+        self.calls = 0
+
+    async def aextract(self, subject_id, text):
+        self.calls += 1
+        return "Etiket"
+
+
+class FakeRagPipeline:
+    def __init__(self):
+        self.updates = []
+
+    def notes_to_chunks(self, notes, subject_id, user_id):
+        return [f"{user_id}:{note.id}" for note in notes]
+
+    def update_vector_db(self, chunks, user_id):
+        self.updates.append((user_id, sorted(chunks)))
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    logger = FakeLogger()
+    blob_store = BlobStore(directory=str(tmp_path / "blobs"), logger=logger)
+    json_handler = JsonHandler(directory=str(tmp_path / "notes"), logger=logger, blob_store=blob_store, flush_delay=0)
+    ingestor = BulkIngestor(
+        transcripter=FakeTranscripter({"v1": "Asitler ve bazlar.", "v2": "Karbon bileşikleri.", "v3": "Asitler ve bazlar."}),
+        pdf_parser=None,
+        label_extractor=FakeLabelExtractor(),
+        json_handler=json_handler,
+        rag_pipeline=FakeRagPipeline(),
+        logger=logger,
+        stages={"embed": {"batch_size": 8, "batch_wait": 0.5}}
+    )
+    yield ingestor
+    json_handler.close()
+
+
+def test_bulk_ingest_isolates_failures_and_groups_embeddings_by_user(ingestor):
+    items = [make_item("v1", user_id=1), make_item("bozuk", user_id=1), make_item("v2", user_id=1), make_item("v2", user_id=2)]
+    asyncio.run(ingestor.run(items))
+
+    assert [item.status for item in items] == ["done", "failed", "done", "done"]
+    assert items[1].error == "extract: transcript not found"
+    # Aynı batch'teki item'ların chunk'ları kullanıcı başına tek güncellemede toplanır
+    assert sorted(ingestor.rag_pipeline.updates) == [(1, ["1:1", "1:2"]), (2, ["2:1"])]
+
+
+def test_bulk_ingest_short_circuits_duplicates(ingestor):
+    asyncio.run(ingestor.run([make_item("v1")]))
+    ingestor.transcripter.calls.clear()
+    label_calls = ingestor.label_extractor.calls
+
+    # v1 aynı kaynak (transkript alınmaz), v3 aynı içerik (etiketlenmez)
+    items = asyncio.run(ingestor.run([make_item("v1"), make_item("v3")]))
+
+    assert [item.status for item in items] == ["duplicate", "duplicate"]
+    assert [item.note.id for item in items] == [1, 1]
+    assert ingestor.transcripter.calls == ["v3"]
+    assert ingestor.label_extractor.calls == label_calls
+    assert len(ingestor.rag_pipeline.updates) == 1
@@ -0,0 +1,57 @@
+import os
+import pytest
+from app.blob_store import BlobStore
+from app.json_handler import InvalidSubjectError, JsonHandler
+from tests.fakes import FakeLogger
+
+
+@pytest.fixture
+def handler(tmp_path):
+    logger = FakeLogger()
+    blob_store = BlobStore(directory=str(tmp_path / "blobs"), logger=logger)
+    handler = JsonHandler(directory=str(tmp_path / "notes"), logger=logger, blob_store=blob_store, flush_delay=0)
+    yield handler
+    handler.close()
+
+
+def test_add_and_delete_note(handler):
+    note = handler.add_note_to_subject("kimya", 1, "Karbon", "Organik kimya karbon bileşiklerini inceler.")
+    assert handler.read_note(handler.get_note("kimya", 1, note.id)) == "Organik kimya karbon bileşiklerini inceler."
+    assert handler.delete_note("kimya", 1, note.id)
+    assert handler.get_note("kimya", 1, note.id) is None
+
+
+@pytest.mark.parametrize("subject_id", ["../2/kimya", "../../etc/passwd", "kimya/../../x", "/tmp/x", "", ".", "..", "kim ya", "a" * 65])
+def test_unsafe_subject_id_is_rejected(handler, tmp_path, subject_id):
+    with pytest.raises(InvalidSubjectError):
+        handler.add_note_to_subject(subject_id, 1, "label", "metin")
+    with pytest.raises(InvalidSubjectError):
+        handler.delete_note(subject_id, 1, 1)
+    # Blob yazılmadan ve kullanıcı klasörü dışına hiçbir dosya oluşturulmadan reddedilir
+    assert os.listdir(tmp_path / "blobs") == ["sources"]
+    assert sorted(os.listdir(tmp_path)) == ["blobs", "notes"]
+    assert os.listdir(tmp_path / "notes") == []
+
+
+def test_invalid_subject_id_is_a_value_error():
+    assert issubclass(InvalidSubjectError, ValueError)
+    assert JsonHandler.validate_subject_id("turkce") == "turkce"
+
+
+def test_iter_notes_uses_a_snapshot_of_the_pending_manifest(tmp_path):
+    logger = FakeLogger()
+    blob_store = BlobStore(directory=str(tmp_path / "blobs"), logger=logger)
+    # Manifest write-behind kuyruğunda kalır; okuyucular ile yazıcılar aynı dict'i paylaşır
+    handler = JsonHandler(directory=str(tmp_path / "notes"), logger=logger, blob_store=blob_store, flush_delay=60)
+    try:
+        handler.add_note_to_subject("kimya", 1, "Karbon", "Karbon bileşikleri.")
+        handler.add_note_to_subject("kimya", 1, "Asit", "Asitler ve bazlar.")
+        notes = handler.iter_notes(1, "kimya")
+        first = next(notes)
+        listed = handler.list_notes(1, "kimya")
+        handler.add_note_to_subject("kimya", 1, "Tuz", "Tuzlar nötrleşme ile oluşur.")
+        assert [first["id"]] + [note["id"] for note in notes] == [1, 2]
+        assert [note["id"] for note in listed] == [1, 2]
+        assert [note["id"] for note in handler.list_notes(1, "kimya")] == [1, 2, 3]
+    finally:
+        handler.close()
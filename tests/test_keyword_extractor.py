@@ -0,0 +1,35 @@
+from app.keyword_extractor import KeywordExtractor, turkish_lower
+
+
+def filler(n, prefix="dolgu"):
+    return " ".join(f"{prefix}{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}" for i in range(n))
+
+
+def test_turkish_lower():
+    assert turkish_lower("IŞIK İzmir") == "ışık izmir"
+
+
+def test_stopwords_are_not_keywords():
+    keywords, _ = KeywordExtractor().extract("ve ve ve bir bir bir için için için fotosentez")
+    assert keywords == ["fotosentez"]
+
+
+def test_spread_term_outranks_concentrated_term():
+    extractor = KeywordExtractor(chunk_size=20, top_n=2)
+    # "yoğun" ilk chunk'ta 4 kez, "yaygın" her chunk'ta bir kez (toplam 4) geçer
+    chunks = [
+        "yoğun yoğun yoğun yoğun yaygın " + filler(15, "ilk"),
+        "yaygın " + filler(19, "iki"),
+        "yaygın " + filler(19, "uc"),
+        "yaygın " + filler(19, "dort"),
+    ]
+    keywords, _ = extractor.extract(" ".join(chunks))
+    assert keywords[0] == "yaygın"
+
+
+def test_confidence_needs_support():
+    extractor = KeywordExtractor(min_support=3)
+    _, single = extractor.extract("fotosentez " + filler(30))
+    _, repeated = extractor.extract("fotosentez fotosentez fotosentez " + filler(30))
+    assert single == 0.0
+    assert repeated > 0.0
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+import pytest
+from langchain_core.runnables import RunnableLambda
+from app.admission import AdmissionRejected
+from app.label_extractor_from_video import LabelExtractor
+
+
+class FakeChain:
+    def __init__(self, error=None, result="Kimya"):
+        self.error = error
+        self.result = result
+
+    def invoke(self, inputs):
+        if self.error:
+            raise self.error
+        return self.result
+
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+
+def make_extractor(chain, threshold=1.1):
+    provider = SimpleNamespace(get=lambda role: RunnableLambda(lambda prompt: "unused"))
+    extractor = LabelExtractor(llm_provider=provider, logger=logging.getLogger("test"), local_confidence_threshold=threshold)
+    extractor.labeling_chain = chain
+    return extractor
+
+
+TEXT = "fotosentez bitkilerde olur. fotosentez ışık ister. fotosentez enerji üretir."
+
+
+def test_local_label_skips_llm():
+    extractor = make_extractor(FakeChain(error=AssertionError("LLM çağrılmamalı")), threshold=0.0)
+    assert asyncio.run(extractor.aextract("biyoloji", TEXT)) == "Fotosentez"
+
+
+def test_llm_error_falls_back_to_local_keyword():
+    extractor = make_extractor(FakeChain(error=RuntimeError("timeout")))
+    assert extractor.extract("biyoloji", TEXT) == "Fotosentez"
+    assert asyncio.run(extractor.aextract("biyoloji", TEXT)) == "Fotosentez"
+
+
+def test_admission_rejection_propagates():
+    extractor = make_extractor(FakeChain(error=AdmissionRejected("background", "queue is full")))
+    with pytest.raises(AdmissionRejected):
+        extractor.extract("biyoloji", TEXT)
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(extractor.aextract("biyoloji", TEXT))
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+from app.leaderboard import Leaderboard
+from tests.test_crud import make_crud
+from tests.fakes import FakeSession
+
+
+def entry(user_id, score):
+    return {"user_id": user_id, "username": f"user{user_id}", "email": None, "score": score}
+
+
+def test_apply_during_load_is_kept():
+    leaderboard = Leaderboard(capacity=3)
+    leaderboard.begin_load()
+    leaderboard.apply(1, 40)
+    leaderboard.apply(1, 35)
+    leaderboard.load([entry(1, 30), entry(2, 20)])
+    assert [(e["user_id"], e["score"]) for e in leaderboard.top(3)] == [(1, 40), (2, 20)]
+
+
+def test_stale_rows_do_not_lower_applied_scores():
+    leaderboard = Leaderboard(capacity=3)
+    leaderboard.load([entry(1, 10), entry(2, 20)])
+    leaderboard.apply(1, 50)
+    # Replica henüz artışı görmedi
+    leaderboard.load([entry(2, 20), entry(1, 10), entry(3, 5)])
+    assert [(e["user_id"], e["score"]) for e in leaderboard.top(3)] == [(1, 50), (2, 20), (3, 5)]
+
+
+def test_aborted_load_still_applies_pending_updates():
+    leaderboard = Leaderboard(capacity=3)
+    leaderboard.load([entry(1, 10)])
+    leaderboard.begin_load()
+    leaderboard.apply(1, 15)
+    leaderboard.abort_load()
+    assert not leaderboard.loading
+    assert leaderboard.top(1)[0]["score"] == 15
+
+
+class LeaderboardSession(FakeSession):
+    def __init__(self, rows):
+        super().__init__()
+        self.result_rows = rows
+        self.executions = 0
+
+    async def execute(self, statement):
+        self.executions += 1
+        await asyncio.sleep(0.02)
+        return SimpleNamespace(all=lambda: self.result_rows)
+
+
+def test_concurrent_refreshes_load_once_and_keep_applies():
+    crud = make_crud(leaderboard_size=3)
+    session = LeaderboardSession([
+        SimpleNamespace(user_id=1, username="user1", email=None, total_score=10),
+        SimpleNamespace(user_id=2, username="user2", email=None, total_score=5),
+    ])
+
+    async def scenario():
+        first = asyncio.create_task(crud.get_top_users_by_score(session, limit=2))
+        second = asyncio.create_task(crud.get_top_users_by_score(session, limit=2))
+        await asyncio.sleep(0.01)
+        # Yükleme sürerken commit edilmiş bir artış
+        crud.leaderboard.apply(2, 30)
+        return await asyncio.gather(first, second)
+
+    first, second = asyncio.run(scenario())
+    assert session.executions == 1
+    assert [e["user_id"] for e in first] == [2, 1]
+    assert first == second
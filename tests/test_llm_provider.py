@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+import pytest
+from app.llm_provider import LLMProvider
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    return LLMProvider(
+        model_name="gemini-2.5-flash",
+        logger=logging.getLogger("test"),
+        requests_per_minute=600,
+        max_bucket_size=2,
+        context_tokens=8000,
+        roles={
+            "chat": {"priority_class": "interactive", "context_tokens": 4000},
+            "summarizer": {"priority_class": "interactive"},
+            "quiz": {"priority_class": "generation", "temperature": 0.7},
+        },
+    )
+
+
+def test_missing_api_key_is_rejected(monkeypatch):
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    monkeypatch.setattr("app.llm_provider.load_dotenv", lambda: None)
+    with pytest.raises(ValueError):
+        LLMProvider(model_name="gemini-2.5-flash", logger=logging.getLogger("test"))
+
+
+def test_roles_with_the_same_config_share_a_client(provider):
+    assert provider.get("chat") is provider.get("summarizer")
+    assert provider.get("chat") is not provider.get("quiz")
+    # Rolü tanımlı olmayan işler varsayılan (background) sınıfına düşer
+    assert provider.get("label") is not provider.get("chat")
+    assert provider.role_config("label") == ("gemini-2.5-flash", 0.2, "background")
+
+
+def test_clients_share_admission_and_token_bucket(provider):
+    chat, quiz = provider.get("chat"), provider.get("quiz")
+    assert chat._admission is quiz._admission is provider.admission
+    assert chat._token_bucket is quiz._token_bucket is provider.rate_limiter
+    assert chat._priority_class == "interactive"
+    assert quiz._priority_class == "generation"
+    assert quiz.temperature == 0.7
+
+
+def test_context_budget_per_role(provider):
+    assert provider.context_budget("chat") == 4000
+    assert provider.context_budget("quiz") == 8000
+
+
+def test_token_bucket_limits_the_rate(provider):
+    # 600 rpm = 10 istek/sn; bucket dolunca sonraki istek token bekler
+    bucket = provider.rate_limiter
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire(blocking=True)
+    assert time.monotonic() - started >= 0.15
+
+
+def test_run_executes_under_the_role_class(provider):
+    def job():
+        return provider.admission.priority_classes["generation"].in_flight
+
+    assert asyncio.run(provider.run("quiz", job)) == 1
+    assert provider.admission.priority_classes["generation"].admitted == 1
+    assert provider.admission.in_flight == 0
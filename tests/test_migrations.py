@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+from app.migrations import MIGRATIONS, MigrationRunner
+from tests.fakes import FakeLogger
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeMigrationConnection:
+    """
+    pg_class'ta tabloların relkind'ını bilen, çalıştırılan SQL'i kaydeden sahte bağlantı.
+    """
+
+    def __init__(self, relkinds, applied=()):
+        self.relkinds = relkinds
+        self.applied = list(applied)
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def execution_options(self, **options):
+        return self
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.executed.append(sql)
+        if sql.startswith("SELECT relkind FROM pg_class"):
+            relkind = self.relkinds.get(params["name"])
+            return FakeResult([SimpleNamespace(relkind=relkind)] if relkind else [])
+        if sql == "SELECT version FROM schema_migrations":
+            return FakeResult([SimpleNamespace(version=version) for version in self.applied])
+        if "CONCURRENTLY" in sql and self.relkinds.get(sql.split(" ON ")[-1].split(" ")[0]) == "p":
+            raise RuntimeError("cannot create index on partitioned table concurrently")
+        return FakeResult([])
+
+
+def run_migration_2(relkinds):
+    conn = FakeMigrationConnection(relkinds, applied=[1, 3, 4])
+    engine = SimpleNamespace(connect=lambda: conn)
+    migrations = [migration for migration in MIGRATIONS if migration.version == 2]
+    applied = asyncio.run(MigrationRunner(engine=engine, logger=FakeLogger(), migrations=migrations).run())
+    return applied, [sql for sql in conn.executed if sql.startswith("CREATE INDEX")]
+
+
+def test_concurrent_index_on_regular_table():
+    applied, statements = run_migration_2({"question_answers": "r"})
+    assert applied == [2]
+    assert all("CONCURRENTLY" in sql for sql in statements)
+
+
+def test_index_on_partitioned_table_is_not_concurrent():
+    # Yeni kurulum: create_all question_answers'ı partition'lı oluşturur
+    applied, statements = run_migration_2({"question_answers": "p", "user_scores": "r"})
+    assert applied == [2]
+    question_answers = [sql for sql in statements if " ON question_answers " in sql]
+    assert question_answers == [
+        "CREATE INDEX IF NOT EXISTS ix_question_answers_user_id_created_at ON question_answers (user_id, created_at)"
+    ]
+    assert all("CONCURRENTLY" in sql for sql in statements if sql not in question_answers)
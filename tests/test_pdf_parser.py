@@ -0,0 +1,64 @@
+import asyncio
+from app.pdf_parser import PdfParser, count_pages, extract_page_range
+
+
+class FakePoolParser(PdfParser):
+    """
+    Process pool yerine sahte sayfalar döndüren parser; oluşturulan ve tüketilen görevleri sayar.
+    """
+
+    def __init__(self, pages, **kwargs):
+        super().__init__(**kwargs)
+        self.pages = pages
+        self.started = 0
+        self.max_outstanding = 0
+        self.consumed = 0
+
+    async def _run(self, func, *args):
+        if func is count_pages:
+            return len(self.pages)
+        assert func is extract_page_range
+        _, start, end = args
+        self.started += 1
+        self.max_outstanding = max(self.max_outstanding, self.started - self.consumed)
+        await asyncio.sleep(0)
+        return self.pages[start:end]
+
+
+def test_aiter_pages_keeps_a_bounded_window():
+    parser = FakePoolParser([f"sayfa {n}" for n in range(100)], pages_per_task=5, max_pending=3)
+
+    async def consume():
+        pages = []
+        async for page in parser.aiter_pages("dummy.pdf"):
+            pages.append(page)
+            if len(pages) % 5 == 0:
+                parser.consumed += 1
+                # Yavaş tüketici: bu sürede yeni görev oluşturulmamalı
+                await asyncio.sleep(0.001)
+        return pages
+
+    pages = asyncio.run(consume())
+    assert pages == [f"sayfa {n}" for n in range(100)]
+    assert parser.started == 20
+    assert parser.max_outstanding <= 3
+
+
+def test_aiter_pages_stops_scheduling_when_consumer_stops():
+    parser = FakePoolParser([f"sayfa {n}" for n in range(100)], pages_per_task=5, max_pending=2)
+
+    async def consume_first_page():
+        async for page in parser.aiter_pages("dummy.pdf"):
+            return page
+
+    assert asyncio.run(consume_first_page()) == "sayfa 0"
+    assert parser.started <= 3
+
+
+def test_extract_records_page_spans():
+    parser = FakePoolParser(["  birinci sayfa ", "", "ikinci\n\nsayfa", "   ", "son"], pages_per_task=2)
+    text, segments = asyncio.run(parser.extract("dummy.pdf"))
+
+    assert text == "birinci sayfa\n\nikinci\n\nsayfa\n\nson"
+    assert [segment["page"] for segment in segments] == [1, 3, 5]
+    assert [text[slice(*segment["span"])] for segment in segments] == ["birinci sayfa", "ikinci\n\nsayfa", "son"]
@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from app.rag_pipeline import NoteChunk, RagPipeline
+from tests.fakes import FakeLogger
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.rag_pipeline.GoogleGenerativeAIEmbeddings", lambda model: FakeEmbeddings())
+    return RagPipeline(model_name="models/text-embedding-004", vector_db_directory=str(tmp_path / "vector_db"), logger=FakeLogger())
+
+
+def chunk(text):
+    return NoteChunk(id=text, subject_id="kimya", label="Etiket", content=text)
+
+
+def test_concurrent_updates_for_the_same_user_keep_all_embeddings(pipeline, monkeypatch):
+    pipeline.update_vector_db([chunk("ilk not")], user_id=1)
+    load_local = FAISS.load_local
+
+    def slow_load_local(*args, **kwargs):
+        # İki yazıcının da aynı index'i yükleyip ardından kaydettiği pencereyi genişletir
+        vectorstore = load_local(*args, **kwargs)
+        time.sleep(0.05)
+        return vectorstore
+
+    monkeypatch.setattr(FAISS, "load_local", slow_load_local)
+    threads = [
+        threading.Thread(target=pipeline.update_vector_db, args=([chunk(f"not {index}")], 1))
+        for index in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    vectorstore = load_local(os.path.join(pipeline.vector_db_directory, "user_1"), pipeline.embedding_model, allow_dangerous_deserialization=True)
+    assert vectorstore.index.ntotal == 4
+    contents = sorted(document.page_content for document in vectorstore.docstore._dict.values())
+    assert contents == ["ilk not", "not 0", "not 1", "not 2"]
+
+
+def test_users_have_separate_indexes(pipeline):
+    pipeline.update_vector_db([chunk("birinci kullanıcı")], user_id=1)
+    pipeline.update_vector_db([chunk("ikinci kullanıcı")], user_id=2)
+    assert [doc.page_content for doc, _ in pipeline.query_with_scores("kullanıcı", user_id=2, k=5)] == ["ikinci kullanıcı"]
@@ -0,0 +1,35 @@
+import asyncio
+from datetime import date
+from app.retention import RetentionJob, month_start, partition_name
+from tests.fakes import FakeLogger
+
+
+def test_month_start_and_partition_name():
+    assert month_start(date(2026, 1, 15), -1) == date(2025, 12, 1)
+    assert month_start(date(2026, 11, 3), 2) == date(2027, 1, 1)
+    assert partition_name(date(2026, 3, 1)) == "question_answers_y2026m03"
+
+
+class FlakyRetentionJob(RetentionJob):
+    async def run_once(self, engine=None, today=None):
+        self.runs += 1
+        if self.runs == 1:
+            raise OSError("database unavailable")
+        return []
+
+
+def test_run_forever_survives_failures_and_stops_on_cancel():
+    job = FlakyRetentionJob(logger=FakeLogger(), interval_hours=0.001 / 3600)
+    job.runs = 0
+
+    async def scenario():
+        task = asyncio.create_task(job.run_forever())
+        while job.runs < 3:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    task = asyncio.run(scenario())
+    assert task.cancelled()
+    assert [level for level, _ in job.logger.records] == ["error"]
@@ -0,0 +1,47 @@
+import io
+import hashlib
+import os
+import pytest
+from app.utils import parse_byte_range, spool_upload_to_disk
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=50-500", (50, 99)),
+    (" bytes=5-5 ", (5, 5)),
+])
+def test_valid_ranges(header, expected):
+    assert parse_byte_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "bytes=abc", "bytes=1-x", "bytes=-", "items=0-10", "bytes=0-1,5-6", "bytes=10-5", "bytes 0-10", "bytes=--1",
+])
+def test_malformed_ranges_are_ignored(header):
+    assert parse_byte_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=100-200", 100),
+    ("bytes=-0", 100),
+    ("bytes=0-", 0),
+    ("bytes=-5", 0),
+])
+def test_unsatisfiable_ranges_raise(header, size):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, size)
+
+
+def test_spool_upload_to_disk():
+    data = os.urandom(300_000)
+    path, digest = spool_upload_to_disk(io.BytesIO(data), ".pdf", chunk_size=4096)
+    try:
+        with open(path, "rb") as f:
+            assert f.read() == data
+        assert digest == hashlib.sha256(data).hexdigest()
+    finally:
+        os.remove(path)
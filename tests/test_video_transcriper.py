@@ -0,0 +1,130 @@
+import asyncio
+import json
+import pytest
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from app.video_transcriper import TimeoutSession, VideoTranscript
+from tests.fakes import FakeLogger
+
+
+SNIPPETS = [{"text": "merhaba", "start": 0.0, "duration": 2.0}, {"text": "dünya", "start": 2.0, "duration": 2.0}]
+
+
+@pytest.fixture
+def transcripts(tmp_path):
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    (directory / "abc.tr.json").write_text(json.dumps(SNIPPETS), encoding="utf-8")
+    return directory
+
+
+def make_transcript(tmp_path, transcripts, **kwargs):
+    return VideoTranscript(
+        logger=FakeLogger(), cache_dir=str(tmp_path / "cache"), fetcher="file", local_directory=str(transcripts), **kwargs
+    )
+
+
+def test_cache_is_shared_between_instances(tmp_path, transcripts):
+    first = make_transcript(tmp_path, transcripts)
+    assert asyncio.run(first.fetch("abc", "tr")) == SNIPPETS
+    assert asyncio.run(first.fetch("abc", "tr")) == SNIPPETS
+    second = make_transcript(tmp_path, transcripts)
+    assert asyncio.run(second.transcript("abc", "tr")) == "merhaba dünya"
+    assert (first.fetch_count, second.fetch_count) == (1, 0)
+
+
+def test_expired_cache_entry_is_fetched_again(tmp_path, transcripts, monkeypatch):
+    transcript = make_transcript(tmp_path, transcripts, cache_ttl_hours=1)
+    now = [1_000_000.0]
+    monkeypatch.setattr("app.video_transcriper.time.time", lambda: now[0])
+    asyncio.run(transcript.fetch("abc", "tr"))
+    now[0] += 3599
+    asyncio.run(transcript.fetch("abc", "tr"))
+    assert transcript.fetch_count == 1
+    now[0] += 2
+    asyncio.run(transcript.fetch("abc", "tr"))
+    assert transcript.fetch_count == 2
+
+
+def test_concurrent_requests_join_a_single_fetch(tmp_path, transcripts):
+    transcript = make_transcript(tmp_path, transcripts)
+    transcript.source.latency = 0.05
+
+    async def scenario():
+        waiters = [asyncio.create_task(transcript.fetch("abc", "tr")) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        # Bekleyenlerden birinin iptali ortak fetch'i iptal etmez
+        waiters[0].cancel()
+        return await asyncio.gather(*waiters[1:])
+
+    assert asyncio.run(scenario()) == [SNIPPETS] * 4
+    assert transcript.fetch_count == 1
+    assert transcript._in_flight == {}
+
+
+class RecordingAdapter(BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        response = Response()
+        response.status_code = 200
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_timeout_session_applies_default_timeout():
+    session = TimeoutSession(timeout=3)
+    adapter = RecordingAdapter()
+    session.mount("https://", adapter)
+    session.get("https://www.youtube.com/watch?v=abc")
+    session.get("https://www.youtube.com/watch?v=abc", timeout=1)
+    assert adapter.timeouts == [3, 1]
+
+
+def ten_second_snippets(count):
+    return [{"text": f"s{index}", "start": index * 10.0, "duration": 10.0} for index in range(count)]
+
+
+def windows(segments):
+    return [(segment["start"], segment["end"]) for segment in segments]
+
+
+def test_segments_overlap_by_the_configured_seconds(tmp_path, transcripts):
+    transcript = make_transcript(tmp_path, transcripts, segment_seconds=30, segment_overlap_seconds=10)
+    text, segments = transcript.build_segments(ten_second_snippets(10))
+
+    assert windows(segments) == [(0, 30), (20, 50), (40, 70), (60, 90), (80, 100)]
+    # Span'lar metindeki snippet sınırlarına denk gelir; son pencere metnin sonuna kadar gider
+    assert [text[start:end] for start, end in (segment["span"] for segment in segments)][:2] == ["s0 s1 s2", "s2 s3 s4"]
+    assert segments[-1]["span"][1] == len(text)
+
+
+@pytest.mark.parametrize("overlap", [30, 45])
+def test_overlap_not_smaller_than_window_still_advances(tmp_path, transcripts, overlap):
+    transcript = make_transcript(tmp_path, transcripts, segment_seconds=30, segment_overlap_seconds=overlap)
+    _, segments = transcript.build_segments(ten_second_snippets(10))
+
+    # Her pencere en az bir snippet ilerler, döngü sonlanır ve son snippet kapsanır
+    assert [start for start, _ in windows(segments)] == [0, 10, 20, 30, 40, 50, 60, 70]
+    assert segments[-1]["end"] == 100
+
+
+def test_long_snippet_and_blank_text(tmp_path, transcripts):
+    transcript = make_transcript(tmp_path, transcripts, segment_seconds=30, segment_overlap_seconds=10)
+    snippets = [
+        {"text": " uzun ", "start": 0.0, "duration": 45.0},
+        {"text": "   ", "start": 45.0, "duration": 1.0},
+        {"text": "son", "start": 50.0, "duration": 2.0},
+    ]
+    text, segments = transcript.build_segments(snippets)
+
+    assert text == "uzun son"
+    # Pencereden uzun snippet tek başına bir segment olur, boş snippet atlanır
+    assert segments == [{"start": 0.0, "end": 45.0, "span": [0, 4]}, {"start": 50.0, "end": 52.0, "span": [5, 8]}]
+    assert transcript.build_segments([]) == ("", [])